@@ -0,0 +1,85 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+import argparse
+import multiprocessing as mp
+import os
+import resource
+import time
+
+import torch
+
+from vggt.utils.packed_checkpoint import PACKED_DTYPES, save_packed_checkpoint
+
+
+# Convert the released checkpoint to a packed checkpoint, and compare the cold start of the original checkpoint
+# (random init then copy, or meta-device construction with VGGT.from_state_dict) and of the packed one:
+#   python convert_checkpoint.py --output vggt_bf16.safetensors --dtype bfloat16 --benchmark
+# Then load it with:
+#   model = VGGT.from_packed_checkpoint("vggt_bf16.safetensors")
+
+_URL = "https://huggingface.co/facebook/VGGT-1B/resolve/main/model.pt"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Convert a VGGT checkpoint to the packed format")
+    parser.add_argument("--input", type=str, default=_URL, help="model.pt path or URL")
+    parser.add_argument("--output", type=str, required=True, help="Output .safetensors file")
+    parser.add_argument("--dtype", type=str, default="bfloat16", choices=PACKED_DTYPES, help="Packed weight dtype")
+    parser.add_argument("--benchmark", action="store_true", help="Compare the cold start of both checkpoints")
+    return parser.parse_args()
+
+
+def load_state_dict(path_or_url):
+    if os.path.exists(path_or_url):
+        return torch.load(path_or_url, map_location="cpu")
+    return torch.hub.load_state_dict_from_url(path_or_url, map_location="cpu")
+
+
+def _cold_start(kind, path, queue):
+    # Run in a fresh process, so that the peak memory and the file cache state are its own
+    from vggt.models.vggt import VGGT
+
+    start = time.perf_counter()
+    if kind == "original":
+        model = VGGT()
+        model.load_state_dict(load_state_dict(path))
+    elif kind == "meta":
+        model = VGGT.from_state_dict(load_state_dict(path))
+    else:
+        model = VGGT.from_packed_checkpoint(path)
+    model.eval()
+    elapsed = time.perf_counter() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**20  # KiB to GiB on Linux
+    queue.put((elapsed, peak_rss))
+
+
+def benchmark_cold_start(original, packed):
+    ctx = mp.get_context("spawn")
+    print(f"{'checkpoint':<12}{'load s':>10}{'peak RSS GiB':>15}")
+    for kind, path in (("original", original), ("meta", original), ("packed", packed)):
+        queue = ctx.Queue()
+        process = ctx.Process(target=_cold_start, args=(kind, path, queue))
+        process.start()
+        elapsed, peak_rss = queue.get()
+        process.join()
+        print(f"{kind:<12}{elapsed:>10.2f}{peak_rss:>15.2f}")
+
+
+def main():
+    args = parse_args()
+
+    state_dict = load_state_dict(args.input)
+    save_packed_checkpoint(state_dict, args.output, dtype=args.dtype)
+    del state_dict
+    print(f"Saved {args.output} ({os.path.getsize(args.output) / 2**20:.0f} MiB)")
+
+    if args.benchmark:
+        benchmark_cold_start(args.input, args.output)
+
+
+if __name__ == "__main__":
+    main()
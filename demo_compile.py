@@ -0,0 +1,106 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import torch
+
+from vggt.models.vggt import VGGT
+from vggt.utils.compiled_model import DEFAULT_CACHE_DIR, CompiledVGGT
+
+
+# Latency of eager vs. compiled inference for a few scene shapes:
+#   python demo_compile.py --device cpu --shapes 4x518x518 8x294x518
+# Run it twice: the second run loads the compiled artifacts from the disk cache (see the "first call" column).
+#
+# Start latency of a new worker process with an empty (cold) and a populated (warm) compile cache, in a fresh
+# temporary cache directory:
+#   python demo_compile.py --device cpu --shapes 4x518x518 --startup
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark eager vs. compiled VGGT inference")
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--shapes", type=str, nargs="+", default=["4x518x518"], help="Scene shapes, SxHxW")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per shape")
+    parser.add_argument("--cache_dir", type=str, default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--startup", action="store_true", help="Measure the cold vs. warm cache start latency")
+    parser.add_argument("--first_call_only", action="store_true", help=argparse.SUPPRESS)  # worker of --startup
+    return parser.parse_args()
+
+
+def latency(fn, images, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(images)
+    return (time.perf_counter() - start) / repeats
+
+
+def measure_startup(args):
+    """Runs two worker processes sharing a new compile cache: the first one compiles, the second one loads."""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        command = [sys.executable, os.path.abspath(__file__), "--device", args.device, "--shapes", *args.shapes]
+        command += ["--cache_dir", cache_dir, "--first_call_only"]
+
+        print(f"{'cache':<8}{'process s':>11}  first call s per shape")
+        for name in ("cold", "warm"):
+            start = time.perf_counter()
+            output = subprocess.run(command, check=True, stdout=subprocess.PIPE, text=True).stdout
+            process_time = time.perf_counter() - start
+            first_calls = json.loads(output.strip().splitlines()[-1])
+            per_shape = ", ".join(f"{shape}: {seconds:.1f}" for shape, seconds in first_calls.items())
+            print(f"{name:<8}{process_time:>11.1f}  {per_shape}")
+
+
+def main():
+    args = parse_args()
+    if args.startup:
+        measure_startup(args)
+        return
+
+    _URL = "https://huggingface.co/facebook/VGGT-1B/resolve/main/model.pt"
+    model = VGGT.from_state_dict(torch.hub.load_state_dict_from_url(_URL), enable_track=False).to(args.device)
+    compiled = CompiledVGGT(model, device=args.device, dtype=torch.float32, cache_dir=args.cache_dir)
+
+    if args.first_call_only:
+        first_calls = {}
+        for shape in args.shapes:
+            S, H, W = (int(v) for v in shape.split("x"))
+            start = time.perf_counter()
+            compiled(torch.rand(S, 3, H, W))
+            first_calls[shape] = time.perf_counter() - start
+        print(json.dumps(first_calls))
+        return
+
+    def eager(images):
+        with torch.no_grad():
+            return model(images.to(args.device))
+
+    print(f"{'shape':<14}{'eager s':>10}{'first call s':>14}{'compiled s':>12}{'speedup':>9}")
+    for shape in args.shapes:
+        S, H, W = (int(v) for v in shape.split("x"))
+        images = torch.rand(S, 3, H, W)
+
+        eager(images)  # warm-up
+        eager_time = latency(eager, images, args.repeats)
+
+        # The first call compiles, or loads the compiled artifacts from the disk cache
+        start = time.perf_counter()
+        compiled(images)
+        first_call = time.perf_counter() - start
+        compiled_time = latency(compiled, images, args.repeats)
+
+        print(f"{shape:<14}{eager_time:>10.3f}{first_call:>14.1f}{compiled_time:>12.3f}{eager_time / compiled_time:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
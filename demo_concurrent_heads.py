@@ -0,0 +1,80 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+import argparse
+import time
+
+import torch
+
+from vggt.models.vggt import VGGT
+
+
+# Wall-clock time of the prediction heads run one after another vs. concurrently (CPU threads or CUDA
+# streams), with all the outputs enabled (camera, depth, points and tracks):
+#   python demo_concurrent_heads.py --device cpu --num_threads 32 --frames 8 --image_size 518x518 --split_threads
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark sequential vs. concurrent prediction heads")
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--num_threads", type=int, default=None, help="Number of CPU threads (torch default if None)")
+    parser.add_argument("--frames", type=int, default=8)
+    parser.add_argument("--image_size", type=str, default="518x518", help="HxW")
+    parser.add_argument("--query_points", type=int, default=256, help="Number of tracked points, 0 to disable")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument(
+        "--split_threads", action="store_true", help="Split the CPU threads between the heads (split_head_threads)"
+    )
+    return parser.parse_args()
+
+
+def timed_forward(model, images, query_points, repeats):
+    with torch.no_grad():
+        model(images, query_points=query_points)  # warm-up
+        if images.is_cuda:
+            torch.cuda.synchronize()
+        start = time.perf_counter()
+        for _ in range(repeats):
+            predictions = model(images, query_points=query_points)
+        if images.is_cuda:
+            torch.cuda.synchronize()
+    return predictions, (time.perf_counter() - start) / repeats
+
+
+def main():
+    args = parse_args()
+    if args.num_threads is not None:
+        torch.set_num_threads(args.num_threads)
+
+    _URL = "https://huggingface.co/facebook/VGGT-1B/resolve/main/model.pt"
+    model = VGGT.from_state_dict(torch.hub.load_state_dict_from_url(_URL)).to(args.device)
+
+    H, W = (int(v) for v in args.image_size.split("x"))
+    images = torch.rand(args.frames, 3, H, W, device=args.device)
+    query_points = None
+    if args.query_points > 0:
+        query_points = torch.rand(args.query_points, 2, device=args.device) * torch.tensor([W, H], device=args.device)
+
+    # The aggregator is shared by both runs, so the difference comes from the heads
+    model.concurrent_heads = False
+    reference, sequential_time = timed_forward(model, images, query_points, args.repeats)
+    model.concurrent_heads = True
+    model.split_head_threads = args.split_threads
+    predictions, concurrent_time = timed_forward(model, images, query_points, args.repeats)
+
+    max_diff = max(
+        (reference[key] - predictions[key]).abs().max().item()
+        for key in reference
+        if isinstance(reference[key], torch.Tensor)
+    )
+    print(f"{args.frames} frames of {H}x{W} on {args.device}, {torch.get_num_threads()} threads")
+    print(f"sequential heads: {sequential_time:.2f} s per forward")
+    print(f"concurrent heads: {concurrent_time:.2f} s per forward ({sequential_time / concurrent_time:.2f}x)")
+    print(f"max abs difference of the predictions: {max_diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -23,15 +23,15 @@ from vggt.models.vggt import VGGT
 from vggt.utils.load_fn import load_and_preprocess_images
 from vggt.utils.pose_enc import pose_encoding_to_extri_intri
 from vggt.utils.geometry import unproject_depth_map_to_point_map
+from vggt.utils.prediction_store import PredictionStore, save_predictions
 
 device = "cuda" if torch.cuda.is_available() else "cpu"
 
 print("Initializing and loading VGGT model...")
 # model = VGGT.from_pretrained("facebook/VGGT-1B")  # another way to load the model
 
-model = VGGT()
 _URL = "https://huggingface.co/facebook/VGGT-1B/resolve/main/model.pt"
-model.load_state_dict(torch.hub.load_state_dict_from_url(_URL))
+model = VGGT.from_state_dict(torch.hub.load_state_dict_from_url(_URL))
 
 
 model.eval()
@@ -213,9 +213,9 @@ def gradio_demo(
     with torch.no_grad():
         predictions = run_model(target_dir, model)
 
-    # Save predictions
-    prediction_save_path = os.path.join(target_dir, "predictions.npz")
-    np.savez(prediction_save_path, **predictions)
+    # Save predictions, as a chunked store which update_visualization reads lazily
+    prediction_save_path = os.path.join(target_dir, "predictions")
+    save_predictions(prediction_save_path, predictions, half=True)
 
     # Handle None frame_filter
     if frame_filter is None:
@@ -274,8 +274,9 @@ def update_visualization(
     target_dir, conf_thres, frame_filter, mask_black_bg, mask_white_bg, show_cam, mask_sky, prediction_mode, is_example
 ):
     """
-    Reload saved predictions from npz, create (or reuse) the GLB for new parameters,
+    Open the saved prediction store, create (or reuse) the GLB for new parameters,
     and return it for the 3D viewer. If is_example == "True", skip.
+    Only the frames selected by frame_filter are read from the store.
     """
 
     # If it's an example click, skip as requested
@@ -285,24 +286,11 @@ def update_visualization(
     if not target_dir or target_dir == "None" or not os.path.isdir(target_dir):
         return None, "No reconstruction available. Please click the Reconstruct button first."
 
-    predictions_path = os.path.join(target_dir, "predictions.npz")
-    if not os.path.exists(predictions_path):
+    predictions_path = os.path.join(target_dir, "predictions")
+    if not os.path.isdir(predictions_path):
         return None, f"No reconstruction available at {predictions_path}. Please run 'Reconstruct' first."
 
-    key_list = [
-        "pose_enc",
-        "depth",
-        "depth_conf",
-        "world_points",
-        "world_points_conf",
-        "images",
-        "extrinsic",
-        "intrinsic",
-        "world_points_from_depth",
-    ]
-
-    loaded = np.load(predictions_path)
-    predictions = {key: np.array(loaded[key]) for key in key_list}
+    predictions = PredictionStore(predictions_path)
 
     glbfile = os.path.join(
         target_dir,
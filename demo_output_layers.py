@@ -0,0 +1,80 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+import argparse
+import time
+
+import torch
+
+from vggt.models.vggt import VGGT
+from vggt.utils.memory import peak_memory
+
+
+# Peak memory and latency of a forward pass keeping the outputs of all the aggregator layers vs. only the layers
+# consumed by the enabled heads (VGGT.get_output_layers), e.g. for depth and cameras only:
+#   python demo_output_layers.py --device cuda --frames 16 --image_size 518x518 --disable point track
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark keeping all aggregator layers vs. the consumed layers")
+    parser.add_argument("--device", type=str, default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--dtype", type=str, default="float32", choices=["float32", "float16", "bfloat16"])
+    parser.add_argument("--frames", type=int, default=8)
+    parser.add_argument("--image_size", type=str, default="518x518", help="HxW")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument(
+        "--disable", type=str, nargs="*", default=[], choices=["camera", "point", "depth", "track"],
+        help="Heads to disable",
+    )
+    return parser.parse_args()
+
+
+@torch.no_grad()
+def run(model, images, dtype, repeats):
+    device = images.device
+    with torch.autocast(device_type=device.type, dtype=dtype, enabled=dtype != torch.float32):
+        memory = peak_memory(lambda: model(images), device)
+        model(images)  # warm-up
+        if device.type == "cuda":
+            torch.cuda.synchronize()
+        start = time.perf_counter()
+        for _ in range(repeats):
+            model(images)
+        if device.type == "cuda":
+            torch.cuda.synchronize()
+    return memory, (time.perf_counter() - start) / repeats
+
+
+def main():
+    args = parse_args()
+    device = torch.device(args.device)
+    dtype = getattr(torch, args.dtype)
+
+    _URL = "https://huggingface.co/facebook/VGGT-1B/resolve/main/model.pt"
+    enabled = {f"enable_{head}": head not in args.disable for head in ("camera", "point", "depth", "track")}
+    model = VGGT.from_state_dict(torch.hub.load_state_dict_from_url(_URL), **enabled).to(device).eval()
+
+    H, W = (int(v) for v in args.image_size.split("x"))
+    images = torch.rand(args.frames, 3, H, W, device=device)
+
+    depth = model.aggregator.depth
+    consumed = model.get_output_layers(with_track=False)  # no query points
+    model.output_layers = list(range(depth))
+    all_memory, all_time = run(model, images, dtype, args.repeats)
+    model.output_layers = None
+    consumed_memory, consumed_time = run(model, images, dtype, args.repeats)
+
+    print(f"{args.frames} frames of {H}x{W}, {args.dtype} on {args.device}, consumed layers {consumed}")
+    print(f"all {depth} layers:      peak memory {all_memory / 2**20:9.1f} MiB, {all_time:.3f} s per forward")
+    print(
+        f"{len(consumed)} consumed layers: peak memory {consumed_memory / 2**20:9.1f} MiB, "
+        f"{consumed_time:.3f} s per forward"
+    )
+    print(f"saved:              {(all_memory - consumed_memory) / 2**20:9.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
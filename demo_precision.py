@@ -0,0 +1,102 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+import argparse
+import glob
+import os
+
+import torch
+
+from vggt.models.vggt import VGGT
+from vggt.utils.load_fn import load_and_preprocess_images
+from vggt.utils.precision import PrecisionPolicy, validate_precision_policy
+
+
+# Drift and latency of per-head precision policies against float32 heads, on the example scenes, and the
+# fastest policy within tolerance:
+#   python demo_precision.py --scenes examples/kitchen examples/room --max_frames 8 --depth_tol 0.005
+
+
+CANDIDATE_POLICIES = {
+    "fp32 heads": PrecisionPolicy.uniform("fp32"),
+    "bf16 dpt": PrecisionPolicy(depth="bf16", point="bf16"),
+    "bf16 all": PrecisionPolicy.uniform("bf16"),
+    "bf16 all, no fp32 ops": PrecisionPolicy.uniform("bf16", fp32_ops=()),
+    "fp16 dpt": PrecisionPolicy(depth="fp16", point="fp16"),
+    "fp16 all": PrecisionPolicy.uniform("fp16"),
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Pick the fastest per-head precision policy within tolerance")
+    parser.add_argument(
+        "--scenes",
+        type=str,
+        nargs="+",
+        default=["examples/kitchen", "examples/room", "examples/llff_fern", "examples/llff_flower"],
+        help="Scene folders, each with an images/ subfolder",
+    )
+    parser.add_argument("--max_frames", type=int, default=8, help="Maximum number of frames per scene")
+    parser.add_argument("--device", type=str, default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--rotation_tol", type=float, default=0.1, help="Maximum rotation error in degrees")
+    parser.add_argument("--depth_tol", type=float, default=0.005, help="Maximum depth AbsRel")
+    parser.add_argument("--points_tol", type=float, default=0.005, help="Maximum relative world point error")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    device = torch.device(args.device)
+    # bfloat16 aggregator where supported, as in the other demos
+    dtype = torch.bfloat16
+    if device.type == "cuda" and torch.cuda.get_device_capability()[0] < 8:
+        dtype = torch.float16
+
+    print("Initializing and loading VGGT model...")
+    _URL = "https://huggingface.co/facebook/VGGT-1B/resolve/main/model.pt"
+    model = VGGT.from_state_dict(torch.hub.load_state_dict_from_url(_URL), enable_track=False).to(device)
+
+    scenes = []
+    for scene in args.scenes:
+        image_paths = sorted(glob.glob(os.path.join(scene, "images", "*")))[: args.max_frames]
+        if not image_paths:
+            print(f"No images found in {scene}, skipping")
+            continue
+        scenes.append(load_and_preprocess_images(image_paths).to(device))
+
+    tolerances = {
+        "rotation_error_deg": args.rotation_tol,
+        "depth_abs_rel": args.depth_tol,
+        "points_error_rel": args.points_tol,
+    }
+
+    header = f"{'policy':<24}{'time s':>9}{'speedup':>9}{'rot deg':>9}{'trans':>9}{'depth':>9}{'points':>9}{'pass':>6}"
+    print(header)
+    print("-" * len(header))
+
+    best = None
+    for name, policy in CANDIDATE_POLICIES.items():
+        report = validate_precision_policy(
+            model, policy, scenes, autocast_dtype=dtype, tolerances=tolerances, repeats=args.repeats
+        )
+        print(
+            f"{name:<24}{report['time']:>9.3f}{report['fp32_time'] / report['time']:>8.2f}x"
+            f"{report['rotation_error_deg']:>9.3f}{report['translation_error_rel']:>9.4f}"
+            f"{report['depth_abs_rel']:>9.4f}{report['points_error_rel']:>9.4f}{'yes' if report['passed'] else 'no':>6}"
+        )
+        if report["passed"] and (best is None or report["time"] < best[1]):
+            best = (name, report["time"])
+
+    print("Worst values over the scenes; trans, points: relative error; depth: AbsRel on the confident pixels")
+    if best is None:
+        print("No policy within tolerance")
+    else:
+        print(f"Fastest policy within tolerance: {best[0]} ({CANDIDATE_POLICIES[best[0]]})")
+
+
+if __name__ == "__main__":
+    main()
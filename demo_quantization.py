@@ -0,0 +1,86 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+import argparse
+import glob
+import os
+import time
+
+import torch
+
+from vggt.models.vggt import VGGT
+from vggt.utils.load_fn import load_and_preprocess_images
+from vggt.utils.quantization import compare_predictions, model_size_bytes, quantize_model_int8
+
+
+# Accuracy-vs-speed report of the int8 CPU inference mode against the float32 model, on the example scenes:
+#   python demo_quantization.py --scenes examples/kitchen examples/room --max_frames 8
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare dynamic int8 CPU inference to float32")
+    parser.add_argument(
+        "--scenes",
+        type=str,
+        nargs="+",
+        default=["examples/kitchen", "examples/room", "examples/llff_fern", "examples/llff_flower"],
+        help="Scene folders, each with an images/ subfolder",
+    )
+    parser.add_argument("--max_frames", type=int, default=8, help="Maximum number of frames per scene")
+    parser.add_argument("--num_threads", type=int, default=None, help="Number of CPU threads (torch default if None)")
+    return parser.parse_args()
+
+
+def timed_forward(model, images):
+    start = time.perf_counter()
+    with torch.no_grad():
+        predictions = model(images)
+    return predictions, time.perf_counter() - start
+
+
+def main():
+    args = parse_args()
+    if args.num_threads is not None:
+        torch.set_num_threads(args.num_threads)
+
+    print("Initializing and loading VGGT model...")
+    _URL = "https://huggingface.co/facebook/VGGT-1B/resolve/main/model.pt"
+    model = VGGT.from_state_dict(torch.hub.load_state_dict_from_url(_URL), enable_track=False)
+
+    quantized_model = quantize_model_int8(model)
+    print(f"Weights: float32 {model_size_bytes(model) / 2**20:.0f} MiB, int8 {model_size_bytes(quantized_model) / 2**20:.0f} MiB")
+    print(f"Threads: {torch.get_num_threads()}")
+
+    header = f"{'scene':<16}{'frames':>7}{'fp32 s':>9}{'int8 s':>9}{'speedup':>9}{'rot deg':>9}{'trans':>9}{'fov':>9}{'depth':>9}"
+    print(header)
+    print("-" * len(header))
+
+    for scene in args.scenes:
+        image_paths = sorted(glob.glob(os.path.join(scene, "images", "*")))[: args.max_frames]
+        if not image_paths:
+            print(f"No images found in {scene}, skipping")
+            continue
+        images = load_and_preprocess_images(image_paths)
+
+        # Warm-up run, so that the timings do not include one-off allocations
+        timed_forward(model, images[:1])
+        timed_forward(quantized_model, images[:1])
+
+        reference, fp32_time = timed_forward(model, images)
+        predictions, int8_time = timed_forward(quantized_model, images)
+        metrics = compare_predictions(reference, predictions)
+
+        print(
+            f"{os.path.basename(scene.rstrip('/')):<16}{len(image_paths):>7}{fp32_time:>9.2f}{int8_time:>9.2f}"
+            f"{fp32_time / int8_time:>8.2f}x{metrics['rotation_error_deg']:>9.3f}"
+            f"{metrics['translation_error_rel']:>9.4f}{metrics['fov_error_rel']:>9.4f}{metrics['depth_abs_rel']:>9.4f}"
+        )
+
+    print("trans, fov: mean relative error; depth: AbsRel on the 50% most confident pixels of the float32 model")
+
+
+if __name__ == "__main__":
+    main()
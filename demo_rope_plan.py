@@ -0,0 +1,76 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+import argparse
+import time
+
+import torch
+
+from vggt.layers.rope import RopePlan, RotaryPositionEmbedding2D, PositionGetter
+from vggt.utils.memory import peak_memory
+
+
+# Micro-benchmark of the RoPE cost of one attention block of VGGT-1B (16 heads of 64 features), with the
+# per-block RoPE module (q and k rotated separately, tables gathered in every block) vs. the RoPE plan
+# built once per forward pass, and the peak memory of each (max_memory_allocated on CUDA, the peak resident set
+# size on CPU, which also counts memory kept by the allocator):
+#   python demo_rope_plan.py --device cuda --frames 8 --image_size 518x518
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark per-block RoPE vs. a shared RoPE plan")
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--dtype", type=str, default="float32", choices=["float32", "float16", "bfloat16"])
+    parser.add_argument("--frames", type=int, default=8)
+    parser.add_argument("--image_size", type=str, default="518x518", help="HxW")
+    parser.add_argument("--repeats", type=int, default=10)
+    return parser.parse_args()
+
+
+def latency(fn, device, repeats):
+    fn()  # warm-up, fills the frequency caches
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    args = parse_args()
+    device = torch.device(args.device)
+    dtype = getattr(torch, args.dtype)
+    H, W = (int(v) for v in args.image_size.split("x"))
+    patch_size, patch_start_idx, num_heads, head_dim = 14, 5, 16, 64
+
+    # Positions as built by the aggregator: patch grid offset by one, special tokens at 0
+    pos = PositionGetter()(args.frames, H // patch_size, W // patch_size, device=device) + 1
+    pos = torch.cat([torch.zeros(args.frames, patch_start_idx, 2, device=device, dtype=pos.dtype), pos], dim=1)
+    P = pos.shape[1]
+
+    rope = RotaryPositionEmbedding2D(frequency=100)
+    q = torch.randn(args.frames, num_heads, P, head_dim, device=device, dtype=dtype)
+    k = torch.randn_like(q)
+
+    per_block = latency(lambda: (rope(q, pos), rope(k, pos)), device, args.repeats)
+    per_block_memory = peak_memory(lambda: (rope(q, pos), rope(k, pos)), device)
+    plan = RopePlan(rope, pos[0], head_dim, max_position=max(H, W) // patch_size + 1)
+    with_plan = latency(lambda: plan.apply(q, k), device, args.repeats)
+    with_plan_memory = peak_memory(lambda: plan.apply(q, k), device)
+
+    error = (plan.apply(q, k)[0] - rope(q, pos)).abs().max().item()
+    print(f"{args.frames} frames of {P} tokens, {args.dtype} on {args.device} (max abs difference {error:.2e})")
+    print(f"per-block RoPE: {per_block * 1e3:8.2f} ms per block, peak memory {per_block_memory / 2**20:8.1f} MiB")
+    print(f"RoPE plan:      {with_plan * 1e3:8.2f} ms per block, peak memory {with_plan_memory / 2**20:8.1f} MiB")
+    print(f"saved:          {(per_block - with_plan) * 1e3:8.2f} ms per block, "
+          f"{(per_block - with_plan) * 48 * 1e3:.1f} ms per forward (48 blocks)")
+
+
+if __name__ == "__main__":
+    main()
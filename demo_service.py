@@ -0,0 +1,139 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+import argparse
+import asyncio
+import io
+import logging
+import time
+
+import numpy as np
+import torch
+
+from vggt.models.vggt import VGGT
+from vggt.utils.inference_service import InferenceService, make_http_handler, serve
+
+
+# Example request, with images readable by the service:
+#   curl -X POST -H "Content-Type: application/json" \
+#        -d '{"image_paths": ["examples/kitchen/images/00.png", "examples/kitchen/images/01.png"]}' \
+#        http://127.0.0.1:8000/predict -o predictions.npz
+#
+# Load test of the service (started in this process) with concurrent clients posting random scenes, reporting
+# the throughput and the p50/p99 request latency:
+#   python demo_service.py --benchmark --num_requests 64 --concurrency 16 --frames 4 --image_size 350x518
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="VGGT local inference service with dynamic batching")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Host to listen on")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
+    parser.add_argument("--unix_socket", type=str, default=None, help="Listen on this Unix socket instead of TCP")
+    parser.add_argument("--max_batch_size", type=int, default=8, help="Maximum number of scenes per batch")
+    parser.add_argument(
+        "--max_wait_ms", type=float, default=10.0, help="How long a scene waits for compatible scenes to batch with"
+    )
+    parser.add_argument("--benchmark", action="store_true", help="Run the load generator instead of serving")
+    parser.add_argument("--num_requests", type=int, default=64, help="Benchmark: total number of requests")
+    parser.add_argument("--concurrency", type=int, default=16, help="Benchmark: number of concurrent clients")
+    parser.add_argument("--frames", type=int, default=4, help="Benchmark: frames per scene")
+    parser.add_argument("--image_size", type=str, default="350x518", help="Benchmark: HxW of the scenes")
+    return parser.parse_args()
+
+
+async def post_predict(host: str, port: int, body: bytes) -> bytes:
+    """Minimal HTTP client: POST a .npy body to /predict and return the response body."""
+    reader, writer = await asyncio.open_connection(host, port)
+    header = (
+        "POST /predict HTTP/1.1\r\n"
+        f"Host: {host}\r\n"
+        "Content-Type: application/octet-stream\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n"
+    )
+    writer.write(header.encode("latin-1") + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, content = response.partition(b"\r\n\r\n")
+    status = head.split(b"\r\n", 1)[0].decode("latin-1")
+    if " 200 " not in status:
+        raise RuntimeError(f"{status}: {content.decode(errors='replace')}")
+    return content
+
+
+async def run_load(host: str, port: int, body: bytes, num_requests: int, concurrency: int):
+    """Send num_requests requests from concurrency clients, returns the latencies (s) and the total time (s)."""
+    latencies = []
+    remaining = iter(range(num_requests))
+
+    async def client():
+        for _ in remaining:
+            start = time.perf_counter()
+            await post_predict(host, port, body)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - start
+
+
+async def benchmark(service: InferenceService, args):
+    H, W = (int(v) for v in args.image_size.split("x"))
+    images = (np.random.rand(args.frames, 3, H, W) * 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    np.save(buffer, images)
+    body = buffer.getvalue()
+
+    await service.start()
+    server = await asyncio.start_server(make_http_handler(service), host=args.host, port=args.port)
+    try:
+        # Warm-up, e.g., CUDA context and kernel selection
+        await post_predict(args.host, args.port, body)
+        latencies, total = await run_load(args.host, args.port, body, args.num_requests, args.concurrency)
+    finally:
+        server.close()
+        await server.wait_closed()
+        await service.stop()
+
+    latencies = np.array(latencies) * 1000
+    print(
+        f"{args.num_requests} requests of {args.frames} frames ({H}x{W}), {args.concurrency} concurrent clients, "
+        f"max batch size {service.max_batch_size}"
+    )
+    throughput = args.num_requests / total
+    print(f"throughput: {throughput:.2f} requests/s ({throughput * args.frames:.1f} frames/s)")
+    print(f"latency: p50 {np.percentile(latencies, 50):.1f} ms, p99 {np.percentile(latencies, 99):.1f} ms")
+    print(f"mean batch size: {service.num_scenes / service.num_batches:.2f} scenes")
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    if device == "cuda":
+        # bfloat16 is supported on Ampere GPUs (Compute Capability 8.0+)
+        dtype = torch.bfloat16 if torch.cuda.get_device_capability()[0] >= 8 else torch.float16
+    else:
+        dtype = torch.float32
+
+    print("Initializing and loading VGGT model...")
+    _URL = "https://huggingface.co/facebook/VGGT-1B/resolve/main/model.pt"
+    model = VGGT.from_state_dict(torch.hub.load_state_dict_from_url(_URL))
+    model.eval()
+    model = model.to(device)
+
+    service = InferenceService(
+        model, device=device, dtype=dtype, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms
+    )
+    if args.benchmark:
+        asyncio.run(benchmark(service, args))
+    else:
+        asyncio.run(serve(service, host=args.host, port=args.port, unix_socket=args.unix_socket))
+
+
+if __name__ == "__main__":
+    main()
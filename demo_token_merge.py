@@ -0,0 +1,109 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+import argparse
+import glob
+import os
+import time
+
+import torch
+
+from vggt.models.vggt import VGGT
+from vggt.utils.load_fn import load_and_preprocess_images
+from vggt.utils.quantization import compare_predictions
+
+
+# Accuracy/throughput trade-off of token merging before the global blocks (Aggregator.token_merge_ratio):
+# pose and depth error against the unmerged model, and throughput, for each merge ratio on the example scenes:
+#   python demo_token_merge.py --scenes examples/kitchen examples/room --max_frames 16 --ratios 0.1 0.2 0.3 0.5
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Accuracy vs. throughput of ToMe-style token merging")
+    parser.add_argument(
+        "--scenes",
+        type=str,
+        nargs="+",
+        default=["examples/kitchen", "examples/room", "examples/llff_fern", "examples/llff_flower"],
+        help="Scene folders, each with an images/ subfolder",
+    )
+    parser.add_argument("--max_frames", type=int, default=16, help="Maximum number of frames per scene")
+    parser.add_argument("--ratios", type=float, nargs="+", default=[0.1, 0.2, 0.3, 0.4, 0.5])
+    parser.add_argument("--device", type=str, default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--repeats", type=int, default=3)
+    return parser.parse_args()
+
+
+@torch.no_grad()
+def timed_forward(model, images, dtype, repeats):
+    device_type = images.device.type
+    with torch.autocast(device_type=device_type, dtype=dtype, enabled=dtype != torch.float32):
+        model(images)  # warm-up
+        if device_type == "cuda":
+            torch.cuda.synchronize()
+        start = time.perf_counter()
+        for _ in range(repeats):
+            predictions = model(images)
+        if device_type == "cuda":
+            torch.cuda.synchronize()
+    return predictions, (time.perf_counter() - start) / repeats
+
+
+def main():
+    args = parse_args()
+    device = torch.device(args.device)
+    if device.type == "cuda":
+        dtype = torch.bfloat16 if torch.cuda.get_device_capability()[0] >= 8 else torch.float16
+    else:
+        dtype = torch.float32
+
+    print("Initializing and loading VGGT model...")
+    _URL = "https://huggingface.co/facebook/VGGT-1B/resolve/main/model.pt"
+    model = VGGT.from_state_dict(
+        torch.hub.load_state_dict_from_url(_URL), enable_point=False, enable_track=False
+    ).to(device)
+    model.eval()
+
+    scenes = []
+    for scene in args.scenes:
+        image_paths = sorted(glob.glob(os.path.join(scene, "images", "*")))[: args.max_frames]
+        if not image_paths:
+            print(f"No images found in {scene}, skipping")
+            continue
+        scenes.append(load_and_preprocess_images(image_paths).to(device))
+    num_frames = sum(len(images) for images in scenes)
+
+    # Unmerged reference
+    model.aggregator.token_merge_ratio = 0.0
+    references, reference_time = [], 0.0
+    for images in scenes:
+        predictions, scene_time = timed_forward(model, images, dtype, args.repeats)
+        references.append(predictions)
+        reference_time += scene_time
+
+    header = f"{'ratio':<8}{'frames/s':>10}{'speedup':>9}{'rot deg':>9}{'trans':>9}{'depth':>9}"
+    print(header)
+    print("-" * len(header))
+    print(f"{0.0:<8}{num_frames / reference_time:>10.2f}{1.0:>8.2f}x{0.0:>9.3f}{0.0:>9.4f}{0.0:>9.4f}")
+
+    for ratio in args.ratios:
+        model.aggregator.token_merge_ratio = ratio
+        total_time, worst = 0.0, {}
+        for images, reference in zip(scenes, references):
+            predictions, scene_time = timed_forward(model, images, dtype, args.repeats)
+            total_time += scene_time
+            for metric, value in compare_predictions(reference, predictions).items():
+                worst[metric] = max(worst.get(metric, 0.0), value)
+        print(
+            f"{ratio:<8}{num_frames / total_time:>10.2f}{reference_time / total_time:>8.2f}x"
+            f"{worst['rotation_error_deg']:>9.3f}{worst['translation_error_rel']:>9.4f}{worst['depth_abs_rel']:>9.4f}"
+        )
+
+    print("Worst values over the scenes against the unmerged model; trans: relative error; depth: AbsRel")
+
+
+if __name__ == "__main__":
+    main()
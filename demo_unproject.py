@@ -0,0 +1,85 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+import argparse
+import time
+
+import numpy as np
+import torch
+
+from vggt.utils.geometry import depth_to_world_coords_points, unproject_depth_map_to_point_map
+from vggt.utils.pose_enc import pose_encoding_to_extri_intri
+
+
+# Benchmark of the depth unprojection to world points: per-frame loop (depth_to_world_coords_points) vs.
+# the batched unproject_depth_map_to_point_map on numpy arrays and on torch tensors (with a reused output
+# buffer), on random depth maps and cameras:
+#   python demo_unproject.py --frames 200 --image_size 518x518 --device cuda
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark per-frame vs. batched depth unprojection")
+    parser.add_argument("--device", type=str, default="cpu", help="Device of the torch run")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--image_size", type=str, default="518x518", help="HxW")
+    parser.add_argument("--repeats", type=int, default=3)
+    return parser.parse_args()
+
+
+def latency(fn, device, repeats):
+    result = fn()  # warm-up, fills the pixel coordinate cache
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = fn()
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    return result, (time.perf_counter() - start) / repeats
+
+
+def main():
+    args = parse_args()
+    device = torch.device(args.device)
+    H, W = (int(v) for v in args.image_size.split("x"))
+    S = args.frames
+
+    pose_enc = torch.randn(1, S, 9) * 0.3
+    pose_enc[..., 7:] = 1.0  # field of view of about 57 degrees
+    extrinsic, intrinsic = pose_encoding_to_extri_intri(pose_enc, (H, W))
+    extrinsic, intrinsic = extrinsic[0].numpy(), intrinsic[0].numpy()
+    depth = np.random.rand(S, H, W, 1).astype(np.float32) + 0.5
+
+    def per_frame():
+        return np.stack(
+            [depth_to_world_coords_points(depth[i, ..., 0], extrinsic[i], intrinsic[i])[0] for i in range(S)]
+        )
+
+    cpu = torch.device("cpu")
+    reference, loop_time = latency(per_frame, cpu, args.repeats)
+    points, numpy_time = latency(
+        lambda: unproject_depth_map_to_point_map(depth, extrinsic, intrinsic), cpu, args.repeats
+    )
+    numpy_error = np.abs(points - reference).max()
+    del points
+
+    depth_t = torch.from_numpy(depth).to(device)
+    extrinsic_t = torch.from_numpy(extrinsic).to(device)
+    intrinsic_t = torch.from_numpy(intrinsic).to(device)
+    out = torch.empty(S, H, W, 3, device=device)
+    points, torch_time = latency(
+        lambda: unproject_depth_map_to_point_map(depth_t, extrinsic_t, intrinsic_t, out=out), device, args.repeats
+    )
+    torch_error = np.abs(points.cpu().numpy() - reference).max()
+
+    print(f"{S} frames of {H}x{W}, {torch.get_num_threads()} CPU threads")
+    print(f"per-frame loop (numpy):      {loop_time:.3f} s")
+    print(f"batched (numpy):             {numpy_time:.3f} s ({loop_time / numpy_time:.1f}x), max abs diff {numpy_error:.1e}")
+    print(f"batched (torch, {device.type}, out): {torch_time:.3f} s ({loop_time / torch_time:.1f}x), max abs diff {torch_error:.1e}")
+
+
+if __name__ == "__main__":
+    main()
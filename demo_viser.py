@@ -29,6 +29,7 @@ from vggt.models.vggt import VGGT
 from vggt.utils.load_fn import load_and_preprocess_images
 from vggt.utils.geometry import closed_form_inverse_se3, unproject_depth_map_to_point_map
 from vggt.utils.pose_enc import pose_encoding_to_extri_intri
+from vggt.utils.prediction_store import PredictionStore, save_predictions
 
 
 def viser_wrapper(
@@ -44,7 +45,7 @@ def viser_wrapper(
     Visualize predicted 3D points and camera poses with viser.
 
     Args:
-        pred_dict (dict):
+        pred_dict (dict or PredictionStore):
             {
                 "images": (S, 3, H, W)   - Input images,
                 "world_points": (S, H, W, 3),
@@ -66,24 +67,20 @@ def viser_wrapper(
     server = viser.ViserServer(host="0.0.0.0", port=port)
     server.gui.configure_theme(titlebar_content=None, control_layout="collapsible")
 
-    # Unpack prediction dict
-    images = pred_dict["images"]  # (S, 3, H, W)
-    world_points_map = pred_dict["world_points"]  # (S, H, W, 3)
-    conf_map = pred_dict["world_points_conf"]  # (S, H, W)
+    # Unpack prediction dict (a PredictionStore only reads the arrays used below)
+    images = np.asarray(pred_dict["images"], dtype=np.float32)  # (S, 3, H, W)
 
-    depth_map = pred_dict["depth"]  # (S, H, W, 1)
-    depth_conf = pred_dict["depth_conf"]  # (S, H, W)
-
-    extrinsics_cam = pred_dict["extrinsic"]  # (S, 3, 4)
-    intrinsics_cam = pred_dict["intrinsic"]  # (S, 3, 3)
+    extrinsics_cam = np.asarray(pred_dict["extrinsic"])  # (S, 3, 4)
+    intrinsics_cam = np.asarray(pred_dict["intrinsic"])  # (S, 3, 3)
 
     # Compute world points from depth if not using the precomputed point map
     if not use_point_map:
+        depth_map = np.asarray(pred_dict["depth"], dtype=np.float32)  # (S, H, W, 1)
         world_points = unproject_depth_map_to_point_map(depth_map, extrinsics_cam, intrinsics_cam)
-        conf = depth_conf
+        conf = np.asarray(pred_dict["depth_conf"], dtype=np.float32)  # (S, H, W)
     else:
-        world_points = world_points_map
-        conf = conf_map
+        world_points = np.asarray(pred_dict["world_points"], dtype=np.float32)  # (S, H, W, 3)
+        conf = np.asarray(pred_dict["world_points_conf"], dtype=np.float32)  # (S, H, W)
 
     # Apply sky segmentation if enabled
     if mask_sky and image_folder is not None:
@@ -316,44 +313,31 @@ parser.add_argument(
     "--conf_threshold", type=float, default=25.0, help="Initial percentage of low-confidence points to filter out"
 )
 parser.add_argument("--mask_sky", action="store_true", help="Apply sky segmentation to filter out sky points")
+parser.add_argument(
+    "--predictions_dir",
+    type=str,
+    default=None,
+    help="Prediction store: visualized without running the model if it exists, otherwise written after inference",
+)
 
 
-def main():
+def run_model(image_folder: str, device: str) -> dict:
     """
-    Main function for the VGGT demo with viser for 3D visualization.
-
-    This function:
-    1. Loads the VGGT model
-    2. Processes input images from the specified folder
-    3. Runs inference to generate 3D points and camera poses
-    4. Optionally applies sky segmentation to filter out sky points
-    5. Visualizes the results using viser
-
-    Command-line arguments:
-    --image_folder: Path to folder containing input images
-    --use_point_map: Use point map instead of depth-based points
-    --background_mode: Run the viser server in background mode
-    --port: Port number for the viser server
-    --conf_threshold: Initial percentage of low-confidence points to filter out
-    --mask_sky: Apply sky segmentation to filter out sky points
+    Run VGGT on the images of image_folder and return the predictions as numpy arrays without batch dimension,
+    with the extrinsic and intrinsic matrices.
     """
-    args = parser.parse_args()
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    print(f"Using device: {device}")
-
     print("Initializing and loading VGGT model...")
     # model = VGGT.from_pretrained("facebook/VGGT-1B")
 
-    model = VGGT()
     _URL = "https://huggingface.co/facebook/VGGT-1B/resolve/main/model.pt"
-    model.load_state_dict(torch.hub.load_state_dict_from_url(_URL))
+    model = VGGT.from_state_dict(torch.hub.load_state_dict_from_url(_URL))
 
     model.eval()
     model = model.to(device)
 
     # Use the provided image folder path
-    print(f"Loading images from {args.image_folder}...")
-    image_names = glob.glob(os.path.join(args.image_folder, "*"))
+    print(f"Loading images from {image_folder}...")
+    image_names = glob.glob(os.path.join(image_folder, "*"))
     print(f"Found {len(image_names)} images")
 
     images = load_and_preprocess_images(image_names).to(device)
@@ -376,6 +360,42 @@ def main():
         if isinstance(predictions[key], torch.Tensor):
             predictions[key] = predictions[key].cpu().numpy().squeeze(0)  # remove batch dimension and convert to numpy
 
+    return predictions
+
+
+def main():
+    """
+    Main function for the VGGT demo with viser for 3D visualization.
+
+    This function:
+    1. Loads the VGGT model
+    2. Processes input images from the specified folder
+    3. Runs inference to generate 3D points and camera poses
+    4. Optionally applies sky segmentation to filter out sky points
+    5. Visualizes the results using viser
+
+    Command-line arguments:
+    --image_folder: Path to folder containing input images
+    --use_point_map: Use point map instead of depth-based points
+    --background_mode: Run the viser server in background mode
+    --port: Port number for the viser server
+    --conf_threshold: Initial percentage of low-confidence points to filter out
+    --mask_sky: Apply sky segmentation to filter out sky points
+    --predictions_dir: Prediction store to visualize, or to write after inference
+    """
+    args = parser.parse_args()
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    print(f"Using device: {device}")
+
+    if args.predictions_dir is not None and os.path.isdir(args.predictions_dir):
+        print(f"Loading predictions from {args.predictions_dir}...")
+        predictions = PredictionStore(args.predictions_dir)
+    else:
+        predictions = run_model(args.image_folder, device)
+        if args.predictions_dir is not None:
+            print(f"Saving predictions to {args.predictions_dir}...")
+            save_predictions(args.predictions_dir, predictions, half=True)
+
     if args.use_point_map:
         print("Visualizing 3D points from point map")
     else:
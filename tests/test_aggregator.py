@@ -0,0 +1,59 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+import torch
+
+from vggt.models.aggregator import compute_frame_graph
+
+from tests.tiny_vggt import random_scene, tiny_vggt
+
+
+def test_frame_graph_neighbours():
+    # Frames on an arc: the most similar frames of a frame are its nearest frames on the arc
+    angles = torch.tensor([0.0, 0.1, 0.3, 0.6, 1.0, 1.5])
+    features = torch.stack([angles.cos(), angles.sin()], dim=-1)[None]
+    graph = compute_frame_graph(features, k=2)
+
+    # The frame itself, the reference frame, then the k most similar other frames
+    assert graph.shape == (1, 6, 4)
+    assert graph[0, 1].tolist() == [1, 0, 2, 3]
+    assert graph[0, 3].tolist() == [3, 0, 2, 4]
+    assert graph[0, 5].tolist() == [5, 0, 4, 3]
+    # The reference frame gets k + 1 most similar frames, without duplicates
+    assert graph[0, 0].tolist() == [0, 1, 2, 3]
+
+@torch.no_grad()
+def test_sparse_global_attention_returns_frame_graph():
+    model = tiny_vggt(aggregator_kwargs=dict(global_topk=1))
+    predictions = model(random_scene(5))
+    assert predictions["frame_graph"].shape == (1, 5, 3)
+    assert not hasattr(model.aggregator, "frame_graph")
+
+    # Dense global attention when every frame would attend to every other frame
+    model.aggregator.global_topk = 3
+    assert "frame_graph" not in model(random_scene(5))
+
+
+@torch.no_grad()
+def test_frame_chunks_match_full_frames():
+    # Patch embedding and frame attention in chunks of 2 frames (the last chunk has one frame)
+    model = tiny_vggt()
+    images = random_scene(5, batch_size=2)
+    reference, _ = model.aggregator(images)
+    model.aggregator.frame_chunk_size = 2
+    outputs, _ = model.aggregator(images)
+    for output, expected in zip(outputs, reference):
+        torch.testing.assert_close(output, expected)
+
+    # Same for frames with mixed sizes
+    frames = [images[0, 0], images[0, 1, :, :42], images[0, 2], images[0, 3, :, :42], images[0, 4]]
+    chunked, _, groups = model.aggregator.forward_mixed(frames)
+    model.aggregator.frame_chunk_size = None
+    full, _, _ = model.aggregator.forward_mixed(frames)
+    assert groups == [[0, 2, 4], [1, 3]]
+    for group_outputs, group_reference in zip(chunked, full):
+        for output, expected in zip(group_outputs, group_reference):
+            torch.testing.assert_close(output, expected)
@@ -0,0 +1,55 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+import pytest
+import torch
+
+from vggt.layers.attention import Attention, GrowableTensor
+
+
+@pytest.mark.parametrize("mode", ["fused", "manual", "tiled"])
+@torch.no_grad()
+def test_proportional_attention_matches_duplicated_tokens(mode):
+    # A token standing for n identical tokens gets the attention of the n tokens
+    torch.manual_seed(0)
+    attn = Attention(32, num_heads=4, fused_attn=mode == "fused", attn_block_size=3 if mode == "tiled" else None)
+    x = torch.randn(2, 6, 32)
+    repeats = torch.tensor([1, 3, 1, 2, 1, 1])
+    expanded = attn(x.repeat_interleave(repeats, dim=1))
+    merged = attn(x, token_sizes=repeats.float().expand(2, -1))
+    torch.testing.assert_close(merged, expanded[:, repeats.cumsum(0) - 1], rtol=1e-5, atol=1e-5)
+
+
+@pytest.mark.parametrize("mode", ["fused", "manual", "tiled"])
+@torch.no_grad()
+def test_packed_sequences_match_separate_attention(mode):
+    # cu_seqlens: block-diagonal attention over packed sequences, no token attends to another sequence
+    torch.manual_seed(0)
+    attn = Attention(32, num_heads=4, fused_attn=mode == "fused", attn_block_size=2 if mode == "tiled" else None)
+    x = torch.randn(1, 10, 32)
+    cu_seqlens = [0, 3, 4, 10]
+    packed = attn(x, cu_seqlens=cu_seqlens)
+    separate = torch.cat([attn(x[:, start:end]) for start, end in zip(cu_seqlens[:-1], cu_seqlens[1:])], dim=1)
+    torch.testing.assert_close(packed, separate)
+
+
+@torch.no_grad()
+def test_proportional_attention_per_sequence():
+    torch.manual_seed(0)
+    attn = Attention(32, num_heads=4)
+    x = torch.randn(1, 7, 32)
+    sizes = torch.rand(1, 7) * 3 + 1
+    packed = attn(x, cu_seqlens=[0, 3, 7], token_sizes=sizes)
+    separate = torch.cat([attn(x[:, :3], token_sizes=sizes[:, :3]), attn(x[:, 3:], token_sizes=sizes[:, 3:])], dim=1)
+    torch.testing.assert_close(packed, separate)
+
+
+def test_growable_tensor():
+    buffer = GrowableTensor(torch.arange(3.0)[None], dim=1)
+    for start in range(3, 38, 5):
+        view = buffer.append(torch.arange(start, start + 5.0)[None])
+    torch.testing.assert_close(view, torch.arange(38.0)[None])
+    assert buffer.shape == (1, 38)
@@ -0,0 +1,47 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+import pytest
+import torch
+
+from vggt.heads.camera_head import CameraHead
+
+
+@pytest.mark.parametrize("dtype", [torch.bfloat16, torch.float16])
+@pytest.mark.parametrize("tolerance", [None, 1e-3])
+def test_half_precision_weights(dtype, tolerance):
+    # The pose encodings are accumulated in float32 (fp32_activation) and fed back to half precision weights
+    torch.manual_seed(0)
+    head = CameraHead(dim_in=64, trunk_depth=1, num_heads=4).eval()
+    tokens = torch.randn(2, 3, 5, 64)
+
+    with torch.no_grad():
+        reference = head([tokens], num_iterations=4)
+        pose_enc_list = head.to(dtype)([tokens.to(dtype)], num_iterations=4, tolerance=tolerance)
+
+    assert pose_enc_list[-1].dtype == torch.float32
+    assert torch.isfinite(pose_enc_list[-1]).all()
+    torch.testing.assert_close(pose_enc_list[-1], reference[-1], atol=0.1, rtol=0.1)
+
+
+@torch.no_grad()
+def test_adaptive_refinement_iterations():
+    torch.manual_seed(0)
+    head = CameraHead(dim_in=64, trunk_depth=1, num_heads=4).eval()
+    tokens = torch.randn(2, 3, 5, 64)
+    reference = head([tokens], num_iterations=4)
+
+    # A scene stops once its update is below the tolerance: never with 0, after the second step with inf
+    for tolerance, expected in ((0.0, [4, 4]), (float("inf"), [2, 2])):
+        pose_enc_list, iterations = head([tokens], num_iterations=4, tolerance=tolerance, return_iterations=True)
+        assert iterations.tolist() == expected and iterations.device == tokens.device
+        torch.testing.assert_close(pose_enc_list[-1], reference[expected[0] - 1])
+
+    # Packed scenes are counted separately
+    _, iterations = head([tokens[:1]], cu_seqlens=[0, 1, 3], tolerance=0.0, return_iterations=True)
+    assert iterations.tolist() == [4, 4]
+
+    assert head([tokens], return_iterations=True)[1] is None
@@ -0,0 +1,37 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+
+import torch
+import torch._inductor.utils
+
+from vggt.utils.compiled_model import CompiledVGGT, compile_config
+
+from tests.tiny_vggt import random_scene, tiny_vggt
+
+
+def test_compile_config_scopes_cache_dir(tmp_path):
+    default_cache_dir = torch._inductor.utils.cache_dir()
+    environ = dict(os.environ)
+    with compile_config(cache_dir=str(tmp_path)):
+        assert torch._inductor.utils.cache_dir() == str(tmp_path)
+        assert torch._inductor.config.fx_graph_cache
+    assert torch._inductor.utils.cache_dir() == default_cache_dir
+    assert dict(os.environ) == environ
+
+
+def test_shape_key(tmp_path):
+    compiled = CompiledVGGT(tiny_vggt(), device="cpu", cache_dir=str(tmp_path))
+    images = random_scene(3, batch_size=2)
+    keys = {
+        compiled.shape_key(images),
+        compiled.shape_key(images[:1]),
+        compiled.shape_key(images, torch.zeros(2, 4, 2)),
+        compiled.shape_key(images, torch.zeros(2, 5, 2)),
+    }
+    assert len(keys) == 4
+    assert compiled.shape_key(images) == (2, 3, 56, 56, 0, "float32")
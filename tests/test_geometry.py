@@ -0,0 +1,64 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+import numpy as np
+import pytest
+import torch
+
+from vggt.utils.geometry import (
+    depth_to_world_coords_points,
+    umeyama_sim3,
+    unproject_depth_map_to_point_map,
+)
+from vggt.utils.rotation import quat_to_mat
+
+
+def test_umeyama_sim3_recovers_transform():
+    generator = torch.Generator().manual_seed(0)
+    scale = torch.tensor([0.5, 2.0, 3.0])
+    R = quat_to_mat(torch.nn.functional.normalize(torch.randn(3, 4, generator=generator), dim=-1))
+    t = torch.randn(3, 3, generator=generator)
+    src = torch.randn(3, 100, 3, generator=generator)
+    dst = scale[:, None, None] * src @ R.transpose(1, 2) + t[:, None]
+
+    est_scale, est_R, est_t = umeyama_sim3(src, dst)
+    torch.testing.assert_close(est_scale, scale)
+    torch.testing.assert_close(est_R, R)
+    torch.testing.assert_close(est_t, t)
+
+    # Outliers with zero weight are ignored
+    weights = torch.ones(3, 100)
+    weights[:, :10] = 0
+    dst[:, :10] += 10 * torch.randn(3, 10, 3, generator=generator)
+    est_scale, est_R, est_t = umeyama_sim3(src, dst, weights=weights)
+    torch.testing.assert_close(est_scale, scale)
+    torch.testing.assert_close(est_R, R)
+    torch.testing.assert_close(est_t, t)
+
+
+@pytest.mark.parametrize("backend", ["numpy", "torch"])
+def test_batched_unprojection_matches_per_frame(backend):
+    rng = np.random.default_rng(0)
+    S, H, W = 3, 6, 8
+    rotations = quat_to_mat(torch.nn.functional.normalize(torch.from_numpy(rng.standard_normal((S, 4))), dim=-1))
+    extrinsics = np.concatenate([rotations.numpy(), rng.standard_normal((S, 3, 1))], axis=-1).astype(np.float32)
+    intrinsics = np.tile(np.array([[10.0, 0, 4], [0, 12.0, 3], [0, 0, 1]], dtype=np.float32), (S, 1, 1))
+    intrinsics[1, :2, :2] *= 1.5  # a different focal length for one frame
+    depth = rng.uniform(0.5, 5, (S, H, W, 1)).astype(np.float32)
+
+    expected = np.stack(
+        [depth_to_world_coords_points(d[..., 0], e, k)[0] for d, e, k in zip(depth, extrinsics, intrinsics)]
+    )
+    as_input = torch.from_numpy if backend == "torch" else np.asarray
+
+    points = np.asarray(unproject_depth_map_to_point_map(as_input(depth), extrinsics, intrinsics))
+    assert points.dtype == np.float32
+    np.testing.assert_allclose(points, expected, rtol=1e-5, atol=1e-5)
+
+    # Depth maps without the channel dimension, written into a reused output buffer
+    out = as_input(np.empty_like(expected))
+    unproject_depth_map_to_point_map(as_input(depth[..., 0]), extrinsics, intrinsics, out=out)
+    np.testing.assert_allclose(np.asarray(out), expected, rtol=1e-5, atol=1e-5)
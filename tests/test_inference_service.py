@@ -0,0 +1,82 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+
+import pytest
+import torch
+
+from vggt.utils.inference_service import InferenceService
+
+from tests.tiny_vggt import random_scene, tiny_vggt
+
+
+@pytest.fixture(scope="module")
+def model():
+    return tiny_vggt()
+
+
+def serve_scenes(model, scenes, max_batch_size=8):
+    """Submit the scenes at once and stop the service, returning the predictions and the service."""
+
+    async def run():
+        service = InferenceService(
+            model, device="cpu", dtype=torch.float32, max_batch_size=max_batch_size, max_wait_ms=1000.0
+        )
+        await service.start()
+        predictions = await asyncio.gather(*[service.predict(images) for images in scenes])
+        await service.stop()
+        return predictions, service
+
+    return asyncio.run(run())
+
+
+def assert_matches_forward(model, scenes, predictions):
+    with torch.no_grad():
+        for images, scene_predictions in zip(scenes, predictions):
+            reference = model(images)
+            assert "images" not in scene_predictions
+            for key in ("pose_enc", "depth", "world_points"):
+                torch.testing.assert_close(scene_predictions[key], reference[key], atol=1e-4, rtol=1e-4)
+
+
+def test_batching(model):
+    # Scenes with the same size and length are stacked, up to max_batch_size
+    scenes = [random_scene(2, seed=i) for i in range(3)]
+    predictions, service = serve_scenes(model, scenes, max_batch_size=2)
+    assert service.num_batches == 2 and service.num_scenes == 3
+    assert_matches_forward(model, scenes, predictions)
+
+
+def test_ragged_batch(model):
+    # Scenes with the same size but different lengths run as one ragged batch,
+    # scenes with another size in their own batch
+    scenes = [random_scene(2, seed=0), random_scene(3, seed=1), random_scene(2, seed=2)[..., :28]]
+    predictions, service = serve_scenes(model, scenes)
+    assert service.num_batches == 2
+    assert predictions[1]["depth"].shape[:2] == (1, 3)
+    assert predictions[2]["depth"].shape[2:4] == (56, 28)
+    assert_matches_forward(model, scenes, predictions)
+
+
+def test_shutdown(model):
+    async def run():
+        service = InferenceService(model, device="cpu", dtype=torch.float32, num_cpu_workers=1)
+        with pytest.raises(RuntimeError):
+            await service.predict(random_scene(2))  # not started
+
+        await service.start()
+        # A scene submitted before stop is still served
+        pending = asyncio.ensure_future(service.predict(random_scene(2)))
+        await asyncio.sleep(0)
+        await service.stop()
+        assert (await pending)["depth"].shape[:2] == (1, 2)
+
+        with pytest.raises(RuntimeError):
+            await service.predict(random_scene(2))
+        assert service._queue.empty() and not service._backlog
+
+    asyncio.run(run())
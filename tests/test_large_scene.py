@@ -0,0 +1,48 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+import numpy as np
+import torch
+
+from vggt.utils.large_scene import align_submaps, partition_frames, transform_extrinsics_sim3
+from vggt.utils.rotation import quat_to_mat
+
+
+def random_rotation(rng):
+    quat = rng.standard_normal(4)
+    return quat_to_mat(torch.from_numpy(quat / np.linalg.norm(quat))).numpy()
+
+
+def test_align_submaps_recovers_sim3():
+    # Ground truth cameras and depths, seen by each submap in its own Sim(3) frame
+    rng = np.random.default_rng(0)
+    num_frames, H, W = 10, 8, 8
+    extrinsic = np.stack(
+        [np.concatenate([random_rotation(rng), rng.standard_normal((3, 1))], axis=-1) for _ in range(num_frames)]
+    )
+    intrinsic = np.tile(np.array([[10.0, 0, 4], [0, 10.0, 4], [0, 0, 1]]), (num_frames, 1, 1))
+    depth = rng.uniform(1, 2, (num_frames, H, W, 1))
+
+    submaps = partition_frames(num_frames, submap_size=4, overlap=2)
+    transforms = [(1.0, np.eye(3), np.zeros(3))]
+    transforms += [(rng.uniform(0.5, 2), random_rotation(rng), rng.standard_normal(3)) for _ in submaps[1:]]
+    predictions = [
+        {
+            "extrinsic": transform_extrinsics_sim3(extrinsic[idx], s, R, t),
+            "intrinsic": intrinsic[idx],
+            "depth": depth[idx] * s,
+            "depth_conf": rng.uniform(1, 2, (len(idx), H, W)),
+        }
+        for idx, (s, R, t) in zip(submaps, transforms)
+    ]
+
+    scales, rotations, translations = align_submaps(submaps, predictions, num_points=200)
+
+    # Each estimate maps the submap frame back to the first one: the inverse of the submap transform
+    for (s, R, t), est_s, est_R, est_t in zip(transforms, scales, rotations, translations):
+        np.testing.assert_allclose(est_s.item(), 1 / s, rtol=1e-4)
+        np.testing.assert_allclose(est_R.numpy(), R.T, atol=1e-4)
+        np.testing.assert_allclose(est_t.numpy(), -R.T @ t / s, atol=1e-4)
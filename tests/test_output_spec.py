@@ -0,0 +1,71 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+import pytest
+import torch
+
+from vggt.utils.output_spec import OutputSpec
+
+from tests.tiny_vggt import random_scene, tiny_vggt
+
+
+@pytest.fixture(scope="module")
+def model():
+    return tiny_vggt()
+
+
+def assert_sparse_points_match(predictions, reference, threshold):
+    # Each sparse point is a confident dense point at its (batch, frame, v, u) in the full predictions
+    b, f, v, u = predictions["sparse_indices"].long().unbind(-1)
+    points, conf = reference["world_points"][b, f, v, u], reference["world_points_conf"][b, f, v, u]
+    assert (conf > threshold).all()
+    torch.testing.assert_close(predictions["sparse_points"].float(), points, atol=1e-2, rtol=1e-3)
+    torch.testing.assert_close(predictions["sparse_conf"].float(), conf, atol=1e-2, rtol=1e-3)
+
+@torch.no_grad()
+def test_fp16_sparse_outputs(model):
+    images = random_scene(3, batch_size=2)
+    reference = model(images)
+    threshold = reference["world_points_conf"].median().item()
+
+    spec = OutputSpec(dtype="fp16", echo_images=False, sparse_conf_threshold=threshold, keep_dense=False)
+    predictions = model(images, output_spec=spec)
+    assert "images" not in predictions and "world_points" not in predictions
+    assert predictions["depth"].dtype == torch.float16 and predictions["pose_enc"].dtype == torch.float32
+    torch.testing.assert_close(predictions["depth"].float(), reference["depth"], atol=1e-2, rtol=1e-3)
+
+    num_confident = (reference["world_points_conf"] > threshold).sum().item()
+    assert predictions["sparse_indices"].shape == (num_confident, 4)
+    assert predictions["sparse_points"].dtype == torch.float16
+    assert_sparse_points_match(predictions, reference, threshold)
+
+
+@torch.no_grad()
+def test_sparse_outputs_of_partial_decoding(model):
+    # The sparse indices refer to the frames and pixels of the input images
+    images = random_scene(4)
+    reference = model(images)
+    threshold = reference["world_points_conf"].median().item()
+    spec = OutputSpec(sparse_conf_threshold=threshold)
+
+    predictions = model(images, frame_indices=[2, 0], roi=(0, 14, 56, 56), output_spec=spec)
+    assert set(predictions["sparse_indices"][:, 1].tolist()) <= {0, 2}
+    assert predictions["sparse_indices"][:, 3].min() >= 14
+    assert_sparse_points_match(predictions, reference, threshold)
+
+    predictions = model(images, frame_indices=[1, 3], roi=[(0, 0, 28, 28), None], output_spec=spec)
+    assert_sparse_points_match(predictions, reference, threshold)
+
+
+def test_fp16_clamps_out_of_range_values():
+    predictions = {"depth": torch.tensor([1.0, 1e6]), "depth_conf": torch.tensor([1.0, 1e30])}
+    predictions = OutputSpec(dtype="fp16").apply(predictions)
+    assert predictions["depth_conf"].dtype == torch.float16
+    assert torch.isfinite(predictions["depth_conf"]).all()
+    assert predictions["depth_conf"][1] == torch.finfo(torch.float16).max
+
+    with pytest.raises(ValueError):
+        OutputSpec(keep_dense=False)
@@ -0,0 +1,65 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+
+import pytest
+import torch
+import torch.nn as nn
+
+from vggt.utils.packed_checkpoint import load_packed_checkpoint, load_packed_state_dict, save_packed_checkpoint
+from vggt.utils.quantization import compare_predictions
+
+from tests.tiny_vggt import random_scene, tiny_vggt
+
+
+@pytest.fixture(scope="module")
+def model():
+    return tiny_vggt()
+
+
+@pytest.mark.parametrize("dtype", ["bfloat16", "float16"])
+@torch.no_grad()
+def test_packed_checkpoint_round_trip(model, tmp_path, dtype):
+    path = str(tmp_path / "model.safetensors")
+    save_packed_checkpoint(model.state_dict(), path, dtype=dtype)
+
+    loaded = load_packed_checkpoint(tiny_vggt(device="meta"), path)
+    loaded.init_non_persistent_buffers()
+
+    state_dict = loaded.state_dict()
+    for name, tensor in model.state_dict().items():
+        expected = tensor.to(getattr(torch, dtype)) if tensor.is_floating_point() else tensor
+        torch.testing.assert_close(state_dict[name], expected, rtol=0, atol=0, msg=name)
+
+    images = random_scene(2)
+    predictions = loaded(images.to(getattr(torch, dtype)))
+    reference = model(images)
+    assert torch.isfinite(predictions["depth"]).all()
+    torch.testing.assert_close(predictions["pose_enc"].float(), reference["pose_enc"], atol=0.1, rtol=0.1)
+
+
+@torch.no_grad()
+def test_int8_packed_checkpoint(model, tmp_path):
+    path = str(tmp_path / "model.safetensors")
+    save_packed_checkpoint(model.state_dict(), path, dtype="int8")
+
+    loaded = load_packed_checkpoint(tiny_vggt(device="meta"), path)
+    loaded.init_non_persistent_buffers()
+
+    # The int8 weights are repacked for the quantized kernels, the other weights are views of the file
+    stored, _ = load_packed_state_dict(path)
+    qkv = loaded.aggregator.global_blocks[0].attn.qkv
+    assert type(qkv) is not nn.Linear
+    torch.testing.assert_close(qkv.weight().int_repr(), stored["aggregator.global_blocks.0.attn.qkv.weight"])
+    norm = loaded.aggregator.global_blocks[0].norm1.weight
+    assert norm.untyped_storage().nbytes() == os.path.getsize(path)
+    torch.testing.assert_close(norm, model.aggregator.global_blocks[0].norm1.weight, rtol=0, atol=0)
+
+    images = random_scene(2)
+    reference, predictions = model(images), loaded(images)
+    torch.testing.assert_close(predictions["pose_enc"], reference["pose_enc"], atol=0.2, rtol=0)
+    assert compare_predictions(reference, predictions)["depth_abs_rel"] < 0.01
@@ -0,0 +1,91 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+import hashlib
+
+import torch
+
+from vggt.utils.patch_token_cache import PatchTokenCache
+
+from tests.tiny_vggt import random_scene, tiny_vggt
+
+
+@torch.no_grad()
+def test_hits_and_misses(tmp_path):
+    model = tiny_vggt()
+    cache = model.aggregator.patch_token_cache = PatchTokenCache(str(tmp_path))
+    images = random_scene(4)
+
+    model(images[:3])
+    assert (cache.hits, cache.misses) == (0, 3)
+
+    # Same content in a new tensor, plus a new frame
+    partial = model(images.clone())
+    assert (cache.hits, cache.misses) == (3, 4)
+    assert cache.stats()["entries"] == 4
+
+    # The cached tokens are rounded to float16 whether they were just embedded or read from disk
+    cached = model(images)
+    assert (cache.hits, cache.misses) == (7, 4)
+    for key in ("pose_enc", "depth", "world_points"):
+        torch.testing.assert_close(cached[key], partial[key], atol=0, rtol=0)
+
+    model.aggregator.patch_token_cache = None
+    reference = model(images)
+    for key in ("pose_enc", "depth", "world_points"):
+        torch.testing.assert_close(cached[key], reference[key], atol=1e-2, rtol=1e-2)
+
+@torch.no_grad()
+def test_frame_keys_hashed_once_per_input(tmp_path, monkeypatch):
+    model = tiny_vggt()
+    cache = PatchTokenCache(str(tmp_path))
+    images = random_scene(3, batch_size=2)
+    keys = cache.frame_keys(images, model.aggregator.patch_embed)
+    assert len(keys) == 6 and len(set(keys)) == 6
+
+    num_hashes = 0
+    blake2b = hashlib.blake2b
+
+    def counting_blake2b(*args, **kwargs):
+        nonlocal num_hashes
+        num_hashes += 1
+        return blake2b(*args, **kwargs)
+
+    monkeypatch.setattr(hashlib, "blake2b", counting_blake2b)
+    assert cache.frame_keys(images, model.aggregator.patch_embed) == keys
+    assert num_hashes == 0
+
+    # Rehashed once updated in place, or for a new tensor with the same content
+    images[0, 0] = 0.5
+    assert cache.frame_keys(images, model.aggregator.patch_embed)[1:] == keys[1:]
+    assert cache.frame_keys(images.clone(), model.aggregator.patch_embed)[1:] == keys[1:]
+    assert num_hashes == 12
+
+
+@torch.no_grad()
+def test_eviction(tmp_path):
+    model = tiny_vggt()
+    images = random_scene(4)
+    model.aggregator.patch_token_cache = PatchTokenCache(str(tmp_path / "probe"))
+    model(images[:1])
+    entry_bytes = model.aggregator.patch_token_cache.total_bytes
+
+    # Room for 3 entries: the least recently used ones are evicted
+    cache = model.aggregator.patch_token_cache = PatchTokenCache(str(tmp_path / "cache"), max_bytes=3 * entry_bytes)
+    for i in range(3):
+        model(images[i : i + 1])
+    model(images[:1])  # frame 0 becomes the most recently used
+    model(images[3:])
+    assert cache.evictions == 1 and cache.stats()["entries"] == 3
+    assert len(list((tmp_path / "cache").glob("*.npy"))) == 3
+
+    hits, misses = cache.hits, cache.misses
+    model(images[:1])
+    model(images[1:2])  # evicted
+    assert (cache.hits - hits, cache.misses - misses) == (1, 1)
+
+    # A new process sees the cached entries
+    assert PatchTokenCache(str(tmp_path / "cache"), max_bytes=3 * entry_bytes).stats()["entries"] == 3
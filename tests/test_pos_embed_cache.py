@@ -0,0 +1,43 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+import torch
+
+from vggt.layers.vision_transformer import vit_small
+from vggt.utils.pos_embed_cache import tensor_key
+
+
+def test_tensor_key_tracks_updates():
+    weight = torch.nn.Parameter(torch.zeros(4))
+    key = tensor_key(weight)
+    assert tensor_key(weight) == key
+    with torch.no_grad():
+        weight.add_(1)
+    assert tensor_key(weight) != key
+
+
+def test_tensor_key_not_reused_after_free():
+    keys = set()
+    for _ in range(8):
+        # Freed tensors of the same size are likely to be reallocated at the same address
+        keys.add(tensor_key(torch.nn.Parameter(torch.zeros(4))))
+    assert len(keys) == 8
+
+
+@torch.no_grad()
+def test_interpolated_pos_embed_follows_the_model():
+    images = torch.rand(1, 3, 28, 42)
+    outputs = []
+    for seed in range(2):
+        torch.manual_seed(seed)
+        model = vit_small(img_size=56, patch_size=14, num_register_tokens=0, block_chunks=0).eval()
+        x = model.patch_embed(images)
+        x = torch.cat((model.cls_token.expand(1, -1, -1), x), dim=1)
+        cached = model.interpolate_pos_encoding(x, 28, 42)
+        torch.testing.assert_close(cached, model._interpolate_pos_encoding(x, 28, 42))
+        outputs.append(cached)
+        del model
+    assert not torch.equal(outputs[0], outputs[1])
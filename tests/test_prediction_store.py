@@ -0,0 +1,61 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+import numpy as np
+import pytest
+import torch
+
+from vggt.utils.prediction_store import PredictionStore, PredictionWriter, load_predictions, save_predictions
+
+from tests.tiny_vggt import IMG_SIZE, random_scene, tiny_vggt
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_reopen_and_slice_across_chunks(tmp_path, compress):
+    # 7 frames appended 3 + 2 + 2 at a time, in chunks of 2 frames: [0, 1], [2, 3], [4, 5], [6]
+    frames = np.random.default_rng(0).random((7, 4, 5, 3)).astype(np.float32)
+    with PredictionWriter(str(tmp_path), frames_per_chunk=2, compress=compress) as writer:
+        for start, end in ((0, 3), (3, 5), (5, 7)):
+            writer.append("world_points", frames[start:end])
+        writer.put("pose_enc", frames[:, 0, 0])
+
+        # The complete chunks can be read while writing
+        assert PredictionStore(str(tmp_path))["world_points"].shape == (6, 4, 5, 3)
+
+    for mmap in (True, False):
+        store = PredictionStore(str(tmp_path), mmap=mmap)
+        points = store["world_points"]
+        assert len(points.chunks) == 4 and points.shape == frames.shape
+        indices = [3, -1, slice(1, 6), slice(None, None, 3), [6, 0, 3, 3], np.array([5, 2]), (4, 2), (slice(1, 4), 0)]
+        for index in indices:
+            np.testing.assert_array_equal(points[index], frames[index])
+        np.testing.assert_array_equal(points[..., 1], frames[..., 1])
+        np.testing.assert_array_equal(np.stack(list(points)), frames)
+        np.testing.assert_array_equal(store["pose_enc"], frames[:, 0, 0])
+        with pytest.raises(IndexError):
+            points[7]
+
+
+@torch.no_grad()
+def test_prediction_store_round_trip(tmp_path):
+    model = tiny_vggt()
+    predictions = model(random_scene(5))
+    arrays = {key: value[0].numpy() for key, value in predictions.items() if isinstance(value, torch.Tensor)}
+
+    save_predictions(str(tmp_path / "full"), arrays, frames_per_chunk=2)
+    loaded = load_predictions(str(tmp_path / "full"))
+    assert set(loaded) == set(arrays)
+    for key, array in arrays.items():
+        np.testing.assert_array_equal(loaded[key], array)
+
+    # Chunks streamed in float16 and compressed, read frame by frame
+    with PredictionWriter(str(tmp_path / "stream"), frames_per_chunk=2, half=True, compress=True) as writer:
+        for chunk in model.forward_stream(random_scene(5), frames_chunk_size=3):
+            writer.append("depth", chunk["depth"][0])
+    store = PredictionStore(str(tmp_path / "stream"))
+    assert store["depth"].shape == (5, IMG_SIZE, IMG_SIZE, 1) and store["depth"].dtype == np.float16
+    np.testing.assert_allclose(store["depth"][3], arrays["depth"][3], rtol=1e-3)
+    np.testing.assert_allclose(store["depth"][[4, 1]], arrays["depth"][[4, 1]], rtol=1e-3)
@@ -0,0 +1,35 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+import pytest
+import torch
+import torch.nn as nn
+
+from vggt.utils.quantization import compare_predictions, model_size_bytes, quantize_model_int8
+
+from tests.tiny_vggt import random_scene, tiny_vggt
+
+
+@torch.no_grad()
+def test_int8_quantization():
+    model = tiny_vggt()
+    quantized = quantize_model_int8(model)
+
+    # Only the linear layers of the transformer blocks are quantized, on a copy of the model
+    assert type(quantized.aggregator.global_blocks[0].attn.qkv) is not nn.Linear
+    assert type(quantized.camera_head.trunk[0].mlp.fc1) is not nn.Linear
+    assert type(quantized.depth_head.projects[0]) is nn.Conv2d
+    assert type(model.aggregator.global_blocks[0].attn.qkv) is nn.Linear
+    assert model_size_bytes(quantized) < model_size_bytes(model)
+
+    # The randomly initialized camera head amplifies the quantization error, hence the loose pose tolerance
+    images = random_scene(3)
+    reference, predictions = model(images), quantized(images)
+    torch.testing.assert_close(predictions["pose_enc"], reference["pose_enc"], atol=0.2, rtol=0)
+    assert compare_predictions(reference, predictions)["depth_abs_rel"] < 0.01
+
+    with pytest.raises(ValueError, match="eval"):
+        quantize_model_int8(model.train())
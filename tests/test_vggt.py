@@ -0,0 +1,182 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+import pytest
+import torch
+
+from vggt.models.aggregator import AggregatorCache
+
+from tests.tiny_vggt import IMG_SIZE, random_scene, tiny_vggt
+
+DENSE_KEYS = ("depth", "depth_conf", "world_points", "world_points_conf")
+
+
+@pytest.fixture(scope="module")
+def model():
+    return tiny_vggt()
+
+
+def assert_predictions_close(actual, expected, keys=None, **kwargs):
+    for key in keys if keys is not None else expected:
+        if isinstance(expected[key], torch.Tensor):
+            torch.testing.assert_close(actual[key], expected[key], msg=key, **kwargs)
+
+
+@torch.no_grad()
+def test_forward_matches_reference(model):
+    # The forward pass against the aggregator and the heads run one after another, as in the original model
+    images = random_scene(3)[None]
+    query_points = torch.rand(1, 4, 2) * IMG_SIZE
+    predictions = model(images, query_points=query_points)
+
+    tokens, patch_start_idx = model.aggregator(images)
+    pose_enc_list = model.camera_head(tokens)
+    depth, depth_conf = model.depth_head(tokens, images=images, patch_start_idx=patch_start_idx)
+    points, points_conf = model.point_head(tokens, images=images, patch_start_idx=patch_start_idx)
+    track_list, vis, conf = model.track_head(tokens, images, patch_start_idx, query_points=query_points)
+
+    reference = {
+        "pose_enc": pose_enc_list[-1],
+        "depth": depth,
+        "depth_conf": depth_conf,
+        "world_points": points,
+        "world_points_conf": points_conf,
+        "track": track_list[-1],
+        "vis": vis,
+        "conf": conf,
+        "images": images,
+    }
+    assert set(reference) <= set(predictions)
+    assert_predictions_close(predictions, reference)
+    for pose_enc, reference_pose_enc in zip(predictions["pose_enc_list"], pose_enc_list):
+        torch.testing.assert_close(pose_enc, reference_pose_enc)
+
+
+@torch.no_grad()
+def test_output_layers_override():
+    images = random_scene(2)[None]
+    depth = tiny_vggt().aggregator.depth
+
+    # All the layers: same predictions as with only the consumed layers
+    model = tiny_vggt(output_layers=list(range(depth)))
+    assert model.get_output_layers() == list(range(depth))
+    assert_predictions_close(model(images), tiny_vggt()(images))
+
+    # The DPT heads read all the layers: an override with only the last one is rejected
+    model = tiny_vggt(output_layers=[-1])
+    with pytest.raises(ValueError, match=r"miss the layers \[0, 1, 2\]"):
+        model(images)
+
+
+@torch.no_grad()
+def test_cache_matches_full_forward(model):
+    images = random_scene(5)[None]
+
+    # The first step processes all the frames
+    cache = AggregatorCache()
+    assert_predictions_close(model(images[:, :3], cache=cache), model(images[:, :3]))
+
+    # Incremental step: only the new frames are returned, attending to the cached context
+    predictions = model(images[:, 3:], cache=cache)
+    assert cache.output_start == 3 and cache.num_frames == 5
+    assert predictions["depth"].shape[1] == 2
+    torch.testing.assert_close(cache.images, images)
+
+    # A refresh re-processes all the frames seen so far
+    cache = AggregatorCache(refresh_every=1)
+    model(images[:, :3], cache=cache)
+    model(images[:, 3:4], cache=cache)
+    assert_predictions_close(model(images[:, 4:], cache=cache), model(images), atol=1e-4, rtol=1e-4)
+
+
+@torch.no_grad()
+def test_batching_matches_per_scene_forward(model):
+    scenes = [random_scene(2, seed=1), random_scene(4, seed=2), random_scene(4, seed=3)]
+    references = [model(scene) for scene in scenes]
+
+    # Ragged batch, packed without padding
+    for predictions, reference in zip(model(scenes), references):
+        assert_predictions_close(predictions, reference, atol=1e-4, rtol=1e-4)
+
+    # Scenes with the same number of frames stacked along the batch dimension
+    batch = model(torch.stack(scenes[1:]))
+    for i, reference in enumerate(references[1:]):
+        assert_predictions_close({key: value[i : i + 1] for key, value in batch.items()}, reference, keys=DENSE_KEYS)
+
+
+@torch.no_grad()
+def test_mixed_sizes_match_forward(model):
+    images = random_scene(3)
+    reference = model(images)
+    predictions = model.forward_mixed(list(images))
+    torch.testing.assert_close(predictions["pose_enc"], reference["pose_enc"], atol=1e-4, rtol=1e-4)
+    for key in DENSE_KEYS:
+        torch.testing.assert_close(torch.stack(predictions[key])[None], reference[key], atol=1e-4, rtol=1e-4)
+
+    # Frames of different sizes are run without padding
+    frames = [images[0], images[1, :, :42], images[2, :, :, :28]]
+    predictions = model.forward_mixed(frames)
+    assert [tuple(depth.shape) for depth in predictions["depth"]] == [(56, 56, 1), (42, 56, 1), (56, 28, 1)]
+
+    # Token merging is not supported, but a per-block list of zero ratios disables it
+    model.aggregator.token_merge_ratio = [0.0] * model.aggregator.depth
+    try:
+        assert [tuple(depth.shape) for depth in model.forward_mixed(frames)["depth"]][1] == (42, 56, 1)
+        model.aggregator.token_merge_ratio = [0.0, 0.2, 0.0, 0.0]
+        with pytest.raises(ValueError, match="token merging"):
+            model.forward_mixed(frames)
+    finally:
+        model.aggregator.token_merge_ratio = 0.0
+
+
+@torch.no_grad()
+def test_camera_iterations():
+    model = tiny_vggt(camera_tolerance=float("inf"))
+    predictions = model(random_scene(3, batch_size=2))
+    assert predictions["camera_iterations"].tolist() == [2, 2]
+    assert predictions["camera_iterations"].device == predictions["pose_enc"].device
+
+    scenes = [random_scene(2, seed=1), random_scene(3, seed=2)]
+    assert [p["camera_iterations"].tolist() for p in model(scenes)] == [[2], [2]]
+    assert "camera_iterations" not in tiny_vggt()(scenes[0])
+
+
+@torch.no_grad()
+def test_bf16_forward(model):
+    images = random_scene(3)
+    reference = model(images)
+    with torch.autocast("cpu", dtype=torch.bfloat16):
+        predictions = model(images)
+
+    # The heads run in float32 by default, only the aggregator in bfloat16
+    for key in DENSE_KEYS + ("pose_enc",):
+        assert predictions[key].dtype == torch.float32
+        assert torch.isfinite(predictions[key]).all()
+    torch.testing.assert_close(predictions["pose_enc"], reference["pose_enc"], atol=0.05, rtol=0.05)
+    depth_error = (predictions["depth"] - reference["depth"]).abs() / reference["depth"]
+    assert depth_error.mean() < 0.05
+
+
+@torch.no_grad()
+def test_partial_decoding_matches_full_decoding(model):
+    images = random_scene(4)
+    reference = model(images)
+
+    predictions = model(images, frame_indices=[2, 0])
+    for key in DENSE_KEYS:
+        torch.testing.assert_close(predictions[key], reference[key][:, [2, 0]])
+    torch.testing.assert_close(predictions["pose_enc"], reference["pose_enc"])
+
+    # The region of interest and its margin cover the whole image at this size, so decoding is exact
+    top, left, bottom, right = 10, 4, 40, 50
+    predictions = model(images, roi=(top, left, bottom, right))
+    for key in DENSE_KEYS:
+        torch.testing.assert_close(predictions[key], reference[key][:, :, top:bottom, left:right])
+
+    rois = [(0, 0, 28, 28), None]
+    predictions = model(images, frame_indices=[1, 3], roi=rois)
+    torch.testing.assert_close(predictions["depth"][0], reference["depth"][:, 1, :28, :28])
+    torch.testing.assert_close(predictions["depth"][1], reference["depth"][:, 3])
@@ -0,0 +1,69 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+import torch
+
+from vggt.heads.camera_head import CameraHead
+from vggt.heads.dpt_head import DPTHead
+from vggt.heads.track_head import TrackHead
+from vggt.models.aggregator import Aggregator
+from vggt.models.vggt import VGGT
+
+IMG_SIZE = 56
+PATCH_SIZE = 14
+EMBED_DIM = 64
+
+
+def tiny_vggt(device="cpu", seed=0, aggregator_kwargs=None, **kwargs) -> VGGT:
+    """
+    A VGGT with the architecture of the released model at a tiny size (4 aggregator blocks of 64 features,
+    convolutional patch embedding), in eval mode. kwargs are passed to the VGGT constructor.
+    """
+    # The full-size modules built by the constructor are never allocated
+    with torch.device("meta"):
+        model = VGGT(
+            img_size=IMG_SIZE,
+            patch_size=PATCH_SIZE,
+            embed_dim=EMBED_DIM,
+            enable_camera=False,
+            enable_point=False,
+            enable_depth=False,
+            enable_track=False,
+            **kwargs,
+        )
+
+    torch.manual_seed(seed)
+    with torch.device(device):
+        model.aggregator = Aggregator(
+            img_size=IMG_SIZE,
+            patch_size=PATCH_SIZE,
+            embed_dim=EMBED_DIM,
+            depth=4,
+            num_heads=4,
+            patch_embed="conv",
+            **(aggregator_kwargs or {}),
+        )
+        dim_in = 2 * EMBED_DIM
+        model.camera_head = CameraHead(dim_in=dim_in, trunk_depth=1, num_heads=4)
+        dpt_kwargs = dict(features=32, out_channels=[16, 32, 64, 64], intermediate_layer_idx=[0, 1, 2, 3])
+        model.point_head = DPTHead(
+            dim_in=dim_in, output_dim=4, activation="inv_log", conf_activation="expp1", **dpt_kwargs
+        )
+        model.depth_head = DPTHead(dim_in=dim_in, output_dim=2, activation="exp", conf_activation="expp1", **dpt_kwargs)
+        model.track_head = TrackHead(dim_in=dim_in, patch_size=PATCH_SIZE, features=32, hidden_size=32, corr_levels=3)
+        model.track_head.feature_extractor.intermediate_layer_idx = [0, 1, 2, 3]
+
+    # Configure the new heads
+    model.precision_policy = model.precision_policy
+    return model.eval()
+
+
+def random_scene(num_frames, seed=0, batch_size=None):
+    generator = torch.Generator().manual_seed(seed)
+    shape = (num_frames, 3, IMG_SIZE, IMG_SIZE)
+    if batch_size is not None:
+        shape = (batch_size,) + shape
+    return torch.rand(shape, generator=generator)
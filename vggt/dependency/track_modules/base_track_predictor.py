@@ -10,6 +10,7 @@ from einops import rearrange, repeat
 
 from .blocks import EfficientUpdateFormer, CorrBlock
 from .utils import sample_features4d, get_2d_embedding, get_2d_sincos_pos_embed
+from vggt.utils.pos_embed_cache import pos_embed_cache
 
 
 class BaseTrackerPredictor(nn.Module):
@@ -105,6 +106,16 @@ class BaseTrackerPredictor(nn.Module):
 
         coord_preds = []
 
+        # 2D positional embed of the feature map, shared by all the iterations
+        pos_embed = pos_embed_cache.get(
+            "track_sincos",
+            (HH, WW),
+            self.transformer_dim,
+            torch.float32,
+            query_points.device,
+            lambda: get_2d_sincos_pos_embed(self.transformer_dim, grid_size=(HH, WW)).to(query_points.device),
+        )
+
         # Iterative Refinement
         for itr in range(iters):
             # Detach the gradients from the last iteration
@@ -141,7 +152,6 @@ class BaseTrackerPredictor(nn.Module):
 
             # 2D positional embed
             # TODO: this can be much simplified
-            pos_embed = get_2d_sincos_pos_embed(self.transformer_dim, grid_size=(HH, WW)).to(query_points.device)
             sampled_pos_emb = sample_features4d(pos_embed.expand(B, -1, -1, -1), coords[:, 0])
             sampled_pos_emb = rearrange(sampled_pos_emb, "b n c -> (b n) c").unsqueeze(1)
 
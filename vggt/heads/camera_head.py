@@ -70,7 +70,18 @@ class CameraHead(nn.Module):
         self.adaln_norm = nn.LayerNorm(dim_in, elementwise_affine=False, eps=1e-6)
         self.pose_branch = Mlp(in_features=dim_in, hidden_features=dim_in // 2, out_features=self.target_dim, drop=0)
 
-    def forward(self, aggregated_tokens_list: list, num_iterations: int = 4) -> list:
+        # Accumulate and activate the pose encodings in float32 when the trunk runs in lower precision
+        self.fp32_activation = True
+
+    def forward(
+        self,
+        aggregated_tokens_list: list,
+        num_iterations: int = 4,
+        cu_seqlens: list = None,
+        tolerance: float = None,
+        keep_intermediates: bool = True,
+        return_iterations: bool = False,
+    ) -> list:
         """
         Forward pass to predict camera parameters.
 
@@ -78,9 +89,19 @@ class CameraHead(nn.Module):
             aggregated_tokens_list (list): List of token tensors from the network;
                 the last tensor is used for prediction.
             num_iterations (int, optional): Number of iterative refinement steps. Defaults to 4.
+                With a tolerance, this is the maximum number of steps.
+            cu_seqlens (list[int], optional): Cumulative frame counts of scenes packed along the sequence
+                dimension. If given, the trunk only attends across the frames of the same scene.
+            tolerance (float, optional): Inference only. If set, the refinement of a scene (batch element,
+                or packed scene) stops once the largest update of its pose encodings falls below this value,
+                and the following steps only run on the scenes still being refined.
+            keep_intermediates (bool, optional): If False, only the prediction of the last step is returned.
+            return_iterations (bool, optional): If True, also return the number of steps run for each scene.
 
         Returns:
             list: A list of predicted camera encodings (post-activation) from each iteration.
+            With return_iterations, a tuple of this list and a long tensor with the number of steps
+            run for each scene, with shape [num_scenes] on the device of the tokens (None without a tolerance).
         """
         # Use tokens from the last block for camera prediction.
         tokens = aggregated_tokens_list[-1]
@@ -89,43 +110,40 @@ class CameraHead(nn.Module):
         pose_tokens = tokens[:, :, 0]
         pose_tokens = self.token_norm(pose_tokens)
 
-        pred_pose_enc_list = self.trunk_fn(pose_tokens, num_iterations)
+        if tolerance is not None:
+            if self.training:
+                raise ValueError("Adaptive refinement (tolerance) is only supported in eval mode")
+            pred_pose_enc_list, iterations = self.adaptive_trunk_fn(
+                pose_tokens, num_iterations, tolerance, cu_seqlens, keep_intermediates
+            )
+        else:
+            pred_pose_enc_list = self.trunk_fn(pose_tokens, num_iterations, cu_seqlens=cu_seqlens)
+            if not keep_intermediates:
+                pred_pose_enc_list = pred_pose_enc_list[-1:]
+            iterations = None
+
+        if return_iterations:
+            return pred_pose_enc_list, iterations
         return pred_pose_enc_list
 
-    def trunk_fn(self, pose_tokens: torch.Tensor, num_iterations: int) -> list:
+    def trunk_fn(self, pose_tokens: torch.Tensor, num_iterations: int, cu_seqlens: list = None) -> list:
         """
         Iteratively refine camera pose predictions.
 
         Args:
             pose_tokens (torch.Tensor): Normalized camera tokens with shape [B, S, C].
             num_iterations (int): Number of refinement iterations.
+            cu_seqlens (list[int], optional): Cumulative frame counts of packed scenes.
 
         Returns:
             list: List of activated camera encodings from each iteration.
         """
-        B, S, C = pose_tokens.shape
         pred_pose_enc = None
         pred_pose_enc_list = []
 
         for _ in range(num_iterations):
-            # Use a learned empty pose for the first iteration.
-            if pred_pose_enc is None:
-                module_input = self.embed_pose(self.empty_pose_tokens.expand(B, S, -1))
-            else:
-                # Detach the previous prediction to avoid backprop through time.
-                pred_pose_enc = pred_pose_enc.detach()
-                module_input = self.embed_pose(pred_pose_enc)
-
-            # Generate modulation parameters and split them into shift, scale, and gate components.
-            shift_msa, scale_msa, gate_msa = self.poseLN_modulation(module_input).chunk(3, dim=-1)
-
-            # Adaptive layer normalization and modulation.
-            pose_tokens_modulated = gate_msa * modulate(self.adaln_norm(pose_tokens), shift_msa, scale_msa)
-            pose_tokens_modulated = pose_tokens_modulated + pose_tokens
-
-            pose_tokens_modulated = self.trunk(pose_tokens_modulated)
             # Compute the delta update for the pose encoding.
-            pred_pose_enc_delta = self.pose_branch(self.trunk_norm(pose_tokens_modulated))
+            pred_pose_enc_delta = self.trunk_step(pose_tokens, pred_pose_enc, cu_seqlens=cu_seqlens)
 
             if pred_pose_enc is None:
                 pred_pose_enc = pred_pose_enc_delta
@@ -140,6 +158,105 @@ class CameraHead(nn.Module):
 
         return pred_pose_enc_list
 
+    def trunk_step(
+        self, pose_tokens: torch.Tensor, pred_pose_enc: torch.Tensor = None, cu_seqlens: list = None
+    ) -> torch.Tensor:
+        """
+        One refinement step: the update of the (pre-activation) pose encodings [B, S, 9],
+        or the initial pose encodings if pred_pose_enc is None.
+        """
+        B, S, C = pose_tokens.shape
+
+        # Use a learned empty pose for the first iteration.
+        if pred_pose_enc is None:
+            module_input = self.embed_pose(self.empty_pose_tokens.expand(B, S, -1))
+        else:
+            # Detach the previous prediction to avoid backprop through time.
+            # The accumulated encodings may be in float32 (fp32_activation) while the weights are in half precision
+            pred_pose_enc = pred_pose_enc.detach().to(self.embed_pose.weight.dtype)
+            module_input = self.embed_pose(pred_pose_enc)
+
+        # Generate modulation parameters and split them into shift, scale, and gate components.
+        shift_msa, scale_msa, gate_msa = self.poseLN_modulation(module_input).chunk(3, dim=-1)
+
+        # Adaptive layer normalization and modulation.
+        pose_tokens_modulated = gate_msa * modulate(self.adaln_norm(pose_tokens), shift_msa, scale_msa)
+        pose_tokens_modulated = pose_tokens_modulated + pose_tokens
+
+        if cu_seqlens is None:
+            pose_tokens_modulated = self.trunk(pose_tokens_modulated)
+        else:
+            for block in self.trunk:
+                pose_tokens_modulated = block(pose_tokens_modulated, cu_seqlens=cu_seqlens)
+
+        pred_pose_enc_delta = self.pose_branch(self.trunk_norm(pose_tokens_modulated))
+        return pred_pose_enc_delta.float() if self.fp32_activation else pred_pose_enc_delta
+
+    def adaptive_trunk_fn(
+        self,
+        pose_tokens: torch.Tensor,
+        max_iterations: int,
+        tolerance: float,
+        cu_seqlens: list = None,
+        keep_intermediates: bool = True,
+    ) -> list:
+        """
+        Refine camera pose predictions until they converge, scene by scene.
+
+        A scene is a batch element, or a packed scene if cu_seqlens is given. After each step (from the
+        second one), the scenes whose largest pose encoding update is below tolerance are frozen, and the
+        next steps only process the camera tokens of the other scenes. The predictions of the intermediate
+        steps include the frozen poses.
+
+        Returns:
+            (list, torch.Tensor): Activated camera encodings [B, S, 9] after each step (only the last one if not
+            keep_intermediates), and the number of steps run for each scene, a long tensor [num_scenes].
+        """
+        B, S, C = pose_tokens.shape
+        packed = cu_seqlens is not None
+        num_scenes = len(cu_seqlens) - 1 if packed else B
+        device = pose_tokens.device
+
+        iterations_used = [0] * num_scenes
+        active = list(range(num_scenes))
+        pred_pose_enc = None
+        pred_pose_enc_list = []
+
+        for step in range(max_iterations):
+            if pred_pose_enc is None:
+                # All the scenes run the first step
+                pred_pose_enc = self.trunk_step(pose_tokens, cu_seqlens=cu_seqlens)
+                active_updates = None
+            elif packed:
+                lengths = [cu_seqlens[i + 1] - cu_seqlens[i] for i in active]
+                frames = torch.cat([torch.arange(cu_seqlens[i], cu_seqlens[i + 1]) for i in active]).to(device)
+                delta = self.trunk_step(
+                    pose_tokens[:, frames], pred_pose_enc[:, frames], cu_seqlens=[0] + np.cumsum(lengths).tolist()
+                )
+                pred_pose_enc = pred_pose_enc.index_add(1, frames, delta)
+                active_updates = [update.abs().max() for update in delta.split(lengths, dim=1)]
+            else:
+                batch_idx = torch.tensor(active, device=device)
+                delta = self.trunk_step(pose_tokens[batch_idx], pred_pose_enc[batch_idx])
+                pred_pose_enc = pred_pose_enc.index_add(0, batch_idx, delta)
+                active_updates = delta.abs().flatten(1).max(dim=1).values
+
+            for i in active:
+                iterations_used[i] += 1
+            if active_updates is not None:
+                converged = torch.stack(list(active_updates)) < tolerance
+                active = [i for i, done in zip(active, converged.tolist()) if not done]
+
+            if keep_intermediates or not active or step == max_iterations - 1:
+                activated_pose = activate_pose(
+                    pred_pose_enc, trans_act=self.trans_act, quat_act=self.quat_act, fl_act=self.fl_act
+                )
+                pred_pose_enc_list.append(activated_pose)
+            if not active:
+                break
+
+        return pred_pose_enc_list, torch.tensor(iterations_used, device=device)
+
 
 def modulate(x: torch.Tensor, shift: torch.Tensor, scale: torch.Tensor) -> torch.Tensor:
     """
@@ -8,14 +8,16 @@
 # Inspired by https://github.com/DepthAnything/Depth-Anything-V2
 
 
+import math
 import os
-from typing import List, Dict, Tuple, Union
+from typing import List, Dict, Optional, Sequence, Tuple, Union
 
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 from .head_act import activate_head
 from .utils import create_uv_grid, position_grid_to_embed
+from vggt.utils.pos_embed_cache import pos_embed_cache
 
 
 class DPTHead(nn.Module):
@@ -62,6 +64,11 @@ class DPTHead(nn.Module):
         self.feature_only = feature_only
         self.down_ratio = down_ratio
         self.intermediate_layer_idx = intermediate_layer_idx
+        # Run the output activations in float32 when the head runs in lower precision
+        self.fp32_activation = True
+        # Context decoded around a region of interest, in patches. The convolutions see zero padding at the
+        # border of the decoded window, so a smaller margin is cheaper but less faithful at the ROI border
+        self.roi_margin = 8
 
         self.norm = nn.LayerNorm(dim_in)
 
@@ -118,6 +125,8 @@ class DPTHead(nn.Module):
         images: torch.Tensor,
         patch_start_idx: int,
         frames_chunk_size: int = 8,
+        frame_indices: Optional[Sequence[int]] = None,
+        roi: Optional[Sequence] = None,
     ) -> Union[torch.Tensor, Tuple[torch.Tensor, torch.Tensor]]:
         """
         Forward pass through the DPT head, supports processing by chunking frames.
@@ -128,17 +137,49 @@ class DPTHead(nn.Module):
                 Used to separate patch tokens from other tokens (e.g., camera or register tokens).
             frames_chunk_size (int, optional): Number of frames to process in each chunk.
                 If None or larger than S, all frames are processed at once. Default: 8.
+            frame_indices (Sequence[int], optional): Frames to decode, in the order of the outputs.
+                Default: None (all the frames).
+            roi (optional): Region of interest (top, left, bottom, right) in pixels, bottom and right excluded,
+                shared by the decoded frames, or a list with one region (or None for the whole frame) per
+                decoded frame. Only the tokens covering the region, plus roi_margin patches of context, are
+                decoded. Default: None (whole frames).
 
         Returns:
             Tensor or Tuple[Tensor, Tensor]:
                 - If feature_only=True: Feature maps with shape [B, S, C, H, W]
                 - Otherwise: Tuple of (predictions, confidence) both with shape [B, S, 1, H, W]
+                With a region of interest, H and W are those of the region. With one region per frame, lists
+                with the outputs of each frame, without the frame dimension.
         """
+        if frame_indices is not None:
+            frame_indices = torch.as_tensor(frame_indices, dtype=torch.long, device=images.device)
+            images = images[:, frame_indices]
+            aggregated_tokens_list = list(aggregated_tokens_list)
+            for layer_idx in set(self.intermediate_layer_idx):
+                aggregated_tokens_list[layer_idx] = aggregated_tokens_list[layer_idx][:, frame_indices]
+
         B, S, _, H, W = images.shape
 
+        if roi is not None and not isinstance(roi[0], (int, float)):
+            # One region per frame, decoded frame by frame since the outputs have different sizes
+            if len(roi) != S:
+                raise ValueError(f"Expected one region of interest per decoded frame ({S}), got {len(roi)}")
+            outputs = []
+            for i, frame_roi in enumerate(roi):
+                frame_tokens_list = [
+                    tokens[:, i : i + 1] if tokens is not None else None for tokens in aggregated_tokens_list
+                ]
+                output = self.forward(frame_tokens_list, images[:, i : i + 1], patch_start_idx, roi=frame_roi)
+                outputs.append(output[:, 0] if self.feature_only else (output[0][:, 0], output[1][:, 0]))
+            if self.feature_only:
+                return outputs
+            return [preds for preds, _ in outputs], [conf for _, conf in outputs]
+
+        window = self._roi_window(roi, H, W) if roi is not None else None
+
         # If frames_chunk_size is not specified or greater than S, process all frames at once
         if frames_chunk_size is None or frames_chunk_size >= S:
-            return self._forward_impl(aggregated_tokens_list, images, patch_start_idx)
+            return self._forward_impl(aggregated_tokens_list, images, patch_start_idx, window=window)
 
         # Otherwise, process frames in chunks to manage memory usage
         assert frames_chunk_size > 0
@@ -153,12 +194,12 @@ class DPTHead(nn.Module):
             # Process batch of frames
             if self.feature_only:
                 chunk_output = self._forward_impl(
-                    aggregated_tokens_list, images, patch_start_idx, frames_start_idx, frames_end_idx
+                    aggregated_tokens_list, images, patch_start_idx, frames_start_idx, frames_end_idx, window
                 )
                 all_preds.append(chunk_output)
             else:
                 chunk_preds, chunk_conf = self._forward_impl(
-                    aggregated_tokens_list, images, patch_start_idx, frames_start_idx, frames_end_idx
+                    aggregated_tokens_list, images, patch_start_idx, frames_start_idx, frames_end_idx, window
                 )
                 all_preds.append(chunk_preds)
                 all_conf.append(chunk_conf)
@@ -176,6 +217,7 @@ class DPTHead(nn.Module):
         patch_start_idx: int,
         frames_start_idx: int = None,
         frames_end_idx: int = None,
+        window: Tuple[Tuple[int, int, int, int], Tuple[int, int, int, int]] = None,
     ) -> Union[torch.Tensor, Tuple[torch.Tensor, torch.Tensor]]:
         """
         Implementation of the forward pass through the DPT head.
@@ -188,6 +230,7 @@ class DPTHead(nn.Module):
             patch_start_idx (int): Starting index for patch tokens.
             frames_start_idx (int, optional): Starting index for frames to process.
             frames_end_idx (int, optional): Ending index for frames to process.
+            window (tuple, optional): Decoded window from _roi_window, None for the whole frames.
 
         Returns:
             Tensor or Tuple[Tensor, Tensor]: Feature maps or (predictions, confidence).
@@ -198,6 +241,14 @@ class DPTHead(nn.Module):
         B, S, _, H, W = images.shape
 
         patch_h, patch_w = H // self.patch_size, W // self.patch_size
+        out_h = int(patch_h * self.patch_size / self.down_ratio)
+        out_w = int(patch_w * self.patch_size / self.down_ratio)
+
+        if window is None:
+            token_box, out_box = (0, patch_h, 0, patch_w), (0, out_h, 0, out_w)
+        else:
+            token_box, out_box = window
+        top, bottom, left, right = token_box
 
         out = []
         dpt_idx = 0
@@ -209,61 +260,135 @@ class DPTHead(nn.Module):
             if frames_start_idx is not None and frames_end_idx is not None:
                 x = x[:, frames_start_idx:frames_end_idx]
 
-            x = x.reshape(B * S, -1, x.shape[-1])
+            x = x.reshape(B * S, patch_h, patch_w, x.shape[-1])[:, top:bottom, left:right]
 
             x = self.norm(x)
 
-            x = x.permute(0, 2, 1).reshape((x.shape[0], x.shape[-1], patch_h, patch_w))
+            x = x.permute(0, 3, 1, 2)
 
             x = self.projects[dpt_idx](x)
             if self.pos_embed:
-                x = self._apply_pos_embed(x, W, H)
+                x = self._apply_pos_embed(x, W, H, offset=(top, left), full_size=(patch_h, patch_w))
             x = self.resize_layers[dpt_idx](x)
 
             out.append(x)
             dpt_idx += 1
 
-        # Fuse features from multiple layers.
-        out = self.scratch_forward(out)
-        # Interpolate fused output to match target image resolution.
-        out = custom_interpolate(
-            out,
-            (int(patch_h * self.patch_size / self.down_ratio), int(patch_w * self.patch_size / self.down_ratio)),
-            mode="bilinear",
-            align_corners=True,
-        )
+        if window is None:
+            # Fuse features from multiple layers.
+            out = self.scratch_forward(out)
+            # Interpolate fused output to match target image resolution.
+            out = custom_interpolate(out, (out_h, out_w), mode="bilinear", align_corners=True)
+            margin = (0, 0, 0, 0)
+        else:
+            out = self.scratch_forward(out, window=(top, left, patch_h, patch_w))
+            # Output pixels of the region, plus the context of output_conv2 (3x3) inside the frame
+            out_top, out_bottom, out_left, out_right = out_box
+            if not self.feature_only:
+                margin = (
+                    min(out_top, 1), min(out_h - out_bottom, 1), min(out_left, 1), min(out_w - out_right, 1)
+                )
+                out_top, out_bottom = out_top - margin[0], out_bottom + margin[1]
+                out_left, out_right = out_left - margin[2], out_right + margin[3]
+            out = window_interpolate(
+                out,
+                full_size=(8 * patch_h, 8 * patch_w),
+                full_out_size=(out_h, out_w),
+                start=(8 * top, 8 * left),
+                out_start=(out_top, out_left),
+                out_size=(out_bottom - out_top, out_right - out_left),
+            )
+            top, left = out_top, out_left
 
         if self.pos_embed:
-            out = self._apply_pos_embed(out, W, H)
+            out = self._apply_pos_embed(out, W, H, offset=(top, left), full_size=(out_h, out_w))
 
         if self.feature_only:
             return out.view(B, S, *out.shape[1:])
 
         out = self.scratch.output_conv2(out)
+        if window is not None:
+            out = out[..., margin[0] : out.shape[-2] - margin[1], margin[2] : out.shape[-1] - margin[3]]
+        if self.fp32_activation:
+            out = out.float()
         preds, conf = activate_head(out, activation=self.activation, conf_activation=self.conf_activation)
 
         preds = preds.view(B, S, *preds.shape[1:])
         conf = conf.view(B, S, *conf.shape[1:])
         return preds, conf
 
-    def _apply_pos_embed(self, x: torch.Tensor, W: int, H: int, ratio: float = 0.1) -> torch.Tensor:
+    def _roi_window(self, roi: Sequence, H: int, W: int):
+        """
+        Token and output pixel boxes (top, bottom, left, right) decoded for a region of interest.
+
+        The token box covers the region plus roi_margin patches of context. It starts on even rows and columns,
+        so that the stride 2 convolution of the last layer samples the same positions as on the whole frame.
+        """
+        top, left, bottom, right = (int(v) for v in roi)
+        if not (0 <= top < bottom <= H and 0 <= left < right <= W):
+            raise ValueError(f"Region of interest {tuple(roi)} is empty or outside the {H}x{W} images")
+
+        patch_h, patch_w = H // self.patch_size, W // self.patch_size
+        margin = self.roi_margin + 1  # the interpolations read one more patch on each side
+        token_top = max(top // self.patch_size - margin, 0)
+        token_left = max(left // self.patch_size - margin, 0)
+        token_box = (
+            token_top - token_top % 2,
+            min(math.ceil(bottom / self.patch_size) + margin, patch_h),
+            token_left - token_left % 2,
+            min(math.ceil(right / self.patch_size) + margin, patch_w),
+        )
+
+        out_h = int(patch_h * self.patch_size / self.down_ratio)
+        out_w = int(patch_w * self.patch_size / self.down_ratio)
+        out_box = (
+            min(int(top / self.down_ratio), out_h - 1),
+            min(max(math.ceil(bottom / self.down_ratio), int(top / self.down_ratio) + 1), out_h),
+            min(int(left / self.down_ratio), out_w - 1),
+            min(max(math.ceil(right / self.down_ratio), int(left / self.down_ratio) + 1), out_w),
+        )
+        return token_box, out_box
+
+    def _apply_pos_embed(
+        self,
+        x: torch.Tensor,
+        W: int,
+        H: int,
+        ratio: float = 0.1,
+        offset: Tuple[int, int] = (0, 0),
+        full_size: Optional[Tuple[int, int]] = None,
+    ) -> torch.Tensor:
         """
         Apply positional embedding to tensor x.
+        The embedding only depends on the grid shape, so it is shared by all the layers and frame chunks.
+        When x is a window of a larger grid of size full_size, starting at offset, the embedding of the
+        larger grid is cropped to the window.
         """
-        patch_w = x.shape[-1]
-        patch_h = x.shape[-2]
-        pos_embed = create_uv_grid(patch_w, patch_h, aspect_ratio=W / H, dtype=x.dtype, device=x.device)
-        pos_embed = position_grid_to_embed(pos_embed, x.shape[1])
-        pos_embed = pos_embed * ratio
-        pos_embed = pos_embed.permute(2, 0, 1)[None].expand(x.shape[0], -1, -1, -1)
-        return x + pos_embed
-
-    def scratch_forward(self, features: List[torch.Tensor]) -> torch.Tensor:
+        patch_h, patch_w = full_size if full_size is not None else x.shape[-2:]
+
+        def build():
+            pos_embed = create_uv_grid(patch_w, patch_h, aspect_ratio=W / H, dtype=x.dtype, device=x.device)
+            pos_embed = position_grid_to_embed(pos_embed, x.shape[1])
+            pos_embed = pos_embed.to(x.dtype) * ratio
+            return pos_embed.permute(2, 0, 1)[None]
+
+        pos_embed = pos_embed_cache.get(
+            "dpt_uv", (patch_h, patch_w), x.shape[1], x.dtype, x.device, build, extra=(W / H, ratio)
+        )
+        top, left = offset
+        return x + pos_embed[..., top : top + x.shape[-2], left : left + x.shape[-1]]
+
+    def scratch_forward(
+        self, features: List[torch.Tensor], window: Optional[Tuple[int, int, int, int]] = None
+    ) -> torch.Tensor:
         """
         Forward pass through the fusion blocks.
 
         Args:
             features (List[Tensor]): List of feature maps from different layers.
+            window (tuple, optional): (top, left, patch_h, patch_w) when the features are a window of the
+                token grid starting at patch (top, left), of a frame of patch_h x patch_w patches. The
+                upsamplings then sample the positions they would sample on the whole frame.
 
         Returns:
             Tensor: Fused feature map.
@@ -275,16 +400,27 @@ class DPTHead(nn.Module):
         layer_3_rn = self.scratch.layer3_rn(layer_3)
         layer_4_rn = self.scratch.layer4_rn(layer_4)
 
-        out = self.scratch.refinenet4(layer_4_rn, size=layer_3_rn.shape[2:])
+        resamples = [None] * 4
+        if window is not None:
+            top, left, patch_h, patch_w = window
+            # (size of the whole frame, start of the window) at 1/2, 1, 2, 4 and 8 times the patch resolution
+            levels = [((math.ceil(patch_h / 2), math.ceil(patch_w / 2)), (top // 2, left // 2))] + [
+                ((scale * patch_h, scale * patch_w), (scale * top, scale * left)) for scale in (1, 2, 4, 8)
+            ]
+            out_sizes = [layer_3_rn.shape[2:], layer_2_rn.shape[2:], layer_1_rn.shape[2:]]
+            out_sizes.append((2 * out_sizes[-1][0], 2 * out_sizes[-1][1]))
+            resamples = [_window_resample(*levels[i], *levels[i + 1], out_sizes[i]) for i in range(4)]
+
+        out = self.scratch.refinenet4(layer_4_rn, size=layer_3_rn.shape[2:], resample=resamples[0])
         del layer_4_rn, layer_4
 
-        out = self.scratch.refinenet3(out, layer_3_rn, size=layer_2_rn.shape[2:])
+        out = self.scratch.refinenet3(out, layer_3_rn, size=layer_2_rn.shape[2:], resample=resamples[1])
         del layer_3_rn, layer_3
 
-        out = self.scratch.refinenet2(out, layer_2_rn, size=layer_1_rn.shape[2:])
+        out = self.scratch.refinenet2(out, layer_2_rn, size=layer_1_rn.shape[2:], resample=resamples[2])
         del layer_2_rn, layer_2
 
-        out = self.scratch.refinenet1(out, layer_1_rn)
+        out = self.scratch.refinenet1(out, layer_1_rn, resample=resamples[3])
         del layer_1_rn, layer_1
 
         out = self.scratch.output_conv1(out)
@@ -429,9 +565,13 @@ class FeatureFusionBlock(nn.Module):
         self.skip_add = nn.quantized.FloatFunctional()
         self.size = size
 
-    def forward(self, *xs, size=None):
+    def forward(self, *xs, size=None, resample=None):
         """Forward pass.
 
+        Args:
+            resample (callable, optional): replaces the upsampling of the output (e.g., for a window of a
+                larger feature map)
+
         Returns:
             tensor: output
         """
@@ -450,7 +590,10 @@ class FeatureFusionBlock(nn.Module):
         else:
             modifier = {"size": size}
 
-        output = custom_interpolate(output, **modifier, mode="bilinear", align_corners=self.align_corners)
+        if resample is not None:
+            output = resample(output)
+        else:
+            output = custom_interpolate(output, **modifier, mode="bilinear", align_corners=self.align_corners)
         output = self.out_conv(output)
 
         return output
@@ -482,3 +625,37 @@ def custom_interpolate(
         return x.contiguous()
     else:
         return nn.functional.interpolate(x, size=size, mode=mode, align_corners=align_corners)
+
+
+
+def window_interpolate(
+    x: torch.Tensor,
+    full_size: Tuple[int, int],
+    full_out_size: Tuple[int, int],
+    start: Tuple[int, int],
+    out_start: Tuple[int, int],
+    out_size: Tuple[int, int],
+) -> torch.Tensor:
+    """
+    Bilinear interpolation (align_corners=True) of a window of a feature map.
+
+    x [N, C, h, w] is the window of a full_size feature map starting at start. Returns the window of size
+    out_size, starting at out_start, of the interpolation of the full map to full_out_size, as long as the
+    sampled positions fall inside x (they are clamped to its border otherwise).
+    """
+    for dim, (n_in, n_out, in_start, o_start, o_size) in enumerate(
+        zip(full_size, full_out_size, start, out_start, out_size), start=2
+    ):
+        scale = (n_in - 1) / (n_out - 1) if n_out > 1 else 0.0
+        src = torch.arange(o_start, o_start + o_size, device=x.device, dtype=torch.float32) * scale - in_start
+        src = src.clamp(0, x.shape[dim] - 1)
+        index0 = src.floor().long()
+        index1 = (index0 + 1).clamp(max=x.shape[dim] - 1)
+        weight = (src - index0).to(x.dtype).view([-1] + [1] * (x.dim() - 1 - dim))
+        x0 = x.index_select(dim, index0)
+        x = torch.lerp(x0, x.index_select(dim, index1), weight)
+    return x
+
+
+def _window_resample(full_size, start, full_out_size, out_start, out_size):
+    return lambda x: window_interpolate(x, full_size, full_out_size, start, out_start, tuple(out_size))
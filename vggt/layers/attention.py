@@ -11,6 +11,7 @@ import logging
 import os
 import warnings
 
+import torch
 from torch import Tensor
 from torch import nn
 import torch.nn.functional as F
@@ -31,6 +32,7 @@ class Attention(nn.Module):
         qk_norm: bool = False,
         fused_attn: bool = True,  # use F.scaled_dot_product_attention or not
         rope=None,
+        attn_block_size: int = None,  # if set, use tiled attention with query/key blocks of this size
     ) -> None:
         super().__init__()
         assert dim % num_heads == 0, "dim should be divisible by num_heads"
@@ -38,6 +40,7 @@ class Attention(nn.Module):
         self.head_dim = dim // num_heads
         self.scale = self.head_dim**-0.5
         self.fused_attn = fused_attn
+        self.attn_block_size = attn_block_size
 
         self.qkv = nn.Linear(dim, dim * 3, bias=qkv_bias)
         self.q_norm = norm_layer(self.head_dim) if qk_norm else nn.Identity()
@@ -47,30 +50,230 @@ class Attention(nn.Module):
         self.proj_drop = nn.Dropout(proj_drop)
         self.rope = rope
 
-    def forward(self, x: Tensor, pos=None) -> Tensor:
+    def forward(
+        self,
+        x: Tensor,
+        pos=None,
+        kv_cache=None,
+        frame_neighbors=None,
+        cu_seqlens=None,
+        rope_plan=None,
+        token_sizes=None,
+    ) -> Tensor:
+        """
+        Args:
+            x (Tensor): Input tokens with shape [B, N, C].
+            pos (Tensor, optional): Token positions for RoPE with shape [B, N, 2].
+            kv_cache (dict, optional): Keys/values of previously processed tokens, stored under "k" and "v".
+                If given, the queries also attend to the cached keys/values, and the new keys/values
+                are appended to the cache in place (as GrowableTensor buffers). An empty dict starts a new cache.
+            frame_neighbors (Tensor, optional): Long tensor with shape [B, S, K]. If given, the N tokens are
+                treated as S frames of N // S tokens, and the tokens of each frame only attend to the tokens
+                of its K neighbouring frames.
+            cu_seqlens (list[int], optional): Cumulative sequence lengths, e.g. [0, n_0, n_0 + n_1, ..., N].
+                If given, the N tokens are packed independent sequences and attention is block-diagonal:
+                the tokens of each sequence only attend to the tokens of the same sequence.
+            rope_plan (RopePlan, optional): Precomputed rotary embedding of the token positions, shared by all
+                the blocks of a forward pass. If given, it is used instead of rope and pos.
+            token_sizes (Tensor, optional): Number of original tokens each token stands for, with shape [B, N],
+                for merged tokens (ToMe). If given, log(size) is added to the attention logits of each key
+                (proportional attention), so a merged token weighs as much as the tokens it replaces.
+        """
         B, N, C = x.shape
         qkv = self.qkv(x).reshape(B, N, 3, self.num_heads, self.head_dim).permute(2, 0, 3, 1, 4)
         q, k, v = qkv.unbind(0)
         q, k = self.q_norm(q), self.k_norm(k)
 
-        if self.rope is not None:
+        if rope_plan is not None:
+            q, k = rope_plan.apply(q, k)
+        elif self.rope is not None:
             q = self.rope(q, pos)
             k = self.rope(k, pos)
 
-        if self.fused_attn:
-            x = F.scaled_dot_product_attention(q, k, v, dropout_p=self.attn_drop.p if self.training else 0.0)
+        if kv_cache is not None:
+            if kv_cache:
+                k = kv_cache["k"].append(k)
+                v = kv_cache["v"].append(v)
+                if token_sizes is not None:
+                    token_sizes = kv_cache["sizes"].append(token_sizes)
+            else:
+                kv_cache["k"], kv_cache["v"] = GrowableTensor(k, dim=2), GrowableTensor(v, dim=2)
+                if token_sizes is not None:
+                    kv_cache["sizes"] = GrowableTensor(token_sizes, dim=1)
+
+        # Additive bias of the attention logits, broadcast over the heads and queries
+        bias = None
+        if token_sizes is not None:
+            bias = token_sizes.float().log()[:, None, None, :]  # [B, 1, 1, N_k]
+
+        if frame_neighbors is not None:
+            # [B, h, N, D] -> [B, h, S, P, D] queries and [B, h, S, K * P, D] keys/values of the neighbours
+            S = frame_neighbors.shape[1]
+            q = q.unflatten(2, (S, -1))
+            k = gather_frames(k.unflatten(2, (S, -1)), frame_neighbors)
+            v = gather_frames(v.unflatten(2, (S, -1)), frame_neighbors)
+            if bias is not None:
+                # [B, 1, 1, N] -> [B, 1, S, 1, K * P], following the keys of the neighbours
+                bias = gather_frames(bias.view(B, 1, S, -1, 1), frame_neighbors).transpose(-1, -2)
+
+        if cu_seqlens is not None:
+            # Block-diagonal attention, computed one sequence at a time instead of materializing the mask
+            x = torch.cat(
+                [
+                    self._attend(
+                        q[:, :, start:end],
+                        k[:, :, start:end],
+                        v[:, :, start:end],
+                        bias=bias[..., start:end] if bias is not None else None,
+                    )
+                    for start, end in zip(cu_seqlens[:-1], cu_seqlens[1:])
+                ],
+                dim=2,
+            )
         else:
-            q = q * self.scale
-            attn = q @ k.transpose(-2, -1)
-            attn = attn.softmax(dim=-1)
-            attn = self.attn_drop(attn)
-            x = attn @ v
+            x = self._attend(q, k, v, bias=bias)
+
+        if frame_neighbors is not None:
+            x = x.flatten(2, 3)
 
         x = x.transpose(1, 2).reshape(B, N, C)
         x = self.proj(x)
         x = self.proj_drop(x)
         return x
 
+    def _attend(self, q: Tensor, k: Tensor, v: Tensor, bias: Tensor = None) -> Tensor:
+        if self.attn_block_size is not None:
+            # Memory grows linearly with the sequence length, e.g. for global attention on CPU
+            return tiled_attention(q, k, v, block_size=self.attn_block_size, scale=self.scale, bias=bias)
+        if self.fused_attn:
+            attn_mask = bias.to(q.dtype) if bias is not None else None
+            return F.scaled_dot_product_attention(
+                q, k, v, attn_mask=attn_mask, dropout_p=self.attn_drop.p if self.training else 0.0
+            )
+        q = q * self.scale
+        attn = q @ k.transpose(-2, -1)
+        if bias is not None:
+            attn = attn + bias.to(attn.dtype)
+        attn = attn.softmax(dim=-1)
+        attn = self.attn_drop(attn)
+        return attn @ v
+
+
+def gather_frames(x: Tensor, frame_neighbors: Tensor) -> Tensor:
+    """
+    Gather the tokens of the neighbouring frames of each frame.
+
+    Args:
+        x (Tensor): Per-frame tokens with shape [B, h, S, P, D].
+        frame_neighbors (Tensor): Long tensor with shape [B, S, K] of neighbouring frame indices.
+
+    Returns:
+        Tensor: Tokens with shape [B, h, S, K * P, D].
+    """
+    B, h, S, P, D = x.shape
+    K = frame_neighbors.shape[-1]
+    batch_idx = torch.arange(B, device=x.device)[:, None, None]
+    # [B, S, h, P, D] indexed by [B, S, K] -> [B, S, K, h, P, D]
+    x = x.transpose(1, 2)[batch_idx, frame_neighbors]
+    return x.permute(0, 3, 1, 2, 4, 5).reshape(B, h, S, K * P, D)
+
+
+def tiled_attention(
+    q: Tensor, k: Tensor, v: Tensor, block_size: int = 1024, scale: float = None, bias: Tensor = None
+) -> Tensor:
+    """
+    Memory-efficient attention computed over query/key blocks with an online softmax,
+    so that only a (block_size x block_size) score matrix is materialized at a time.
+    Numerically matches softmax(q @ k^T * scale + bias) @ v, accumulating in float32. Dropout is not supported.
+
+    Args:
+        q (Tensor): Queries with shape [..., N_q, D].
+        k (Tensor): Keys with shape [..., N_k, D].
+        v (Tensor): Values with shape [..., N_k, D_v].
+        block_size (int): Number of queries and keys processed per block.
+        scale (float, optional): Scale of the attention scores. Defaults to D**-0.5.
+        bias (Tensor, optional): Additive bias of the attention scores, broadcastable to [..., N_q, N_k].
+
+    Returns:
+        Tensor: Attention output with shape [..., N_q, D_v].
+    """
+    if scale is None:
+        scale = q.shape[-1] ** -0.5
+
+    N_q, N_k = q.shape[-2], k.shape[-2]
+    out = q.new_empty(*q.shape[:-1], v.shape[-1])
+
+    for q_start in range(0, N_q, block_size):
+        q_block = q[..., q_start : q_start + block_size, :].float() * scale
+
+        # Running max, softmax denominator and weighted sum of values for this block of queries
+        row_max = q_block.new_full((*q_block.shape[:-1], 1), float("-inf"))
+        row_sum = q_block.new_zeros((*q_block.shape[:-1], 1))
+        acc = q_block.new_zeros((*q_block.shape[:-1], v.shape[-1]))
+
+        for k_start in range(0, N_k, block_size):
+            k_block = k[..., k_start : k_start + block_size, :].float()
+            v_block = v[..., k_start : k_start + block_size, :].float()
+
+            scores = q_block @ k_block.transpose(-2, -1)
+            if bias is not None:
+                block_bias = bias[..., k_start : k_start + block_size]
+                if block_bias.shape[-2] != 1:  # not broadcast over the queries
+                    block_bias = block_bias[..., q_start : q_start + block_size, :]
+                scores = scores + block_bias.float()
+            new_max = torch.maximum(row_max, scores.amax(dim=-1, keepdim=True))
+            probs = torch.exp(scores - new_max)
+            correction = torch.exp(row_max - new_max)
+
+            row_sum = row_sum * correction + probs.sum(dim=-1, keepdim=True)
+            acc = acc * correction + probs @ v_block
+            row_max = new_max
+
+        out[..., q_start : q_start + block_size, :] = (acc / row_sum).to(out.dtype)
+
+    return out
+
+
+class GrowableTensor:
+    """
+    Tensor growing along one dimension, for caches appended to at every step (e.g., the keys/values or the
+    frames of incremental inference). The data lives in a preallocated buffer whose capacity doubles when
+    it is full, so appending n elements costs O(n) amortized instead of copying the whole history as
+    torch.cat does. The stored data is detached.
+
+    Args:
+        x (Tensor): Initial content.
+        dim (int): Dimension along which the tensor grows.
+    """
+
+    def __init__(self, x: Tensor, dim: int):
+        self.dim = dim % x.dim()
+        self.length = x.shape[self.dim]
+        self._buffer = x.detach().clone()
+
+    @property
+    def tensor(self) -> Tensor:
+        """View (no copy) of the content."""
+        return self._buffer.narrow(self.dim, 0, self.length)
+
+    @property
+    def shape(self) -> torch.Size:
+        return self.tensor.shape
+
+    def append(self, x: Tensor) -> Tensor:
+        """Appends x along dim and returns a view of the whole content."""
+        n = x.shape[self.dim]
+        capacity = self._buffer.shape[self.dim]
+        if self.length + n > capacity:
+            shape = list(self._buffer.shape)
+            shape[self.dim] = max(2 * capacity, self.length + n)
+            buffer = self._buffer.new_empty(shape)
+            buffer.narrow(self.dim, 0, self.length).copy_(self.tensor)
+            self._buffer = buffer
+        self._buffer.narrow(self.dim, self.length, n).copy_(x.detach())
+        self.length += n
+        return self.tensor
+
 
 class MemEffAttention(Attention):
     def forward(self, x: Tensor, attn_bias=None, pos=None) -> Tensor:
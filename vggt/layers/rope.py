@@ -20,22 +20,17 @@ import torch.nn as nn
 import torch.nn.functional as F
 from typing import Dict, Tuple
 
+from vggt.utils.pos_embed_cache import pos_embed_cache
+
 
 class PositionGetter:
     """Generates and caches 2D spatial positions for patches in a grid.
 
     This class efficiently manages the generation of spatial coordinates for patches
-    in a 2D grid, caching results to avoid redundant computations.
-
-    Attributes:
-        position_cache: Dictionary storing precomputed position tensors for different
-            grid dimensions.
+    in a 2D grid, caching results in the shared positional embedding cache to avoid
+    redundant computations.
     """
 
-    def __init__(self):
-        """Initializes the position generator with an empty cache."""
-        self.position_cache: Dict[Tuple[int, int], torch.Tensor] = {}
-
     def __call__(self, batch_size: int, height: int, width: int, device: torch.device) -> torch.Tensor:
         """Generates spatial positions for a batch of patches.
 
@@ -47,16 +42,17 @@ class PositionGetter:
 
         Returns:
             Tensor of shape (batch_size, height*width, 2) containing y,x coordinates
-            for each position in the grid, repeated for each batch item.
+            for each position in the grid, repeated for each batch item. This is an
+            expanded view of the cached grid: it must not be modified in place.
         """
-        if (height, width) not in self.position_cache:
+
+        def build():
             y_coords = torch.arange(height, device=device)
             x_coords = torch.arange(width, device=device)
-            positions = torch.cartesian_prod(y_coords, x_coords)
-            self.position_cache[height, width] = positions
+            return torch.cartesian_prod(y_coords, x_coords)
 
-        cached_positions = self.position_cache[height, width]
-        return cached_positions.view(1, height * width, 2).expand(batch_size, -1, -1).clone()
+        cached_positions = pos_embed_cache.get("rope_grid", (height, width), 2, torch.int64, device, build)
+        return cached_positions.view(1, height * width, 2).expand(batch_size, -1, -1)
 
 
 class RotaryPositionEmbedding2D(nn.Module):
@@ -99,22 +95,30 @@ class RotaryPositionEmbedding2D(nn.Module):
         """
         cache_key = (dim, seq_len, device, dtype)
         if cache_key not in self.frequency_cache:
-            # Compute frequency bands
-            exponents = torch.arange(0, dim, 2, device=device).float() / dim
-            inv_freq = 1.0 / (self.base_frequency**exponents)
+            self.frequency_cache[cache_key] = self._build_frequency_components(dim, seq_len, device, dtype)
 
-            # Generate position-dependent frequencies
-            positions = torch.arange(seq_len, device=device, dtype=inv_freq.dtype)
-            angles = torch.einsum("i,j->ij", positions, inv_freq)
+        return self.frequency_cache[cache_key]
 
-            # Compute and cache frequency components
-            angles = angles.to(dtype)
-            angles = torch.cat((angles, angles), dim=-1)
-            cos_components = angles.cos().to(dtype)
-            sin_components = angles.sin().to(dtype)
-            self.frequency_cache[cache_key] = (cos_components, sin_components)
+    # Constant tables, built eagerly even under torch.compile (inductor fails to generate the float64 power
+    # of the frequency bands on CPU with torch 2.3)
+    @torch.compiler.disable
+    def _build_frequency_components(
+        self, dim: int, seq_len: int, device: torch.device, dtype: torch.dtype
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        # Compute frequency bands
+        exponents = torch.arange(0, dim, 2, device=device).float() / dim
+        inv_freq = 1.0 / (self.base_frequency**exponents)
 
-        return self.frequency_cache[cache_key]
+        # Generate position-dependent frequencies
+        positions = torch.arange(seq_len, device=device, dtype=inv_freq.dtype)
+        angles = torch.einsum("i,j->ij", positions, inv_freq)
+
+        # Compute the frequency components
+        angles = angles.to(dtype)
+        angles = torch.cat((angles, angles), dim=-1)
+        cos_components = angles.cos().to(dtype)
+        sin_components = angles.sin().to(dtype)
+        return cos_components, sin_components
 
     @staticmethod
     def _rotate_features(x: torch.Tensor) -> torch.Tensor:
@@ -186,3 +190,68 @@ class RotaryPositionEmbedding2D(nn.Module):
 
         # Combine processed features
         return torch.cat((vertical_features, horizontal_features), dim=-1)
+
+
+class RopePlan:
+    """Rotary embedding tables of a fixed set of token positions, shared by all the attention blocks of a forward pass.
+
+    Positions do not change within a forward pass, so the cos/sin tables are gathered once (per dtype)
+    instead of in every block, without the device sync of RotaryPositionEmbedding2D.forward. The sign of
+    the feature rotation is folded into the sin table, so each of q and k is rotated by a single addcmul.
+
+    Args:
+        rope: The RotaryPositionEmbedding2D module of the attention blocks.
+        positions: Either (n_tokens, 2) positions of the tokens of one frame, shared by all the frames of
+            the sequences (the number of tokens of q/k is then a multiple of n_tokens, e.g. frame and global
+            attention layouts), or (batch_size, n_tokens, 2) positions of all the tokens.
+        head_dim: Feature dimension of each attention head.
+        max_position: Bound on the position values (exclusive). If None, computed from the positions.
+    """
+
+    def __init__(self, rope: RotaryPositionEmbedding2D, positions: torch.Tensor, head_dim: int, max_position: int = None):
+        self.rope = rope
+        self.positions = positions
+        self.head_dim = head_dim
+        self.max_position = int(positions.max()) + 1 if max_position is None else max_position
+        self.tables: Dict[Tuple, Tuple[torch.Tensor, torch.Tensor]] = {}
+
+    def _get_tables(self, device: torch.device, dtype: torch.dtype) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Gathers the (cos, signed sin) tables of the positions, with shape (..., n_tokens, head_dim)."""
+        cache_key = (device, dtype)
+        if cache_key not in self.tables:
+            cos_comp, sin_comp = self.rope._compute_frequency_components(
+                self.head_dim // 2, self.max_position, device, dtype
+            )
+            positions = self.positions.to(device)
+            # Vertical features use the y coordinate and horizontal features the x coordinate
+            cos = torch.cat((F.embedding(positions[..., 0], cos_comp), F.embedding(positions[..., 1], cos_comp)), dim=-1)
+            sin = torch.cat((F.embedding(positions[..., 0], sin_comp), F.embedding(positions[..., 1], sin_comp)), dim=-1)
+
+            # _rotate_features negates the second half of the features of each direction
+            sign = torch.ones(2, 2, self.head_dim // 4, device=device, dtype=dtype)
+            sign[:, 0] = -1
+            sin = sin * sign.flatten()
+
+            if positions.ndim == 3:
+                cos, sin = cos[:, None], sin[:, None]  # broadcast over the heads
+            self.tables[cache_key] = (cos, sin)
+
+        return self.tables[cache_key]
+
+    def _rotate(self, tokens: torch.Tensor, cos: torch.Tensor, sin: torch.Tensor) -> torch.Tensor:
+        n_tokens, plan_tokens = tokens.shape[-2], cos.shape[-2]
+        per_frame = n_tokens != plan_tokens
+        if per_frame:
+            # The positions of one frame, repeated over the frames of the sequence
+            tokens = tokens.unflatten(-2, (n_tokens // plan_tokens, plan_tokens))
+
+        # Swap the halves of the features of each direction, the sign is in the sin table
+        swapped = tokens.unflatten(-1, (2, 2, -1)).flip(-2).flatten(-3)
+        tokens = torch.addcmul(tokens * cos, swapped, sin)
+
+        return tokens.flatten(-3, -2) if per_frame else tokens
+
+    def apply(self, q: torch.Tensor, k: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Rotates queries and keys of shape (batch_size, n_heads, n_tokens, head_dim)."""
+        cos, sin = self._get_tables(q.device, q.dtype)
+        return self._rotate(q, cos, sin), self._rotate(k, cos, sin)
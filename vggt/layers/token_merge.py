@@ -0,0 +1,82 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+
+# Token merging by bipartite soft matching, following
+# "Token Merging: Your ViT But Faster" (https://arxiv.org/abs/2210.09461)
+# and https://github.com/facebookresearch/ToMe
+
+
+from typing import Callable, Optional, Tuple
+
+import torch
+import torch.nn.functional as F
+
+
+def bipartite_soft_matching(
+    metric: torch.Tensor, r: int, num_protected: int = 0
+) -> Tuple[Callable[..., torch.Tensor], Callable[[torch.Tensor], torch.Tensor]]:
+    """
+    Compute a merge of the r most similar token pairs, and the matching un-merge.
+
+    Tokens are split into two alternating sets A and B. Each token of A is matched to its most similar
+    token of B (cosine similarity of the metric), and the r best matched tokens of A are merged into
+    their match. The first num_protected tokens (e.g., camera and register tokens) are never merged.
+
+    Args:
+        metric (torch.Tensor): Similarity features with shape (N, T, C).
+        r (int): Number of tokens to remove, at most half of the unprotected tokens.
+        num_protected (int): Number of leading tokens kept as-is.
+
+    Returns:
+        (Callable, Callable):
+            merge(x, mode="mean") maps (N, T, C) to (N, T - r, C). mode is the scatter_reduce mode used
+            to combine merged tokens, or None to keep the destination token (e.g., for positions).
+            unmerge(x) maps (N, T - r, C) back to (N, T, C), copying each merged token to its sources.
+    """
+    num_tokens = metric.shape[1] - num_protected
+    r = min(r, num_tokens // 2)
+
+    if r <= 0:
+        return (lambda x, mode="mean": x), (lambda x: x)
+
+    with torch.no_grad():
+        metric = F.normalize(metric[:, num_protected:].float(), dim=-1)
+        a, b = metric[:, ::2], metric[:, 1::2]
+        scores = a @ b.transpose(-1, -2)
+
+        node_max, node_idx = scores.max(dim=-1)
+        edge_idx = node_max.argsort(dim=-1, descending=True)[..., None]
+
+        unm_idx = edge_idx[:, r:]  # Unmerged tokens of A
+        src_idx = edge_idx[:, :r]  # Merged tokens of A
+        dst_idx = node_idx[..., None].gather(dim=1, index=src_idx)  # Their match in B
+
+    def merge(x: torch.Tensor, mode: Optional[str] = "mean") -> torch.Tensor:
+        protected, x = x[:, :num_protected], x[:, num_protected:]
+        src, dst = x[:, ::2], x[:, 1::2]
+        n, t1, c = src.shape
+        unm = src.gather(dim=1, index=unm_idx.expand(n, t1 - r, c))
+        if mode is not None:
+            src = src.gather(dim=1, index=src_idx.expand(n, r, c))
+            dst = dst.scatter_reduce(1, dst_idx.expand(n, r, c), src, reduce=mode)
+        return torch.cat([protected, unm, dst], dim=1)
+
+    def unmerge(x: torch.Tensor) -> torch.Tensor:
+        protected, x = x[:, :num_protected], x[:, num_protected:]
+        unm_len = unm_idx.shape[1]
+        unm, dst = x[:, :unm_len], x[:, unm_len:]
+        n, _, c = unm.shape
+
+        src = dst.gather(dim=1, index=dst_idx.expand(n, r, c))
+
+        out = x.new_zeros(n, num_tokens, c)
+        out[:, 1::2] = dst
+        out.scatter_(dim=1, index=(2 * unm_idx).expand(n, unm_len, c), src=unm)
+        out.scatter_(dim=1, index=(2 * src_idx).expand(n, r, c), src=src)
+        return torch.cat([protected, out], dim=1)
+
+    return merge, unmerge
@@ -17,6 +17,7 @@ import torch.nn as nn
 from torch.utils.checkpoint import checkpoint
 from torch.nn.init import trunc_normal_
 from . import Mlp, PatchEmbed, SwiGLUFFNFused, MemEffAttention, NestedTensorBlock as Block
+from vggt.utils.pos_embed_cache import pos_embed_cache, tensor_key
 
 logger = logging.getLogger("dinov2")
 
@@ -116,7 +117,7 @@ class DinoVisionTransformer(nn.Module):
         if drop_path_uniform is True:
             dpr = [drop_path_rate] * depth
         else:
-            dpr = [x.item() for x in torch.linspace(0, drop_path_rate, depth)]  # stochastic depth decay rule
+            dpr = [x.item() for x in torch.linspace(0, drop_path_rate, depth, device="cpu")]  # stochastic depth decay rule
 
         if ffn_layer == "mlp":
             logger.info("using MLP layer as FFN")
@@ -178,11 +179,30 @@ class DinoVisionTransformer(nn.Module):
         named_apply(init_weights_vit_timm, self)
 
     def interpolate_pos_encoding(self, x, w, h):
-        previous_dtype = x.dtype
         npatch = x.shape[1] - 1
         N = self.pos_embed.shape[1] - 1
         if npatch == N and w == h:
             return self.pos_embed
+
+        if torch.is_grad_enabled() and self.pos_embed.requires_grad:
+            return self._interpolate_pos_encoding(x, w, h)
+
+        # Without gradients, the interpolated embedding only depends on the resolution: reuse it.
+        # The weights are part of the key, so that loading new weights (or another model) invalidates the entry.
+        weights_key = tensor_key(self.pos_embed)
+        return pos_embed_cache.get(
+            "dino_pos_embed",
+            (w // self.patch_size, h // self.patch_size),
+            x.shape[-1],
+            x.dtype,
+            x.device,
+            lambda: self._interpolate_pos_encoding(x, w, h),
+            extra=weights_key,
+        )
+
+    def _interpolate_pos_encoding(self, x, w, h):
+        previous_dtype = x.dtype
+        N = self.pos_embed.shape[1] - 1
         pos_embed = self.pos_embed.float()
         class_pos_embed = pos_embed[:, 0]
         patch_pos_embed = pos_embed[:, 1:]
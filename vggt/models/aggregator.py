@@ -12,9 +12,12 @@ from torch.utils.checkpoint import checkpoint
 from typing import Optional, Tuple, Union, List, Dict, Any
 
 from vggt.layers import PatchEmbed
+from vggt.layers.attention import GrowableTensor
 from vggt.layers.block import Block
-from vggt.layers.rope import RotaryPositionEmbedding2D, PositionGetter
+from vggt.layers.rope import RotaryPositionEmbedding2D, PositionGetter, RopePlan
+from vggt.layers.token_merge import bipartite_soft_matching
 from vggt.layers.vision_transformer import vit_small, vit_base, vit_large, vit_giant2
+from vggt.utils.pos_embed_cache import pos_embed_cache
 
 logger = logging.getLogger(__name__)
 
@@ -47,6 +50,23 @@ class Aggregator(nn.Module):
         qk_norm (bool): Whether to apply QK normalization.
         rope_freq (int): Base frequency for rotary embedding. -1 to disable.
         init_values (float): Init scale for layer scale.
+        global_attn_block_size (int, optional): If set, global attention uses tiled attention with query/key
+            blocks of this size, so its memory grows linearly with the number of frames (useful on CPU).
+            Can also be changed after construction by setting `attn.attn_block_size` on the global blocks.
+        global_topk (int, optional): If set, global attention is sparse: the tokens of each frame only attend
+            to the tokens of the same frame, of the first (reference) frame and of its global_topk most similar
+            other frames. Similarity is the cosine similarity of the DINO class tokens. If None, dense.
+        token_merge_ratio (float or list[float]): Fraction of the patch tokens of each frame merged with
+            similar tokens before each global block (ToMe-style), either one value for all blocks or one per
+            global block. At most 0.5. The block update is un-merged, so all the outputs keep every token.
+            Merged tokens use proportional attention: the log of their size is added to their attention logits.
+        frame_chunk_size (int, optional): If set, the patch embedding and the frame blocks, which process each
+            frame independently, run on chunks of this many frames, written into a preallocated token buffer.
+            Their peak activation memory then no longer grows with the number of frames, and only global
+            attention needs the whole sequence at once. Can be changed after construction.
+
+    The attribute patch_token_cache can be set to a PatchTokenCache (vggt/utils/patch_token_cache.py),
+    so that in eval mode the patch embedding only runs on the frames whose tokens are not cached on disk.
     """
 
     def __init__(
@@ -68,6 +88,10 @@ class Aggregator(nn.Module):
         qk_norm=True,
         rope_freq=100,
         init_values=0.01,
+        global_attn_block_size=None,
+        global_topk=None,
+        token_merge_ratio=0.0,
+        frame_chunk_size=None,
     ):
         super().__init__()
 
@@ -106,6 +130,7 @@ class Aggregator(nn.Module):
                     init_values=init_values,
                     qk_norm=qk_norm,
                     rope=self.rope,
+                    attn_block_size=global_attn_block_size,
                 )
                 for _ in range(depth)
             ]
@@ -134,12 +159,26 @@ class Aggregator(nn.Module):
         nn.init.normal_(self.camera_token, std=1e-6)
         nn.init.normal_(self.register_token, std=1e-6)
 
-        # Register normalization constants as buffers
-        for name, value in (("_resnet_mean", _RESNET_MEAN), ("_resnet_std", _RESNET_STD)):
-            self.register_buffer(name, torch.FloatTensor(value).view(1, 1, 3, 1, 1), persistent=False)
+        self.init_non_persistent_buffers()
 
         self.use_reentrant = False # hardcoded to False
 
+        # Can be changed after construction, e.g. model.aggregator.global_topk = 16
+        self.global_topk = global_topk
+        self.token_merge_ratio = token_merge_ratio
+        self.frame_chunk_size = frame_chunk_size
+        # Optional PatchTokenCache, consulted before running the patch embedding
+        self.patch_token_cache = None
+
+    def init_non_persistent_buffers(self, device=None, dtype=None):
+        """
+        Register the normalization constants as buffers. They are not part of the state dict,
+        so they are re-created after the model is materialized from the meta device.
+        """
+        for name, value in (("_resnet_mean", _RESNET_MEAN), ("_resnet_std", _RESNET_STD)):
+            buffer = torch.tensor(value, device=device, dtype=dtype).view(1, 1, 3, 1, 1)
+            self.register_buffer(name, buffer, persistent=False)
+
     def __build_patch_embed__(
         self,
         patch_embed,
@@ -181,55 +220,116 @@ class Aggregator(nn.Module):
             if hasattr(self.patch_embed, "mask_token"):
                 self.patch_embed.mask_token.requires_grad_(False)
 
-    def forward(self, images: torch.Tensor) -> Tuple[List[torch.Tensor], int]:
+    def forward(
+        self,
+        images: torch.Tensor,
+        output_layers: Optional[List[int]] = None,
+        cache: Optional["AggregatorCache"] = None,
+        scene_lengths: Optional[List[int]] = None,
+        return_frame_graph: bool = False,
+    ) -> Tuple[List[Optional[torch.Tensor]], int]:
         """
         Args:
             images (torch.Tensor): Input images with shape [B, S, 3, H, W], in range [0, 1].
                 B: batch size, S: sequence length, 3: RGB channels, H: height, W: width
+            output_layers (list[int], optional): Indices of the blocks whose outputs should be kept,
+                negative indices count from the last block. If None, all outputs are kept.
+            cache (AggregatorCache, optional): State for incremental inference. If the cache is empty
+                (or due for a refresh), all the frames seen so far are processed and cached. Otherwise
+                only the new frames are processed, attending to the cached global keys/values.
+                Only supported in eval mode.
+            scene_lengths (list[int], optional): Number of frames of each scene, for a ragged batch of scenes
+                packed along the sequence dimension (images with shape [1, sum(scene_lengths), 3, H, W]).
+                Frame attention runs over all the packed frames, while global attention is block-diagonal,
+                so the frames of a scene never attend to another scene. The first frame of each scene
+                uses the first-frame camera and register tokens.
+            return_frame_graph (bool): If True, also return the frame graph of sparse global attention.
 
         Returns:
             (list[torch.Tensor], int):
-                The list of outputs from the attention blocks,
+                The list of outputs from the attention blocks, with one entry per block
+                (None for the blocks not listed in output_layers),
                 and the patch_start_idx indicating where patch tokens begin.
+                With a cache, the outputs cover the frames from cache.output_start onwards.
+                With return_frame_graph, a third element holds the indices of the frames each frame attended to
+                in global attention, with shape [B, S, global_topk + 2] (None if global attention was dense).
         """
         B, S, C_in, H, W = images.shape
 
         if C_in != 3:
             raise ValueError(f"Expected 3 input channels, got {C_in}")
 
+        if scene_lengths is not None:
+            if B != 1 or sum(scene_lengths) != S or min(scene_lengths) < 1:
+                raise ValueError(
+                    f"Packed scenes expect images with shape [1, {sum(scene_lengths)}, 3, H, W], got {tuple(images.shape)}"
+                )
+            if cache is not None or self.global_topk is not None:
+                raise ValueError("Packed scenes (scene_lengths) do not support a cache or sparse global attention")
+
+        # The first frame of the scene uses its own camera and register tokens,
+        # so incremental updates (which never contain it) only use the second set of tokens
+        has_first_frame = True
+        global_kv = None
+        if cache is not None:
+            if self.training:
+                raise ValueError("Incremental inference with a cache is only supported in eval mode")
+
+            num_cached = cache.num_frames
+            cache.add_images(images)
+            if cache.needs_refresh():
+                cache.kv = [dict() for _ in range(self.depth)]
+                cache.camera_token_buffer = None
+                cache.num_updates = 0
+                cache.output_start = 0
+                # Only a refresh re-processes all the frames seen so far
+                images = cache.images
+                B, S = images.shape[:2]
+            else:
+                cache.num_updates += 1
+                cache.output_start = num_cached
+                has_first_frame = False
+            global_kv = cache.kv
+
+        # Keys of the frames in the patch token cache, hashed once for all the chunks of frames
+        frame_keys = None
+        if self.patch_token_cache is not None and not self.training:
+            frame_keys = self.patch_token_cache.frame_keys(images, self.patch_embed)
+
         # Normalize images and reshape for patch embed
         images = (images - self._resnet_mean) / self._resnet_std
 
         # Reshape to [B*S, C, H, W] for patch embedding
         images = images.view(B * S, C_in, H, W)
-        patch_tokens = self.patch_embed(images)
-
-        if isinstance(patch_tokens, dict):
-            patch_tokens = patch_tokens["x_norm_patchtokens"]
-
-        _, P, C = patch_tokens.shape
 
         # Expand camera and register tokens to match batch size and sequence length
-        camera_token = slice_expand_and_flatten(self.camera_token, B, S)
-        register_token = slice_expand_and_flatten(self.register_token, B, S)
-
-        # Concatenate special tokens with patch tokens
-        tokens = torch.cat([camera_token, register_token, patch_tokens], dim=1)
-
-        pos = None
-        if self.rope is not None:
-            pos = self.position_getter(B * S, H // self.patch_size, W // self.patch_size, device=images.device)
-
-        if self.patch_start_idx > 0:
-            # do not use position embedding for special tokens (camera and register tokens)
-            # so set pos to 0 for the special tokens
-            pos = pos + 1
-            pos_special = torch.zeros(B * S, self.patch_start_idx, 2).to(images.device).to(pos.dtype)
-            pos = torch.cat([pos_special, pos], dim=1)
-
-        # update P because we added special tokens
+        camera_token = slice_expand_and_flatten(self.camera_token, B, S, has_first_frame, scene_lengths)
+        register_token = slice_expand_and_flatten(self.register_token, B, S, has_first_frame, scene_lengths)
+
+        # Special tokens followed by the patch tokens, [B*S, P, C]
+        tokens, frame_features = self._embed_frames(images, [camera_token, register_token], frame_keys)
+
+        # Sparse global attention over the top-k most similar frames, using the DINO class tokens
+        frame_neighbors = None
+        if self.global_topk is not None and self.global_topk + 2 < S:
+            if cache is not None:
+                raise ValueError("Sparse global attention (global_topk) does not support incremental inference")
+            if frame_features is None:
+                frame_features = tokens[:, self.patch_start_idx :].mean(dim=1)
+            frame_neighbors = compute_frame_graph(frame_features.view(B, S, -1), self.global_topk)
+
+        pos = self._token_positions(B * S, H, W, device=images.device)
+        # All the frames share the same positions: gather the RoPE tables once for all the blocks
+        rope_plan = self._rope_plan(pos[0], [(H, W)]) if pos is not None else None
+        # Global layout of the positions, copied once instead of in every global block
+        global_pos = pos.reshape(B, S * pos.shape[1], 2) if pos is not None else None
+
+        # P includes the special tokens
         _, P, C = tokens.shape
 
+        if output_layers is not None:
+            output_layers = {idx % self.depth for idx in output_layers}
+
         frame_idx = 0
         global_idx = 0
         output_list = []
@@ -238,26 +338,284 @@ class Aggregator(nn.Module):
             for attn_type in self.aa_order:
                 if attn_type == "frame":
                     tokens, frame_idx, frame_intermediates = self._process_frame_attention(
-                        tokens, B, S, P, C, frame_idx, pos=pos
+                        tokens, B, S, P, C, frame_idx, pos=pos, rope_plan=rope_plan
                     )
                 elif attn_type == "global":
                     tokens, global_idx, global_intermediates = self._process_global_attention(
-                        tokens, B, S, P, C, global_idx, pos=pos
+                        tokens,
+                        B,
+                        S,
+                        P,
+                        C,
+                        global_idx,
+                        pos=global_pos,
+                        rope_plan=rope_plan,
+                        global_kv=global_kv,
+                        frame_neighbors=frame_neighbors,
+                        scene_lengths=scene_lengths,
                     )
                 else:
                     raise ValueError(f"Unknown attention type: {attn_type}")
 
             for i in range(len(frame_intermediates)):
+                # Only materialize the outputs that will be consumed, the others are left as None
+                if output_layers is not None and len(output_list) not in output_layers:
+                    output_list.append(None)
+                    continue
                 # concat frame and global intermediates, [B x S x P x 2C]
                 concat_inter = torch.cat([frame_intermediates[i], global_intermediates[i]], dim=-1)
                 output_list.append(concat_inter)
 
-        del concat_inter
+        if cache is not None:
+            # Keep the camera tokens of the last block, so the camera head can see the whole scene
+            camera_tokens = torch.cat([frame_intermediates[-1], global_intermediates[-1]], dim=-1)[:, :, :1]
+            if cache.camera_token_buffer is None:
+                cache.camera_token_buffer = GrowableTensor(camera_tokens, dim=1)
+            else:
+                cache.camera_token_buffer.append(camera_tokens)
+
         del frame_intermediates
         del global_intermediates
+        if return_frame_graph:
+            return output_list, self.patch_start_idx, frame_neighbors
         return output_list, self.patch_start_idx
 
-    def _process_frame_attention(self, tokens, B, S, P, C, frame_idx, pos=None):
+    def forward_mixed(
+        self, frames: List[torch.Tensor], output_layers: Optional[List[int]] = None
+    ) -> Tuple[List[List[Optional[torch.Tensor]]], int, List[List[int]]]:
+        """
+        Alternating attention over the frames of one scene with different image sizes (e.g., portrait
+        and landscape shots), without padding them to a common size.
+
+        Frames with the same size are grouped: patch embedding and frame attention run per group, while
+        global attention runs over the concatenated tokens of all the frames, each frame keeping its own
+        number of patches and RoPE positions. Since no padding token is ever created, no attention mask is needed.
+
+        Args:
+            frames (list[torch.Tensor]): Images of each frame with shape [3, H_i, W_i], in range [0, 1].
+                H_i and W_i must be multiples of the patch size. The first frame is the reference frame.
+            output_layers (list[int], optional): Indices of the blocks whose outputs should be kept,
+                as in forward.
+
+        Returns:
+            (list[list[torch.Tensor]], int, list[list[int]]):
+                For each group of frames with the same size, the list of outputs of the attention blocks,
+                with shape [1, n_g, P_g, 2C] (None for the blocks not listed in output_layers),
+                the patch_start_idx, and the indices of the frames in each group.
+        """
+        merge_ratios = self.token_merge_ratio
+        if not isinstance(merge_ratios, (list, tuple)):
+            merge_ratios = [merge_ratios]
+        if self.global_topk is not None or any(ratio > 0 for ratio in merge_ratios):
+            raise ValueError("Frames with mixed sizes do not support sparse global attention or token merging")
+
+        groups = group_frames_by_shape(frames)
+
+        group_tokens = []
+        group_pos = []
+        for frame_ids in groups:
+            images = torch.stack([frames[i] for i in frame_ids])
+            num_frames, C_in, H, W = images.shape
+            if C_in != 3:
+                raise ValueError(f"Expected 3 input channels, got {C_in}")
+
+            frame_keys = None
+            if self.patch_token_cache is not None and not self.training:
+                frame_keys = self.patch_token_cache.frame_keys(images, self.patch_embed)
+
+            images = (images - self._resnet_mean[0]) / self._resnet_std[0]
+
+            # Only the first frame of the scene uses the first-frame camera and register tokens
+            token_idx = torch.tensor([int(i != 0) for i in frame_ids], device=images.device)
+            camera_token = self.camera_token[0, token_idx]
+            register_token = self.register_token[0, token_idx]
+
+            tokens, _ = self._embed_frames(images, [camera_token, register_token], frame_keys)
+            group_tokens.append(tokens)
+            group_pos.append(self._token_positions(num_frames, H, W, device=images.device))
+
+        C = group_tokens[0].shape[-1]
+        if self.rope is not None:
+            global_pos = torch.cat([pos.reshape(1, -1, 2) for pos in group_pos], dim=1)
+            shapes = [frames[frame_ids[0]].shape[-2:] for frame_ids in groups]
+            group_plans = [self._rope_plan(pos[0], [shape]) for pos, shape in zip(group_pos, shapes)]
+            global_plan = self._rope_plan(global_pos, shapes)
+        else:
+            global_pos = None
+            group_plans = [None] * len(groups)
+            global_plan = None
+
+        if output_layers is not None:
+            output_layers = {idx % self.depth for idx in output_layers}
+
+        frame_idx = 0
+        global_idx = 0
+        group_outputs = [[] for _ in groups]
+
+        for _ in range(self.aa_block_num):
+            for attn_type in self.aa_order:
+                intermediates = []
+                for _ in range(self.aa_block_size):
+                    if attn_type == "frame":
+                        block = self.frame_blocks[frame_idx]
+                        group_tokens = [
+                            self._run_frame_block(block, tokens, pos, rope_plan=plan)
+                            for tokens, pos, plan in zip(group_tokens, group_pos, group_plans)
+                        ]
+                        frame_idx += 1
+                    elif attn_type == "global":
+                        # All the tokens of the scene in a single sequence of variable-size frames
+                        block = self.global_blocks[global_idx]
+                        lengths = [tokens.shape[0] * tokens.shape[1] for tokens in group_tokens]
+                        tokens = torch.cat([tokens.reshape(1, -1, C) for tokens in group_tokens], dim=1)
+                        tokens = self._run_block(block, tokens, global_pos, rope_plan=global_plan)
+                        group_tokens = [
+                            chunk.view_as(prev) for chunk, prev in zip(tokens.split(lengths, dim=1), group_tokens)
+                        ]
+                        global_idx += 1
+                    else:
+                        raise ValueError(f"Unknown attention type: {attn_type}")
+                    intermediates.append(group_tokens)
+
+                if attn_type == "frame":
+                    frame_intermediates = intermediates
+                else:
+                    global_intermediates = intermediates
+
+            for i in range(len(frame_intermediates)):
+                layer_idx = len(group_outputs[0])
+                for g in range(len(groups)):
+                    if output_layers is not None and layer_idx not in output_layers:
+                        group_outputs[g].append(None)
+                    else:
+                        # concat frame and global intermediates, [1 x n_g x P_g x 2C]
+                        concat_inter = torch.cat([frame_intermediates[i][g], global_intermediates[i][g]], dim=-1)
+                        group_outputs[g].append(concat_inter.unsqueeze(0))
+
+        del frame_intermediates
+        del global_intermediates
+        return group_outputs, self.patch_start_idx, groups
+
+    def _run_block(self, block, tokens, pos=None, **attn_kwargs):
+        if self.training:
+            return checkpoint(block, tokens, pos, use_reentrant=self.use_reentrant, **attn_kwargs)
+        return block(tokens, pos=pos, **attn_kwargs)
+
+    def _run_frame_block(self, block, tokens, pos=None, **attn_kwargs):
+        """
+        Run a frame block on tokens [N, P, C], in chunks of frame_chunk_size frames if set.
+        """
+        chunk_size = self.frame_chunk_size
+        if not chunk_size or chunk_size >= tokens.shape[0]:
+            return self._run_block(block, tokens, pos, **attn_kwargs)
+
+        output = torch.empty_like(tokens)
+        for start in range(0, tokens.shape[0], chunk_size):
+            end = start + chunk_size
+            chunk_pos = pos[start:end] if pos is not None else None
+            output[start:end] = self._run_block(block, tokens[start:end], chunk_pos, **attn_kwargs)
+        return output
+
+    def _embed_frames(self, images, special_tokens, frame_keys=None):
+        """
+        Patch embedding of normalized images [N, 3, H, W], in chunks of frame_chunk_size frames if set.
+        If frame_keys (the keys of the N frames in the patch token cache) are given, the cache is used.
+
+        Returns:
+            (torch.Tensor, torch.Tensor or None): The special tokens (list of [N, n_i, C] tensors, in order)
+            followed by the patch tokens, [N, P, C], and the DINO class tokens [N, C] (None for a conv
+            patch embed).
+        """
+        num_frames = images.shape[0]
+        chunk_size = self.frame_chunk_size or num_frames
+        special_tokens = torch.cat(special_tokens, dim=1)
+        num_special = special_tokens.shape[1]
+
+        tokens = None
+        class_tokens = []
+        for start in range(0, num_frames, chunk_size):
+            end = start + chunk_size
+            chunk_keys = frame_keys[start:end] if frame_keys is not None else None
+            patch_tokens, chunk_class_tokens = self._patch_embed(images[start:end], chunk_keys)
+            if chunk_class_tokens is not None:
+                class_tokens.append(chunk_class_tokens)
+
+            if tokens is None:
+                # Same dtype as concatenating the special tokens and the patch tokens
+                dtype = torch.promote_types(special_tokens.dtype, patch_tokens.dtype)
+                P = num_special + patch_tokens.shape[1]
+                tokens = patch_tokens.new_empty(num_frames, P, patch_tokens.shape[-1], dtype=dtype)
+                tokens[:, :num_special] = special_tokens
+            tokens[start:end, num_special:] = patch_tokens
+
+        class_tokens = torch.cat(class_tokens) if class_tokens else None
+        return tokens, class_tokens
+
+    def _patch_embed(self, images, frame_keys=None):
+        """
+        Patch tokens [N, P, C] and class tokens [N, C] (None for a conv patch embed) of images [N, 3, H, W],
+        read from the patch token cache for the frames already embedded if their keys are given.
+        """
+        cache = self.patch_token_cache
+        if frame_keys is None:
+            patch_tokens = self.patch_embed(images)
+            if isinstance(patch_tokens, dict):
+                return patch_tokens["x_norm_patchtokens"], patch_tokens["x_norm_clstoken"]
+            return patch_tokens, None
+
+        # Each cache entry holds the class token (if any) followed by the patch tokens of a frame
+        has_class_token = hasattr(self.patch_embed, "cls_token")
+        frame_tokens = [cache.get(key) for key in frame_keys]
+
+        missing = [i for i, tokens in enumerate(frame_tokens) if tokens is None]
+        if missing:
+            patch_tokens = self.patch_embed(images[missing])
+            if isinstance(patch_tokens, dict):
+                class_tokens = patch_tokens["x_norm_clstoken"][:, None]
+                patch_tokens = torch.cat([class_tokens, patch_tokens["x_norm_patchtokens"]], dim=1)
+            for i, tokens in zip(missing, patch_tokens):
+                frame_tokens[i] = cache.put(frame_keys[i], tokens)
+
+        frame_tokens = torch.stack(frame_tokens).to(device=images.device, dtype=images.dtype)
+        if has_class_token:
+            return frame_tokens[:, 1:], frame_tokens[:, 0]
+        return frame_tokens, None
+
+    def _token_positions(self, num_frames, H, W, device=None):
+        """
+        RoPE positions of the tokens of num_frames frames of size (H, W), with shape (num_frames, P, 2),
+        or None if RoPE is disabled. The positions of one frame are cached, and expanded (not copied)
+        over the frames.
+        """
+        if self.rope is None:
+            return None
+
+        def build():
+            pos = self.position_getter(1, H // self.patch_size, W // self.patch_size, device=device)
+            if self.patch_start_idx > 0:
+                # do not use position embedding for special tokens (camera and register tokens)
+                # so set pos to 0 for the special tokens
+                pos = pos + 1
+                pos_special = torch.zeros(1, self.patch_start_idx, 2).to(device).to(pos.dtype)
+                pos = torch.cat([pos_special, pos], dim=1)
+            return pos
+
+        grid = (H // self.patch_size, W // self.patch_size)
+        pos = pos_embed_cache.get("rope_positions", grid, 2, torch.int64, device, build, extra=(self.patch_start_idx,))
+        return pos.expand(num_frames, -1, -1)
+
+    def _rope_plan(self, positions, image_sizes):
+        """
+        RoPE plan shared by all the attention blocks of a forward pass, for the given token positions
+        of frames with the given image sizes [(H, W), ...]. The largest position is known from the image
+        sizes, which avoids reading it back from the device.
+        """
+        max_grid = max(max(H, W) // self.patch_size for H, W in image_sizes)
+        max_position = max_grid + 1 if self.patch_start_idx > 0 else max_grid
+        head_dim = self.frame_blocks[0].attn.head_dim
+        return RopePlan(self.rope, positions, head_dim, max_position=max_position)
+
+    def _process_frame_attention(self, tokens, B, S, P, C, frame_idx, pos=None, rope_plan=None):
         """
         Process frame attention blocks. We keep tokens in shape (B*S, P, C).
         """
@@ -269,43 +627,183 @@ class Aggregator(nn.Module):
             pos = pos.view(B, S, P, 2).view(B * S, P, 2)
 
         intermediates = []
+        attn_kwargs = {"rope_plan": rope_plan} if rope_plan is not None else {}
 
         # by default, self.aa_block_size=1, which processes one block at a time
         for _ in range(self.aa_block_size):
-            if self.training:
-                tokens = checkpoint(self.frame_blocks[frame_idx], tokens, pos, use_reentrant=self.use_reentrant)
-            else:
-                tokens = self.frame_blocks[frame_idx](tokens, pos=pos)
+            tokens = self._run_frame_block(self.frame_blocks[frame_idx], tokens, pos, **attn_kwargs)
             frame_idx += 1
             intermediates.append(tokens.view(B, S, P, C))
 
         return tokens, frame_idx, intermediates
 
-    def _process_global_attention(self, tokens, B, S, P, C, global_idx, pos=None):
+    def _process_global_attention(
+        self,
+        tokens,
+        B,
+        S,
+        P,
+        C,
+        global_idx,
+        pos=None,
+        rope_plan=None,
+        global_kv=None,
+        frame_neighbors=None,
+        scene_lengths=None,
+    ):
         """
         Process global attention blocks. We keep tokens in shape (B, S*P, C).
+        If global_kv is given, it holds the per-block key/value caches used for incremental inference.
+        If frame_neighbors is given, each frame only attends to the frames listed in its row.
+        If scene_lengths is given, the frames are packed scenes and each scene only attends to itself.
         """
         if tokens.shape != (B, S * P, C):
             tokens = tokens.view(B, S, P, C).view(B, S * P, C)
 
         if pos is not None and pos.shape != (B, S * P, 2):
-            pos = pos.view(B, S, P, 2).view(B, S * P, 2)
+            # reshape, since the positions may be expanded from those of a single frame
+            pos = pos.reshape(B, S * P, 2)
 
         intermediates = []
 
         # by default, self.aa_block_size=1, which processes one block at a time
         for _ in range(self.aa_block_size):
-            if self.training:
-                tokens = checkpoint(self.global_blocks[global_idx], tokens, pos, use_reentrant=self.use_reentrant)
+            attn_kwargs = {}
+            if rope_plan is not None:
+                attn_kwargs["rope_plan"] = rope_plan
+            if frame_neighbors is not None:
+                attn_kwargs["frame_neighbors"] = frame_neighbors
+            if global_kv is not None:
+                attn_kwargs["kv_cache"] = global_kv[global_idx]
+            if scene_lengths is not None:
+                attn_kwargs["cu_seqlens"] = scene_cu_seqlens(scene_lengths, P)
+
+            num_merged = self._num_merged_tokens(global_idx, P)
+            if num_merged > 0:
+                tokens = self._merged_global_block(tokens, B, S, P, C, global_idx, num_merged, pos, attn_kwargs)
+            elif self.training:
+                tokens = checkpoint(
+                    self.global_blocks[global_idx], tokens, pos, use_reentrant=self.use_reentrant, **attn_kwargs
+                )
             else:
-                tokens = self.global_blocks[global_idx](tokens, pos=pos)
+                tokens = self.global_blocks[global_idx](tokens, pos=pos, **attn_kwargs)
             global_idx += 1
             intermediates.append(tokens.view(B, S, P, C))
 
         return tokens, global_idx, intermediates
 
+    def _num_merged_tokens(self, global_idx, P):
+        """
+        Number of patch tokens per frame merged before the given global block.
+        """
+        ratio = self.token_merge_ratio
+        if isinstance(ratio, (list, tuple)):
+            ratio = ratio[global_idx]
+        if not ratio:
+            return 0
+        num_patches = P - self.patch_start_idx
+        return min(int(num_patches * ratio), num_patches // 2)
+
+    def _merged_global_block(self, tokens, B, S, P, C, global_idx, num_merged, pos=None, attn_kwargs={}):
+        """
+        Run a global block on merged tokens: similar patch tokens of each frame are merged,
+        and the update computed by the block is un-merged back onto all the tokens.
+        """
+        frame_tokens = tokens.view(B * S, P, C)
+        merge, unmerge = bipartite_soft_matching(frame_tokens, num_merged, num_protected=self.patch_start_idx)
+
+        merged_tokens = merge(frame_tokens)
+        merged_P = merged_tokens.shape[1]
+
+        merged_pos = None
+        if pos is not None:
+            # Merged tokens keep the position of the token they were merged into
+            merged_pos = merge(pos.view(B * S, P, 2), mode=None).view(B, S * merged_P, 2)
+
+        # The merged positions differ from frame to frame and from block to block
+        attn_kwargs = {key: value for key, value in attn_kwargs.items() if key != "rope_plan"}
+
+        # Proportional attention: each merged token is weighted by the number of tokens it stands for
+        ones = torch.ones(B * S, P, 1, device=tokens.device)
+        attn_kwargs["token_sizes"] = merge(ones, mode="sum").view(B, S * merged_P)
+
+        if "cu_seqlens" in attn_kwargs:
+            frame_offsets = [offset // P for offset in attn_kwargs["cu_seqlens"]]
+            attn_kwargs = dict(attn_kwargs, cu_seqlens=[offset * merged_P for offset in frame_offsets])
+
+        block = self.global_blocks[global_idx]
+        merged_input = merged_tokens.view(B, S * merged_P, C)
+        if self.training:
+            merged_output = checkpoint(block, merged_input, merged_pos, use_reentrant=self.use_reentrant, **attn_kwargs)
+        else:
+            merged_output = block(merged_input, pos=merged_pos, **attn_kwargs)
 
-def slice_expand_and_flatten(token_tensor, B, S):
+        update = merged_output.view(B * S, merged_P, C) - merged_tokens
+        return (frame_tokens + unmerge(update)).view(B, S * P, C)
+
+
+def compute_frame_graph(frame_features: torch.Tensor, k: int) -> torch.Tensor:
+    """
+    Build the frame neighbourhood graph used by sparse global attention.
+
+    Each frame is connected to itself, to the first (reference) frame, and to its k most similar
+    other frames by cosine similarity of the given per-frame features. The reference frame itself
+    has no separate reference, so it gets k + 1 most similar frames instead.
+
+    Args:
+        frame_features (torch.Tensor): Per-frame global descriptors with shape (B, S, D).
+        k (int): Number of most similar frames of each frame, besides itself and the reference frame.
+
+    Returns:
+        torch.Tensor: Long tensor with shape (B, S, k + 2), the first column being the frame itself
+            and the second one the reference frame (except for the reference frame).
+    """
+    B, S, _ = frame_features.shape
+    features = F.normalize(frame_features.float(), dim=-1)
+    similarity = features @ features.transpose(1, 2)
+
+    # Force the frame itself first and the reference frame second
+    similarity[:, :, 0] = 2.0
+    frame_ids = torch.arange(S, device=similarity.device)
+    similarity[:, frame_ids, frame_ids] = 3.0
+
+    return similarity.topk(k + 2, dim=-1).indices
+
+
+def group_frames_by_shape(frames: List[torch.Tensor]) -> List[List[int]]:
+    """
+    Group the indices of frames with the same image size, in order of first appearance.
+
+    Args:
+        frames (list[torch.Tensor]): Images with shape [3, H_i, W_i].
+
+    Returns:
+        list[list[int]]: Indices of the frames of each group.
+    """
+    groups = {}
+    for i, frame in enumerate(frames):
+        groups.setdefault(tuple(frame.shape[-2:]), []).append(i)
+    return list(groups.values())
+
+
+def scene_cu_seqlens(scene_lengths: List[int], tokens_per_frame: int = 1) -> List[int]:
+    """
+    Cumulative token offsets of packed scenes, as consumed by Attention (cu_seqlens).
+
+    Args:
+        scene_lengths (list[int]): Number of frames of each scene.
+        tokens_per_frame (int): Number of tokens of each frame.
+
+    Returns:
+        list[int]: Offsets [0, n_0, n_0 + n_1, ...] with n_i = scene_lengths[i] * tokens_per_frame.
+    """
+    cu_seqlens = [0]
+    for length in scene_lengths:
+        cu_seqlens.append(cu_seqlens[-1] + length * tokens_per_frame)
+    return cu_seqlens
+
+
+def slice_expand_and_flatten(token_tensor, B, S, has_first_frame=True, scene_lengths=None):
     """
     Processes specialized tokens with shape (1, 2, X, C) for multi-frame processing:
     1) Uses the first position (index=0) for the first frame only
@@ -315,9 +813,23 @@ def slice_expand_and_flatten(token_tensor, B, S):
        followed by (S-1) second-position tokens
     5) Flattens to (B*S, X, C) for processing
 
+    If has_first_frame is False (e.g., frames appended to an existing scene),
+    the second position is used for all S frames.
+
+    If scene_lengths is given (B=1 and S packed frames of several scenes),
+    the first position is used for the first frame of each scene.
+
     Returns:
         torch.Tensor: Processed tokens with shape (B*S, X, C)
     """
+    if scene_lengths is not None:
+        token_idx = torch.ones(S, dtype=torch.long, device=token_tensor.device)
+        token_idx[scene_cu_seqlens(scene_lengths)[:-1]] = 0
+        return token_tensor[0, token_idx]
+
+    if not has_first_frame:
+        others = token_tensor[:, 1:, ...].expand(B, S, *token_tensor.shape[2:])
+        return others.reshape(B * S, *others.shape[2:])
 
     # Slice out the "query" tokens => shape (1, 1, ...)
     query = token_tensor[:, 0:1, ...].expand(B, 1, *token_tensor.shape[2:])
@@ -329,3 +841,67 @@ def slice_expand_and_flatten(token_tensor, B, S):
     # Finally flatten => shape (B*S, ...)
     combined = combined.view(B * S, *combined.shape[2:])
     return combined
+
+
+class AggregatorCache:
+    """
+    State kept across Aggregator calls for incremental inference, where frames are appended
+    to an existing scene (e.g., a live capture session).
+
+    For every global attention block, the cache holds the keys/values of all the frames seen so far,
+    so that appended frames only attend to the cached context and the per-frame cost does not grow
+    with the number of frames already processed. Note that the earlier frames are not updated with
+    the context of the appended ones until the cache is refreshed.
+
+    Args:
+        refresh_every (int, optional): Re-process all the frames seen so far once every refresh_every
+            incremental updates. If None, the cache is never refreshed.
+
+    The frames, camera tokens and keys/values are kept in GrowableTensor buffers, so appending a frame does
+    not copy the whole history.
+
+    Attributes:
+        kv (list[dict]): Per global block key/value cache, as consumed by Attention.
+        images (torch.Tensor): All the frames seen so far, with shape [B, S, 3, H, W] (a view of the buffer).
+        camera_tokens (torch.Tensor): Last block camera tokens of all the frames, with shape [B, S, 1, 2C]
+            (a view of the buffer).
+        num_updates (int): Number of incremental updates since the last full pass.
+        output_start (int): Index of the first frame covered by the outputs of the last call.
+    """
+
+    def __init__(self, refresh_every: Optional[int] = None):
+        self.refresh_every = refresh_every
+        self.reset()
+
+    def reset(self):
+        """Drop all the cached state."""
+        self.kv = None
+        self.image_buffer = None
+        self.camera_token_buffer = None
+        self.num_updates = 0
+        self.output_start = 0
+
+    def add_images(self, images: torch.Tensor):
+        """Append frames with shape [B, S, 3, H, W] to the frames seen so far."""
+        if self.image_buffer is None:
+            self.image_buffer = GrowableTensor(images, dim=1)
+        else:
+            self.image_buffer.append(images)
+
+    @property
+    def images(self) -> Optional[torch.Tensor]:
+        return None if self.image_buffer is None else self.image_buffer.tensor
+
+    @property
+    def camera_tokens(self) -> Optional[torch.Tensor]:
+        return None if self.camera_token_buffer is None else self.camera_token_buffer.tensor
+
+    @property
+    def num_frames(self) -> int:
+        return 0 if self.image_buffer is None else self.image_buffer.length
+
+    def needs_refresh(self) -> bool:
+        """Whether the next call should re-process all the frames seen so far."""
+        if self.kv is None:
+            return True
+        return self.refresh_every is not None and self.num_updates >= self.refresh_every
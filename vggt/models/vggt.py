@@ -4,19 +4,27 @@
 # This source code is licensed under the license found in the
 # LICENSE file in the root directory of this source tree.
 
+from typing import Iterator
+
 import torch
 import torch.nn as nn
 from huggingface_hub import PyTorchModelHubMixin  # used for model hub
 
-from vggt.models.aggregator import Aggregator
+from vggt.models.aggregator import Aggregator, AggregatorCache, scene_cu_seqlens
 from vggt.heads.camera_head import CameraHead
 from vggt.heads.dpt_head import DPTHead
 from vggt.heads.track_head import TrackHead
+from vggt.utils.concurrent_heads import run_heads_concurrently
+from vggt.utils.output_spec import OutputSpec
+from vggt.utils.packed_checkpoint import load_packed_checkpoint
+from vggt.utils.precision import PrecisionPolicy
 
 
 class VGGT(nn.Module, PyTorchModelHubMixin):
     def __init__(self, img_size=518, patch_size=14, embed_dim=1024,
-                 enable_camera=True, enable_point=True, enable_depth=True, enable_track=True):
+                 enable_camera=True, enable_point=True, enable_depth=True, enable_track=True,
+                 output_layers=None, camera_tolerance=None, keep_pose_enc_list=True, concurrent_heads=False,
+                 split_head_threads=False, precision_policy=None, output_spec=None):
         super().__init__()
 
         self.aggregator = Aggregator(img_size=img_size, patch_size=patch_size, embed_dim=embed_dim)
@@ -26,16 +34,162 @@ class VGGT(nn.Module, PyTorchModelHubMixin):
         self.depth_head = DPTHead(dim_in=2 * embed_dim, output_dim=2, activation="exp", conf_activation="expp1") if enable_depth else None
         self.track_head = TrackHead(dim_in=2 * embed_dim, patch_size=patch_size) if enable_track else None
 
-    def forward(self, images: torch.Tensor, query_points: torch.Tensor = None):
+        # Aggregator layers to keep during the forward pass. If None, derived from the enabled heads;
+        # an override must include the layers read by the enabled heads (see get_output_layers)
+        self.output_layers = output_layers
+
+        # Camera refinement in inference: stop refining a scene once its pose update is below camera_tolerance
+        # (see CameraHead.forward), and only keep the intermediate poses in pose_enc_list if keep_pose_enc_list
+        self.camera_tolerance = camera_tolerance
+        self.keep_pose_enc_list = keep_pose_enc_list
+
+        # Run the enabled heads concurrently in inference (CUDA streams, or CPU threads). With split_head_threads,
+        # the CPU heads share the intra-op threads, which changes the process-wide thread count while they run
+        # (see run_heads_concurrently): only for processes dedicated to the model
+        self.concurrent_heads = concurrent_heads
+        self.split_head_threads = split_head_threads
+
+        # Precision of each head. By default, float32 for the camera and DPT heads whatever the autocast state
+        self.precision_policy = precision_policy if precision_policy is not None else PrecisionPolicy()
+
+        # Default selection of the returned predictions in inference (dtype, image echo, sparse points)
+        self.output_spec = output_spec
+
+    @property
+    def precision_policy(self) -> PrecisionPolicy:
+        return self._precision_policy
+
+    @precision_policy.setter
+    def precision_policy(self, policy: PrecisionPolicy):
+        policy.apply(self)
+        self._precision_policy = policy
+
+    @classmethod
+    def from_state_dict(cls, state_dict: dict, **kwargs) -> "VGGT":
+        """
+        Build a model from a state dict without random initialisation.
+
+        The modules are created on the meta device (no memory is allocated and the initialisers do nothing),
+        then the parameters are bound to the tensors of the state dict with load_state_dict(assign=True),
+        so the weights are never held twice. The model is on the device of the state dict tensors.
+        Weights of disabled heads are ignored.
+
+        Args:
+            state_dict (dict): State dict of VGGT, e.g. torch.hub.load_state_dict_from_url(url).
+            **kwargs: Passed to the constructor, e.g. enable_track=False.
+
+        Returns:
+            VGGT: The model, in eval mode.
+        """
+        with torch.device("meta"):
+            model = cls(**kwargs)
+
+        missing_keys, unexpected_keys = model.load_state_dict(state_dict, strict=False, assign=True)
+        # The weights of the disabled heads (which are not submodules) are expected to be left over
+        unexpected_keys = [k for k in unexpected_keys if k.split(".")[0] in dict(model.named_children())]
+        if missing_keys or unexpected_keys:
+            raise ValueError(f"Mismatched weights, missing: {missing_keys}, unexpected: {unexpected_keys}")
+
+        model.init_non_persistent_buffers()
+        return model.eval()
+
+    @classmethod
+    def from_packed_checkpoint(cls, path: str, **kwargs) -> "VGGT":
+        """
+        Build a model and bind the weights of a packed checkpoint (see vggt/utils/packed_checkpoint.py
+        and convert_checkpoint.py). The file is memory-mapped and the weights are not copied.
+        As in from_state_dict, the model is built on the meta device and only the enabled heads are materialized.
+
+        Args:
+            path (str): Packed .safetensors checkpoint.
+            **kwargs: Passed to the constructor, e.g. enable_track=False.
+        """
+        with torch.device("meta"):
+            model = cls(**kwargs)
+        model = load_packed_checkpoint(model, path)
+        model.init_non_persistent_buffers()
+        return model
+
+    def init_non_persistent_buffers(self):
+        """
+        Re-create the buffers that are not part of the state dict (after construction on the meta device),
+        on the device and in the dtype of the aggregator weights.
+        """
+        weight = self.aggregator.camera_token
+        self.aggregator.init_non_persistent_buffers(device=weight.device, dtype=weight.dtype)
+
+        meta_tensors = [name for name, t in list(self.named_parameters()) + list(self.named_buffers()) if t.is_meta]
+        if meta_tensors:
+            raise ValueError(f"Some weights were not loaded: {meta_tensors}")
+
+    def get_output_layers(self, with_track: bool = True) -> list:
+        """
+        Return the sorted indices of the aggregator layers consumed by the enabled heads,
+        or the user-provided override if one was given at construction time.
+
+        Args:
+            with_track (bool): Whether the track head (if enabled) will be run.
+
+        Raises:
+            ValueError: If the override misses layers read by the enabled heads.
+        """
+        layers = []
+        if self.camera_head is not None:
+            layers.append(self.aggregator.depth - 1)  # the camera head only reads the last block
+        for head in (self.depth_head, self.point_head):
+            if head is not None:
+                layers.extend(head.intermediate_layer_idx)
+        if self.track_head is not None and with_track:
+            layers.extend(self.track_head.feature_extractor.intermediate_layer_idx)
+        layers = {idx % self.aggregator.depth for idx in layers}
+
+        if self.output_layers is None:
+            return sorted(layers)
+
+        output_layers = {idx % self.aggregator.depth for idx in self.output_layers}
+        missing = layers - output_layers
+        if missing:
+            raise ValueError(
+                f"output_layers {sorted(output_layers)} miss the layers {sorted(missing)} read by the enabled heads"
+            )
+        return sorted(output_layers)
+
+    def forward(
+        self,
+        images: torch.Tensor,
+        query_points: torch.Tensor = None,
+        cache: AggregatorCache = None,
+        frame_indices: list = None,
+        roi: list = None,
+        output_spec: OutputSpec = None,
+    ):
         """
         Forward pass of the VGGT model.
 
         Args:
-            images (torch.Tensor): Input images with shape [S, 3, H, W] or [B, S, 3, H, W], in range [0, 1].
-                B: batch size, S: sequence length, 3: RGB channels, H: height, W: width
+            images (torch.Tensor or list[torch.Tensor]): Input images with shape [S, 3, H, W] or [B, S, 3, H, W],
+                in range [0, 1]. B: batch size, S: sequence length, 3: RGB channels, H: height, W: width.
+                A list of scenes with shape [S_i, 3, H, W] and different frame counts is run as a ragged batch
+                without padding (see forward_scenes), and a list of prediction dicts is returned.
+                Frames of a single scene with different sizes are handled by forward_mixed.
             query_points (torch.Tensor, optional): Query points for tracking, in pixel coordinates.
                 Shape: [N, 2] or [B, N, 2], where N is the number of query points.
                 Default: None
+            cache (AggregatorCache, optional): State for incremental inference. The given images are
+                appended to the frames already in the cache, and only them are processed against the
+                cached context (all the frames are re-processed when the cache is empty or refreshed).
+                The predictions cover the frames from cache.output_start onwards.
+                Default: None
+            frame_indices (list[int], optional): Frames for which depth and world points are decoded, in the
+                order of the dense outputs. The camera and track predictions still cover all the frames.
+                Default: None (all the frames)
+            roi (optional): Region of interest (top, left, bottom, right) in pixels, bottom and right excluded,
+                to which depth and world points are restricted, or a list with one region (or None) per decoded
+                frame, in which case the dense outputs are lists of per-frame tensors [B, h_i, w_i, C].
+                Only the tokens covering the region (plus DPTHead.roi_margin patches) are decoded.
+                Default: None (whole frames)
+            output_spec (OutputSpec, optional): Dtype of the dense outputs, image echo and sparse confident
+                points, applied on device in inference. Default: None (self.output_spec, if any)
 
         Returns:
             dict: A dictionary containing the following predictions:
@@ -45,12 +199,27 @@ class VGGT(nn.Module, PyTorchModelHubMixin):
                 - world_points (torch.Tensor): 3D world coordinates for each pixel with shape [B, S, H, W, 3]
                 - world_points_conf (torch.Tensor): Confidence scores for world points with shape [B, S, H, W]
                 - images (torch.Tensor): Original input images, preserved for visualization
+                - frame_graph (torch.Tensor): Only with sparse global attention (aggregator.global_topk),
+                  indices of the frames each frame attended to with shape [B, S, global_topk + 2]
+                - camera_iterations (torch.Tensor): Only with camera_tolerance, number of camera refinement
+                  steps run for each scene with shape [B]
 
                 If query_points is provided, also includes:
                 - track (torch.Tensor): Point tracks with shape [B, S, N, 2] (from the last iteration), in pixel coordinates
                 - vis (torch.Tensor): Visibility scores for tracked points with shape [B, S, N]
                 - conf (torch.Tensor): Confidence scores for tracked points with shape [B, S, N]
+
+                With an output spec, the dense outputs have its dtype, images are only included if echoed,
+                and sparse_indices, sparse_points and sparse_conf hold the confident points (see OutputSpec).
         """        
+        if output_spec is None:
+            output_spec = self.output_spec
+
+        if isinstance(images, (list, tuple)):
+            if frame_indices is not None or roi is not None:
+                raise ValueError("frame_indices and roi are not supported with a list of scenes")
+            return self.forward_scenes(images, query_points=query_points, output_spec=output_spec)
+
         # If without batch dimension, add it
         if len(images.shape) == 4:
             images = images.unsqueeze(0)
@@ -58,40 +227,322 @@ class VGGT(nn.Module, PyTorchModelHubMixin):
         if query_points is not None and len(query_points.shape) == 2:
             query_points = query_points.unsqueeze(0)
 
-        aggregated_tokens_list, patch_start_idx = self.aggregator(images)
+        output_layers = self.get_output_layers(with_track=query_points is not None)
+        aggregated_tokens_list, patch_start_idx, frame_graph = self.aggregator(
+            images, output_layers=output_layers, cache=cache, return_frame_graph=True
+        )
+
+        if cache is not None:
+            # The images of a refreshed cache include the frames seen in the previous calls
+            images = cache.images[:, cache.output_start :]
 
         predictions = {}
 
-        with torch.cuda.amp.autocast(enabled=False):
-            if self.camera_head is not None:
-                pose_enc_list = self.camera_head(aggregated_tokens_list)
-                predictions["pose_enc"] = pose_enc_list[-1]  # pose encoding of the last iteration
-                predictions["pose_enc_list"] = pose_enc_list
-                
-            if self.depth_head is not None:
-                depth, depth_conf = self.depth_head(
-                    aggregated_tokens_list, images=images, patch_start_idx=patch_start_idx
+        if frame_graph is not None:
+            predictions["frame_graph"] = frame_graph
+
+        device_type = images.device.type
+
+        def camera_predictions():
+            with self.precision_policy.autocast("camera", device_type):
+                if cache is None:
+                    return self._camera_predictions(aggregated_tokens_list)
+                # The camera head attends across frames, so run it over the whole scene
+                camera = self._camera_predictions([cache.camera_tokens])
+                camera["pose_enc_list"] = [pose_enc[:, cache.output_start :] for pose_enc in camera["pose_enc_list"]]
+                camera["pose_enc"] = camera["pose_enc_list"][-1]
+                return camera
+
+        def dense_predictions(head, name, key):
+            with self.precision_policy.autocast(name, device_type):
+                preds, conf = head(
+                    aggregated_tokens_list,
+                    images=images,
+                    patch_start_idx=patch_start_idx,
+                    frame_indices=frame_indices,
+                    roi=roi,
                 )
-                predictions["depth"] = depth
-                predictions["depth_conf"] = depth_conf
+            return {key: preds, key + "_conf": conf}
 
-            if self.point_head is not None:
-                pts3d, pts3d_conf = self.point_head(
-                    aggregated_tokens_list, images=images, patch_start_idx=patch_start_idx
+        def track_predictions():
+            with self.precision_policy.autocast("track", device_type):
+                track_list, vis, conf = self.track_head(
+                    aggregated_tokens_list, images=images, patch_start_idx=patch_start_idx, query_points=query_points
                 )
-                predictions["world_points"] = pts3d
-                predictions["world_points_conf"] = pts3d_conf
+            return {"track": track_list[-1], "vis": vis, "conf": conf}  # track of the last iteration
 
+        heads = []
+        if self.camera_head is not None:
+            heads.append(("camera", camera_predictions))
+        if self.depth_head is not None:
+            heads.append(("depth", lambda: dense_predictions(self.depth_head, "depth", "depth")))
+        if self.point_head is not None:
+            heads.append(("point", lambda: dense_predictions(self.point_head, "point", "world_points")))
         if self.track_head is not None and query_points is not None:
-            track_list, vis, conf = self.track_head(
-                aggregated_tokens_list, images=images, patch_start_idx=patch_start_idx, query_points=query_points
-            )
-            predictions["track"] = track_list[-1]  # track of the last iteration
-            predictions["vis"] = vis
-            predictions["conf"] = conf
+            heads.append(("track", track_predictions))
+
+        if self.concurrent_heads and not self.training and len(heads) > 1:
+            head_predictions = run_heads_concurrently(heads, images.device, self.split_head_threads)
+        else:
+            head_predictions = [fn() for _, fn in heads]
+        for head_prediction in head_predictions:
+            predictions.update(head_prediction)
 
         if not self.training:
             predictions["images"] = images  # store the images for visualization during inference
+            if output_spec is not None:
+                output_spec.apply(predictions, frame_indices=frame_indices, roi=roi)
+
+        return predictions
+
+    def _camera_predictions(self, aggregated_tokens_list: list, cu_seqlens: list = None) -> dict:
+        """
+        Runs the camera head with the refinement settings of the model (camera_tolerance, keep_pose_enc_list).
+        """
+        pose_enc_list, iterations = self.camera_head(
+            aggregated_tokens_list,
+            cu_seqlens=cu_seqlens,
+            tolerance=self.camera_tolerance,
+            keep_intermediates=self.keep_pose_enc_list,
+            return_iterations=True,
+        )
+        predictions = {"pose_enc": pose_enc_list[-1], "pose_enc_list": pose_enc_list}  # last iteration
+        if iterations is not None:
+            predictions["camera_iterations"] = iterations
+        return predictions
+
+    def forward_scenes(self, scenes: list, query_points: list = None, output_spec: OutputSpec = None) -> list:
+        """
+        Forward pass over a ragged batch of independent scenes with different numbers of frames.
+
+        The scenes are packed along the sequence dimension instead of being padded to the longest one:
+        frame attention and the DPT heads run over all the packed frames at once, while global attention
+        and the camera head trunk use block-diagonal attention so that each scene only attends to itself.
+        The track head is run scene by scene.
+
+        Args:
+            scenes (list[torch.Tensor]): Images of each scene with shape [S_i, 3, H, W], in range [0, 1].
+                All the scenes must share the same H and W.
+            query_points (list[torch.Tensor], optional): Query points of each scene with shape [N_i, 2],
+                in pixel coordinates. Default: None
+            output_spec (OutputSpec, optional): Applied to the predictions of each scene in inference.
+                Default: None
+
+        Returns:
+            list[dict]: The predictions of each scene, as returned by forward for a batch size of 1.
+        """
+        scene_lengths = [scene.shape[0] for scene in scenes]
+        if query_points is not None and len(query_points) != len(scenes):
+            raise ValueError(f"Expected query points for {len(scenes)} scenes, got {len(query_points)}")
+
+        images = torch.cat(list(scenes), dim=0).unsqueeze(0)  # [1, sum(S_i), 3, H, W]
+
+        output_layers = self.get_output_layers(with_track=query_points is not None)
+        aggregated_tokens_list, patch_start_idx = self.aggregator(
+            images, output_layers=output_layers, scene_lengths=scene_lengths
+        )
+
+        packed = {}
+        device_type = images.device.type
+
+        if self.camera_head is not None:
+            with self.precision_policy.autocast("camera", device_type):
+                packed.update(
+                    self._camera_predictions(aggregated_tokens_list, cu_seqlens=scene_cu_seqlens(scene_lengths))
+                )
+
+        if self.depth_head is not None:
+            with self.precision_policy.autocast("depth", device_type):
+                packed["depth"], packed["depth_conf"] = self.depth_head(
+                    aggregated_tokens_list, images=images, patch_start_idx=patch_start_idx
+                )
+
+        if self.point_head is not None:
+            with self.precision_policy.autocast("point", device_type):
+                packed["world_points"], packed["world_points_conf"] = self.point_head(
+                    aggregated_tokens_list, images=images, patch_start_idx=patch_start_idx
+                )
+
+        if not self.training:
+            packed["images"] = images
+
+        # One refinement step count per scene, not per frame
+        camera_iterations = packed.pop("camera_iterations", None)
+
+        predictions = []
+        start = 0
+        for i, length in enumerate(scene_lengths):
+            end = start + length
+            scene_predictions = {
+                key: [v[:, start:end] for v in value] if isinstance(value, list) else value[:, start:end]
+                for key, value in packed.items()
+            }
+            if camera_iterations is not None:
+                scene_predictions["camera_iterations"] = camera_iterations[i : i + 1]
+
+            if self.track_head is not None and query_points is not None:
+                scene_tokens_list = [
+                    tokens[:, start:end] if tokens is not None else None for tokens in aggregated_tokens_list
+                ]
+                scene_query_points = query_points[i]
+                if len(scene_query_points.shape) == 2:
+                    scene_query_points = scene_query_points.unsqueeze(0)
+                track_list, vis, conf = self.track_head(
+                    scene_tokens_list,
+                    images=images[:, start:end],
+                    patch_start_idx=patch_start_idx,
+                    query_points=scene_query_points,
+                )
+                scene_predictions["track"] = track_list[-1]
+                scene_predictions["vis"] = vis
+                scene_predictions["conf"] = conf
+
+            if output_spec is not None and not self.training:
+                output_spec.apply(scene_predictions)
+            predictions.append(scene_predictions)
+            start = end
+
+        return predictions
+
+    def forward_mixed(self, frames: list) -> dict:
+        """
+        Forward pass over the frames of one scene with different image sizes, without padding.
+
+        Frames with the same size are grouped, the aggregator attends across all the frames of the scene
+        (see Aggregator.forward_mixed), the DPT heads run per group and the camera head over all the frames.
+        The track head is not supported, since its feature maps must share the same size.
+
+        Args:
+            frames (list[torch.Tensor]): Images of each frame with shape [3, H_i, W_i], in range [0, 1],
+                with H_i and W_i multiples of the patch size (see load_and_preprocess_images with keep_shapes=True).
+
+        Returns:
+            dict: A dictionary containing the following predictions:
+                - pose_enc (torch.Tensor): Camera pose encoding with shape [1, S, 9] (from the last iteration)
+                - depth (list[torch.Tensor]): Predicted depth map of each frame with shape [H_i, W_i, 1]
+                - depth_conf (list[torch.Tensor]): Depth confidence of each frame with shape [H_i, W_i]
+                - world_points (list[torch.Tensor]): 3D world coordinates of each frame with shape [H_i, W_i, 3]
+                - world_points_conf (list[torch.Tensor]): World points confidence of each frame with shape [H_i, W_i]
+                - images (list[torch.Tensor]): Original input images, preserved for visualization
+        """
+        output_layers = self.get_output_layers(with_track=False)
+        group_outputs, patch_start_idx, groups = self.aggregator.forward_mixed(frames, output_layers=output_layers)
+
+        S = len(frames)
+        predictions = {}
+        device_type = frames[0].device.type
+
+        if self.camera_head is not None:
+            # Gather the camera tokens of all the frames, back in the input order
+            camera_tokens = [None] * S
+            for frame_ids, aggregated_tokens_list in zip(groups, group_outputs):
+                for j, i in enumerate(frame_ids):
+                    camera_tokens[i] = aggregated_tokens_list[-1][:, j, :1]
+            with self.precision_policy.autocast("camera", device_type):
+                predictions.update(self._camera_predictions([torch.stack(camera_tokens, dim=1)]))
+
+        for head, name, key in ((self.depth_head, "depth", "depth"), (self.point_head, "point", "world_points")):
+            if head is None:
+                continue
+            preds = [None] * S
+            confs = [None] * S
+            for frame_ids, aggregated_tokens_list in zip(groups, group_outputs):
+                images = torch.stack([frames[i] for i in frame_ids])[None]
+                with self.precision_policy.autocast(name, device_type):
+                    group_preds, group_conf = head(
+                        aggregated_tokens_list, images=images, patch_start_idx=patch_start_idx
+                    )
+                for j, i in enumerate(frame_ids):
+                    preds[i] = group_preds[0, j]
+                    confs[i] = group_conf[0, j]
+            predictions[key] = preds
+            predictions[key + "_conf"] = confs
+
+        if not self.training:
+            predictions["images"] = list(frames)
 
         return predictions
 
+    def forward_stream(
+        self, images: torch.Tensor, frames_chunk_size: int = 8, output_spec: OutputSpec = None
+    ) -> Iterator[dict]:
+        """
+        Streaming inference: yields the predictions of consecutive chunks of frames as soon as they are decoded.
+
+        The aggregator and the camera head (which attends across frames) run over the whole scene first, then
+        the DPT heads decode one chunk of frames at a time. Only the dense outputs of the current chunk are
+        held, so the earlier frames can be written or fused while the later ones decode. The track head is
+        not run. The grad mode and autocast state are those of the caller at each step of the iteration.
+
+        Args:
+            images (torch.Tensor): Input images with shape [S, 3, H, W] or [B, S, 3, H, W], in range [0, 1].
+            frames_chunk_size (int): Number of frames per chunk. Default: 8
+            output_spec (OutputSpec, optional): Applied to each chunk in inference.
+                Default: None (self.output_spec, if any)
+
+        Yields:
+            dict: The predictions of a chunk, as returned by forward for its frames (without pose_enc_list),
+                with frame_indices, the indices of its frames in the scene with shape [S_chunk].
+
+        Example:
+            with torch.no_grad():
+                for chunk in model.forward_stream(images, frames_chunk_size=4):
+                    write(chunk["frame_indices"], chunk["depth"])
+        """
+        if frames_chunk_size <= 0:
+            raise ValueError(f"frames_chunk_size must be positive, got {frames_chunk_size}")
+        if output_spec is None:
+            output_spec = self.output_spec
+
+        # If without batch dimension, add it
+        if len(images.shape) == 4:
+            images = images.unsqueeze(0)
+        S = images.shape[1]
+
+        output_layers = self.get_output_layers(with_track=False)
+        aggregated_tokens_list, patch_start_idx = self.aggregator(images, output_layers=output_layers)
+        device_type = images.device.type
+
+        camera = {}
+        if self.camera_head is not None:
+            with self.precision_policy.autocast("camera", device_type):
+                camera = self._camera_predictions(aggregated_tokens_list)
+
+        for start in range(0, S, frames_chunk_size):
+            end = min(start + frames_chunk_size, S)
+            chunk_tokens_list = [
+                tokens[:, start:end] if tokens is not None else None for tokens in aggregated_tokens_list
+            ]
+            chunk_images = images[:, start:end]
+
+            def dense_predictions(head, name, key):
+                with self.precision_policy.autocast(name, device_type):
+                    preds, conf = head(chunk_tokens_list, images=chunk_images, patch_start_idx=patch_start_idx)
+                return {key: preds, key + "_conf": conf}
+
+            heads = []
+            if self.depth_head is not None:
+                heads.append(("depth", lambda: dense_predictions(self.depth_head, "depth", "depth")))
+            if self.point_head is not None:
+                heads.append(("point", lambda: dense_predictions(self.point_head, "point", "world_points")))
+
+            if self.concurrent_heads and not self.training and len(heads) > 1:
+                head_predictions = run_heads_concurrently(heads, images.device, self.split_head_threads)
+            else:
+                head_predictions = [fn() for _, fn in heads]
+
+            chunk = {"frame_indices": torch.arange(start, end, device=images.device)}
+            if "pose_enc" in camera:
+                chunk["pose_enc"] = camera["pose_enc"][:, start:end]
+            if "camera_iterations" in camera:
+                chunk["camera_iterations"] = camera["camera_iterations"]
+            for head_prediction in head_predictions:
+                chunk.update(head_prediction)
+
+            if not self.training:
+                chunk["images"] = chunk_images
+                if output_spec is not None:
+                    output_spec.apply(chunk, frame_indices=range(start, end))
+
+            yield chunk
+            del chunk, head_predictions
@@ -0,0 +1,170 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+
+# torch.compile wrapper for VGGT, for workers that run the same model on many scenes of a few shapes.
+#
+# The compiled kernels are cached on disk by inductor (FX graph cache), keyed by the captured graph and the
+# input shapes/dtypes, so a warm worker reuses them instead of recompiling. The scene shapes seen so far are
+# recorded in a manifest in the same directory, so that a new worker can compile them all at startup (warmup).
+# Workers sharing a cache directory share both.
+#
+# The FX graph cache, the dynamo recompilation limit and the inductor cache directory are only changed while
+# CompiledVGGT runs (config patches, and TORCHINDUCTOR_CACHE_DIR patched in os.environ), the process-wide
+# settings are restored afterwards. Code compiled elsewhere in the process at the same time (e.g., in
+# another thread) also writes its artifacts to the cache directory of CompiledVGGT.
+
+
+import contextlib
+import json
+import logging
+import os
+from typing import Iterable, Optional, Tuple
+from unittest import mock
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "TORCHINDUCTOR_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "vggt", "compile")
+)
+
+
+@contextlib.contextmanager
+def compile_config(max_shapes: int = 64, cache_dir: Optional[str] = None):
+    """
+    Context manager enabling the inductor FX graph cache and allowing max_shapes compiled shapes per frame
+    (torch._dynamo.config.cache_size_limit), restoring the previous settings on exit.
+    If cache_dir is given, the inductor artifacts (FX graph cache, generated kernels) are read from and
+    written to it instead of the process-wide inductor cache directory.
+    """
+    import torch._dynamo.config
+    import torch._inductor.config
+    import torch._inductor.utils
+
+    env = {"TORCHINDUCTOR_CACHE_DIR": cache_dir} if cache_dir is not None else {}
+    cache_size_limit = max(torch._dynamo.config.cache_size_limit, max_shapes)
+    with torch._inductor.config.patch(fx_graph_cache=True), torch._dynamo.config.patch(
+        cache_size_limit=cache_size_limit
+    ), mock.patch.dict(os.environ, env):
+        # Inductor resolves its cache directory once per process (lru_cache), resolve it again in and out
+        torch._inductor.utils.cache_dir.cache_clear()
+        try:
+            yield
+        finally:
+            torch._inductor.utils.cache_dir.cache_clear()
+
+
+class CompiledVGGT:
+    """
+    Run VGGT through torch.compile, with the compiled artifacts cached on disk.
+
+    Each input shape (batch size, S, H, W, number of query points) and dtype is compiled once per process
+    (and loaded from the disk cache by the next processes). The shapes are static: the number of frames drives
+    Python control flow (e.g., the frame chunks of the DPT heads), so a dynamic S would be specialized anyway.
+
+    Args:
+        model (VGGT): The model, already on `device` and in eval mode.
+        device (str): Device the model runs on.
+        dtype (torch.dtype): Autocast dtype. float32 disables autocast.
+        cache_dir (str): Directory of the inductor artifacts and of the shape manifest, used while the model
+            runs. By default, TORCHINDUCTOR_CACHE_DIR if set, otherwise ~/.cache/vggt/compile.
+        max_shapes (int): Maximum number of compiled shapes kept before falling back to eager
+            (raises torch._dynamo.config.cache_size_limit while the model runs, if needed).
+        backend (str): torch.compile backend.
+        mode (str, optional): torch.compile mode, e.g. "max-autotune".
+
+    Example:
+        compiled = CompiledVGGT(model, device="cpu", dtype=torch.float32)
+        compiled.warmup()  # compile the shapes recorded by previous runs
+        predictions = compiled(images)
+    """
+
+    def __init__(
+        self,
+        model,
+        device: str = "cuda",
+        dtype: torch.dtype = torch.float32,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        max_shapes: int = 64,
+        backend: str = "inductor",
+        mode: Optional[str] = None,
+    ):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.max_shapes = max_shapes
+        self.model = model
+        self.device = device
+        self.dtype = dtype
+        self.compiled = torch.compile(model, backend=backend, mode=mode, dynamic=False)
+
+        self.manifest_path = os.path.join(cache_dir, "vggt_shapes.json")
+        self.shapes = set(self._load_manifest())
+
+    def shape_key(self, images: torch.Tensor, query_points: Optional[torch.Tensor] = None) -> Tuple:
+        """
+        Key of the compiled graph of an input: (B, S, H, W, number of query points, dtype),
+        with 0 query points if there are none (the track head is not run).
+        """
+        B, S, _, H, W = images.shape
+        num_query_points = query_points.shape[-2] if query_points is not None else 0
+        return (B, S, H, W, num_query_points, str(self.dtype).replace("torch.", ""))
+
+    @torch.no_grad()
+    def __call__(self, images: torch.Tensor, query_points: Optional[torch.Tensor] = None):
+        """
+        Same inputs and outputs as VGGT.forward (images with shape [S, 3, H, W] or [B, S, 3, H, W]).
+        """
+        if images.dim() == 4:
+            images = images.unsqueeze(0)
+        images = images.to(self.device)
+        if query_points is not None:
+            if query_points.dim() == 2:
+                query_points = query_points.unsqueeze(0)
+            query_points = query_points.to(self.device)
+
+        device_type = torch.device(self.device).type
+        # Compilation is lazy: it happens in the first call of each shape, under the patched config
+        with compile_config(self.max_shapes, self.cache_dir), torch.autocast(
+            device_type=device_type, dtype=self.dtype, enabled=self.dtype != torch.float32
+        ):
+            predictions = self.compiled(images, query_points)
+
+        key = self.shape_key(images, query_points)
+        if key not in self.shapes:
+            self.shapes.add(key)
+            self._save_manifest()
+        return predictions
+
+    def warmup(self, shapes: Optional[Iterable[Tuple[int, int, int, int, int]]] = None):
+        """
+        Compile (or load from the disk cache) the given input shapes (B, S, H, W, number of query points),
+        by default all the shapes recorded in the manifest for this dtype.
+        """
+        if shapes is None:
+            dtype_name = str(self.dtype).replace("torch.", "")
+            shapes = sorted(key[:-1] for key in self.shapes if key[-1] == dtype_name)
+
+        for B, S, H, W, N in shapes:
+            logger.info(f"Compiling VGGT for {B} x {S} frames of {H}x{W} with {N} query points")
+            query_points = torch.zeros(B, N, 2) if N > 0 else None
+            self(torch.zeros(B, S, 3, H, W), query_points)
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return []
+        with open(self.manifest_path) as f:
+            # Skip the entries of older manifests, keyed by (S, H, W, dtype)
+            return [tuple(key) for key in json.load(f) if len(key) == 6]
+
+    def _save_manifest(self):
+        # Merge with the shapes recorded by other workers sharing the cache
+        shapes = self.shapes | set(self._load_manifest())
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(sorted(shapes), f)
+        os.replace(tmp_path, self.manifest_path)
@@ -0,0 +1,126 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+
+# Concurrent execution of the prediction heads of VGGT.
+#
+# The heads only read the aggregated tokens, so they are independent. On CUDA, each head is launched on its
+# own stream. On CPU, each head runs in a worker thread. Optionally, each worker gets a share of the intra-op
+# threads (a single head, e.g., the small camera head, does not keep a many-core machine busy). The intra-op
+# thread count is process-wide, so this is only for callers that own the process: the count is changed for
+# the duration of the heads, under a lock so that concurrent forward passes do not interleave their changes.
+
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import torch
+
+# Relative cost of the heads, used to split the CPU threads between them
+HEAD_THREAD_WEIGHTS = {"camera": 1, "depth": 4, "point": 4, "track": 4}
+
+_executor = None
+_executor_lock = threading.Lock()
+# Held while the process-wide intra-op thread count is split between the heads
+_threads_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    # Persistent workers, so that their OpenMP thread teams are reused from one forward pass to the next
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=len(HEAD_THREAD_WEIGHTS), thread_name_prefix="vggt-head")
+    return _executor
+
+
+def allot_threads(names: Sequence[str], total: int, weights: Dict[str, int] = HEAD_THREAD_WEIGHTS) -> List[int]:
+    """
+    Splits total intra-op threads between the heads in proportion to their weights, with at least one each.
+    """
+    head_weights = [weights.get(name, 1) for name in names]
+    return [max(1, round(total * weight / sum(head_weights))) for weight in head_weights]
+
+
+def run_heads_concurrently(
+    heads: Sequence[Tuple[str, Callable[[], dict]]], device: torch.device, split_threads: bool = False
+) -> List[dict]:
+    """
+    Runs head functions concurrently and returns their results in order.
+
+    Args:
+        heads (list[(str, callable)]): Name of each head (a key of HEAD_THREAD_WEIGHTS) and a function
+            without arguments returning its predictions as a dict of tensors.
+        device (torch.device): Device of the inputs. CUDA heads run on separate streams, CPU heads in
+            worker threads.
+        split_threads (bool): On CPU, split the intra-op threads of the caller between the heads (see
+            allot_threads). This changes the process-wide thread count until the heads are done, which
+            affects any other torch work of the process at the same time. Otherwise, every head uses the
+            thread count of the caller.
+
+    Returns:
+        list[dict]: The predictions of each head.
+    """
+    if device.type == "cuda":
+        return _run_on_streams(heads, device)
+    return _run_on_threads(heads, split_threads)
+
+
+def _run_on_streams(heads, device):
+    main_stream = torch.cuda.current_stream(device)
+    streams = []
+    results = []
+    for _, fn in heads:
+        stream = torch.cuda.Stream(device)
+        stream.wait_stream(main_stream)  # the inputs are produced on the main stream
+        with torch.cuda.stream(stream):
+            results.append(fn())
+        streams.append(stream)
+
+    for stream in streams:
+        main_stream.wait_stream(stream)
+    for result in results:
+        for value in result.values():
+            for tensor in value if isinstance(value, list) else [value]:
+                if isinstance(tensor, torch.Tensor) and tensor.is_cuda:
+                    # Allocated on a side stream, used on the main stream
+                    tensor.record_stream(main_stream)
+    return results
+
+
+def _run_on_threads(heads, split_threads):
+    # Grad mode and autocast are thread-local: the workers inherit the state of the caller
+    grad_enabled = torch.is_grad_enabled()
+    cpu_autocast = (torch.is_autocast_cpu_enabled(), torch.get_autocast_cpu_dtype())
+    cuda_autocast = (torch.is_autocast_enabled(), torch.get_autocast_gpu_dtype())
+
+    def run(fn, num_threads):
+        # The workers keep the thread count of their last run
+        if torch.get_num_threads() != num_threads:
+            torch.set_num_threads(num_threads)
+        with torch.set_grad_enabled(grad_enabled), torch.autocast(
+            "cpu", dtype=cpu_autocast[1], enabled=cpu_autocast[0]
+        ):
+            if cuda_autocast[0]:
+                with torch.autocast("cuda", dtype=cuda_autocast[1]):
+                    return fn()
+            return fn()
+
+    def run_all(num_threads):
+        futures = [_get_executor().submit(run, fn, n) for (_, fn), n in zip(heads, num_threads)]
+        return [future.result() for future in futures]
+
+    total_threads = torch.get_num_threads()
+    if not split_threads:
+        return run_all([total_threads] * len(heads))
+
+    with _threads_lock:
+        try:
+            return run_all(allot_threads([name for name, _ in heads], total_threads))
+        finally:
+            # The intra-op thread count is also recorded process-wide, restore it for the caller
+            torch.set_num_threads(total_threads)
@@ -10,38 +10,81 @@ import numpy as np
 
 
 from vggt.dependency.distortion import apply_distortion, iterative_undistortion, single_undistortion
+from vggt.utils.pos_embed_cache import pos_embed_cache
 
 
-def unproject_depth_map_to_point_map(
-    depth_map: np.ndarray, extrinsics_cam: np.ndarray, intrinsics_cam: np.ndarray
-) -> np.ndarray:
+def unproject_depth_map_to_point_map(depth_map, extrinsics_cam, intrinsics_cam, out=None):
     """
-    Unproject a batch of depth maps to 3D world coordinates.
+    Unproject a batch of depth maps to 3D world coordinates, all the frames at once.
+
+    Works on numpy arrays, or on torch tensors on their current device (without transfer to the host).
+    With camera-from-world extrinsics [R|t] and intrinsics K, the world point of pixel (u, v) is
+    depth * (M @ [u, v, 1]) + c, with M = R^T K^-1 and c = -R^T t the camera center. M is split into
+    the contributions of the pixel columns [S, W, 3] and rows [S, H, 3], so no per-pixel grid is built,
+    and the (cached) pixel coordinates are shared by all the frames.
 
     Args:
-        depth_map (np.ndarray): Batch of depth maps of shape (S, H, W, 1) or (S, H, W)
-        extrinsics_cam (np.ndarray): Batch of camera extrinsic matrices of shape (S, 3, 4)
-        intrinsics_cam (np.ndarray): Batch of camera intrinsic matrices of shape (S, 3, 3)
+        depth_map (np.ndarray or torch.Tensor): Batch of depth maps of shape (S, H, W, 1) or (S, H, W)
+        extrinsics_cam (np.ndarray or torch.Tensor): Batch of camera extrinsic matrices of shape (S, 3, 4)
+        intrinsics_cam (np.ndarray or torch.Tensor): Batch of camera intrinsic matrices of shape (S, 3, 3)
+        out (np.ndarray or torch.Tensor, optional): Output buffer of shape (S, H, W, 3), of the type of
+            depth_map, written in place (e.g., to reuse it from one call to the next).
 
     Returns:
-        np.ndarray: Batch of 3D world coordinates of shape (S, H, W, 3)
+        np.ndarray or torch.Tensor: Batch of 3D world coordinates of shape (S, H, W, 3), of the type (and
+        device) of depth_map, in float32 (or the dtype of out).
     """
-    if isinstance(depth_map, torch.Tensor):
-        depth_map = depth_map.cpu().numpy()
-    if isinstance(extrinsics_cam, torch.Tensor):
-        extrinsics_cam = extrinsics_cam.cpu().numpy()
-    if isinstance(intrinsics_cam, torch.Tensor):
-        intrinsics_cam = intrinsics_cam.cpu().numpy()
-
-    world_points_list = []
-    for frame_idx in range(depth_map.shape[0]):
-        cur_world_points, _, _ = depth_to_world_coords_points(
-            depth_map[frame_idx].squeeze(-1), extrinsics_cam[frame_idx], intrinsics_cam[frame_idx]
-        )
-        world_points_list.append(cur_world_points)
-    world_points_array = np.stack(world_points_list, axis=0)
+    if depth_map.ndim == 4:
+        depth_map = depth_map[..., 0]
+    S, H, W = depth_map.shape
 
-    return world_points_array
+    if isinstance(depth_map, torch.Tensor):
+        device = depth_map.device
+        extrinsics_cam = torch.as_tensor(extrinsics_cam, device=device).double()
+        intrinsics_cam = torch.as_tensor(intrinsics_cam, device=device).double()
+        dtype = out.dtype if out is not None else torch.float32
+
+        R_transposed = extrinsics_cam[:, :3, :3].transpose(1, 2)
+        M = (R_transposed @ torch.linalg.inv(intrinsics_cam)).to(dtype)  # (S, 3, 3)
+        centers = -(R_transposed @ extrinsics_cam[:, :3, 3:])[..., 0].to(dtype)  # (S, 3)
+        u = _pixel_coords(W, dtype, device)
+        v = _pixel_coords(H, dtype, device)
+
+        columns = M[:, None, :, 0] * u[None, :, None]  # (S, W, 3)
+        rows = M[:, None, :, 1] * v[None, :, None] + M[:, None, :, 2]  # (S, H, 3)
+        if out is None:
+            out = torch.empty((S, H, W, 3), dtype=dtype, device=device)
+        torch.add(rows[:, :, None], columns[:, None], out=out)
+        out.mul_(depth_map[..., None].to(dtype))
+        out.add_(centers[:, None, None])
+        return out
+
+    depth_map = np.asarray(depth_map)
+    extrinsics_cam = np.asarray(extrinsics_cam, dtype=np.float64)
+    intrinsics_cam = np.asarray(intrinsics_cam, dtype=np.float64)
+    dtype = out.dtype if out is not None else np.float32
+
+    R_transposed = np.transpose(extrinsics_cam[:, :3, :3], (0, 2, 1))
+    M = (R_transposed @ np.linalg.inv(intrinsics_cam)).astype(dtype)
+    centers = -(R_transposed @ extrinsics_cam[:, :3, 3:])[..., 0].astype(dtype)
+    u = _pixel_coords(W, torch.float64, "cpu").numpy().astype(dtype, copy=False)
+    v = _pixel_coords(H, torch.float64, "cpu").numpy().astype(dtype, copy=False)
+
+    columns = M[:, None, :, 0] * u[None, :, None]
+    rows = M[:, None, :, 1] * v[None, :, None] + M[:, None, :, 2]
+    if out is None:
+        out = np.empty((S, H, W, 3), dtype=dtype)
+    np.add(rows[:, :, None], columns[:, None], out=out)
+    np.multiply(out, depth_map[..., None], out=out, casting="unsafe")
+    np.add(out, centers[:, None, None], out=out)
+    return out
+
+
+def _pixel_coords(size: int, dtype: torch.dtype, device) -> torch.Tensor:
+    """Pixel coordinates 0, ..., size - 1, shared through the positional tensor cache."""
+    return pos_embed_cache.get(
+        "pixel_coords", (size,), 1, dtype, device, lambda: torch.arange(size, dtype=dtype, device=device)
+    )
 
 
 def depth_to_world_coords_points(
@@ -169,6 +212,46 @@ def closed_form_inverse_se3(se3, R=None, T=None):
     return inverted_matrix
 
 
+def umeyama_sim3(src: torch.Tensor, dst: torch.Tensor, weights: torch.Tensor = None, eps: float = 1e-8):
+    """
+    Batched, weighted Umeyama alignment: find the similarity transforms minimizing
+    sum_n w_n || s * R @ src_n + t - dst_n ||^2 for each batch element.
+
+    Args:
+        src (torch.Tensor): Source points of shape (M, N, 3).
+        dst (torch.Tensor): Target points of shape (M, N, 3).
+        weights (torch.Tensor, optional): Non-negative per-point weights of shape (M, N).
+
+    Returns:
+        tuple[torch.Tensor, torch.Tensor, torch.Tensor]: Scales (M,), rotations (M, 3, 3) and translations (M, 3).
+    """
+    src = src.double()
+    dst = dst.double()
+    if weights is None:
+        weights = torch.ones(src.shape[:2], dtype=src.dtype, device=src.device)
+    weights = weights.double()
+    weights = weights / weights.sum(dim=-1, keepdim=True).clamp(min=eps)
+
+    mu_src = (weights[..., None] * src).sum(dim=1)
+    mu_dst = (weights[..., None] * dst).sum(dim=1)
+    src_centered = src - mu_src[:, None]
+    dst_centered = dst - mu_dst[:, None]
+
+    # Weighted cross-covariance (M, 3, 3) and source variance (M,)
+    cov = (weights[..., None] * dst_centered).transpose(1, 2) @ src_centered
+    var_src = (weights * (src_centered**2).sum(dim=-1)).sum(dim=-1)
+
+    U, D, Vh = torch.linalg.svd(cov)
+    # Handle reflections so that R is a proper rotation
+    S = torch.eye(3, dtype=src.dtype, device=src.device).repeat(len(src), 1, 1)
+    S[:, 2, 2] = torch.sign(torch.linalg.det(U) * torch.linalg.det(Vh))
+
+    R = U @ S @ Vh
+    scale = (D * S.diagonal(dim1=-2, dim2=-1)).sum(dim=-1) / var_src.clamp(min=eps)
+    t = mu_dst - scale[:, None] * (R @ mu_src[..., None]).squeeze(-1)
+    return scale.float(), R.float(), t.float()
+
+
 # TODO: this code can be further cleaned up
 
 
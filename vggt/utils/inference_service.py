@@ -0,0 +1,333 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+
+# A long-lived inference service around VGGT for many small, independent scenes.
+#
+# Requests are queued with asyncio, and pending scenes with the same (H, W) are grouped, run in a worker
+# thread, and returned to each request as soon as their batch finishes. Scenes with the same number of
+# frames are stacked along the batch dimension, otherwise they are run as a ragged batch
+# (VGGT.forward_scenes). A minimal HTTP front end (TCP on localhost or a Unix socket) is provided.
+#
+# The event loop never runs blocking work: batches run on a single device worker thread (one batch at a time),
+# and the decoding of request bodies and encoding of responses run on a separate pool of CPU worker threads,
+# so they overlap with the device work and with each other.
+
+
+import asyncio
+import io
+import json
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import torch
+
+from vggt.utils.load_fn import load_and_preprocess_images
+
+logger = logging.getLogger(__name__)
+
+
+class _Request:
+    def __init__(self, images: torch.Tensor, future: asyncio.Future):
+        self.images = images
+        self.future = future
+        self.key = tuple(images.shape[1:])  # (3, H, W), scenes with the same key can be batched
+        self.arrival = time.perf_counter()
+
+
+class InferenceService:
+    """
+    Asynchronous inference service with dynamic batching.
+
+    Args:
+        model (VGGT): The model, already on `device` and in eval mode.
+        device (str): Device the model runs on.
+        dtype (torch.dtype): Autocast dtype. float32 disables autocast.
+        max_batch_size (int): Maximum number of scenes run together.
+        max_wait_ms (float): How long the first pending scene waits for compatible scenes before running.
+        num_cpu_workers (int): Number of threads decoding requests and encoding responses (see run_cpu).
+
+    Example:
+        service = InferenceService(model, device="cuda", dtype=torch.bfloat16)
+        await service.start()
+        predictions = await service.predict(images)  # images: [S, 3, H, W]
+        await service.stop()
+    """
+
+    def __init__(
+        self,
+        model,
+        device: str = "cuda",
+        dtype: torch.dtype = torch.bfloat16,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+        num_cpu_workers: int = 4,
+    ):
+        self.model = model
+        self.device = device
+        self.dtype = dtype
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._backlog: deque = deque()  # requests dequeued but not compatible with the last batch
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        # A single worker thread, so that batches run one after another on the device
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        # CPU work of the requests (decoding, encoding), kept off the event loop and off the device worker
+        self._cpu_executor = ThreadPoolExecutor(max_workers=num_cpu_workers)
+
+        self.num_batches = 0
+        self.num_scenes = 0
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._batch_loop())
+
+    async def stop(self):
+        """Serve the scenes submitted so far and stop. Later predict calls are refused."""
+        self._stopping = True
+        try:
+            if self._task is not None:
+                await self._queue.put(None)
+                await self._task
+        finally:
+            self._task = None
+            self._fail_pending(RuntimeError("The service is stopped"))
+        self._executor.shutdown(wait=True)
+        self._cpu_executor.shutdown(wait=True)
+
+    async def run_cpu(self, fn, *args):
+        """Run a blocking CPU function (e.g., decoding a request) on the CPU worker pool and await its result."""
+        return await asyncio.get_running_loop().run_in_executor(self._cpu_executor, fn, *args)
+
+    async def predict(self, images: torch.Tensor) -> Dict[str, torch.Tensor]:
+        """
+        Submit one scene and wait for its predictions.
+
+        Args:
+            images (torch.Tensor): Images with shape [S, 3, H, W], in range [0, 1].
+
+        Returns:
+            dict: The predictions of VGGT.forward for this scene (batch dimension of 1), on the CPU.
+        """
+        if self._task is None or self._stopping:
+            raise RuntimeError("The service is not running")
+        if images.dim() != 4:
+            raise ValueError(f"Expected images with shape [S, 3, H, W], got {tuple(images.shape)}")
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_Request(images, future))
+        return await future
+
+    def _fail_pending(self, error: Exception):
+        # Requests left behind by the batch loop (e.g., if it failed), so that no caller waits forever
+        pending = list(self._backlog)
+        self._backlog.clear()
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for request in pending:
+            if request is not None and not request.future.done():
+                request.future.set_exception(error)
+
+    async def _next_request(self):
+        if self._backlog:
+            return self._backlog.popleft()
+        return await self._queue.get()
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping or self._backlog:
+            request = await self._next_request()
+            if request is None:
+                stopping = True
+                continue
+
+            batch = [request]
+            skipped = []
+
+            # Take compatible requests from the backlog first, they have been waiting longer
+            for pending in list(self._backlog):
+                if len(batch) < self.max_batch_size and pending.key == request.key:
+                    batch.append(pending)
+                    self._backlog.remove(pending)
+
+            # Then take the queued requests, and wait for new ones until the batch is full
+            # or the first request waited long enough
+            deadline = request.arrival + self.max_wait
+            while not stopping and len(batch) < self.max_batch_size:
+                if self._queue.empty():
+                    timeout = deadline - time.perf_counter()
+                    if timeout <= 0:
+                        break
+                    try:
+                        incoming = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    incoming = self._queue.get_nowait()
+                if incoming is None:
+                    stopping = True
+                elif incoming.key == request.key:
+                    batch.append(incoming)
+                else:
+                    skipped.append(incoming)
+            self._backlog.extend(skipped)
+
+            try:
+                predictions = await loop.run_in_executor(self._executor, self._run_batch, [r.images for r in batch])
+            except Exception as e:
+                logger.exception("Inference failed")
+                for r in batch:
+                    if not r.future.done():
+                        r.future.set_exception(e)
+                continue
+
+            self.num_batches += 1
+            self.num_scenes += len(batch)
+            for r, scene_predictions in zip(batch, predictions):
+                if not r.future.done():
+                    r.future.set_result(scene_predictions)
+
+    @torch.no_grad()
+    def _run_batch(self, scenes: List[torch.Tensor]) -> List[Dict[str, torch.Tensor]]:
+        scenes = [images.to(self.device) for images in scenes]
+        same_length = all(images.shape[0] == scenes[0].shape[0] for images in scenes)
+        device_type = torch.device(self.device).type
+        with torch.autocast(device_type=device_type, dtype=self.dtype, enabled=self.dtype != torch.float32):
+            if same_length:
+                batch_predictions = self.model(torch.stack(scenes))
+                predictions = [split_batch(batch_predictions, i) for i in range(len(scenes))]
+            else:
+                # Ragged batch, the scenes are packed instead of padded to the longest one
+                predictions = self.model(scenes)
+
+        outputs = []
+        for scene_predictions in predictions:
+            scene_predictions.pop("images", None)  # the client already has them
+            outputs.append(
+                {
+                    key: [v.cpu() for v in value] if isinstance(value, list) else value.cpu()
+                    for key, value in scene_predictions.items()
+                }
+            )
+        return outputs
+
+
+def split_batch(predictions: Dict, index: int) -> Dict:
+    """
+    Select one scene of batched predictions, keeping a batch dimension of 1.
+    """
+    return {
+        key: [v[index : index + 1] for v in value] if isinstance(value, list) else value[index : index + 1]
+        for key, value in predictions.items()
+    }
+
+
+################################################################################
+# HTTP front end
+################################################################################
+
+
+def _decode_images(body: bytes, content_type: str) -> torch.Tensor:
+    """
+    Decode a request body: either JSON {"image_paths": [...]} (files readable by the service),
+    or a .npy array of images with shape [S, 3, H, W], float in [0, 1] or uint8.
+    """
+    if content_type.startswith("application/json"):
+        image_paths = json.loads(body)["image_paths"]
+        return load_and_preprocess_images(image_paths)
+
+    images = np.load(io.BytesIO(body), allow_pickle=False)
+    if images.dtype == np.uint8:
+        return torch.from_numpy(images).float() / 255.0
+    return torch.from_numpy(images).float()
+
+
+def _encode_predictions(predictions: Dict) -> bytes:
+    arrays = {}
+    for key, value in predictions.items():
+        if isinstance(value, list):
+            continue  # e.g. pose_enc_list, only the last iteration is sent
+        arrays[key] = value.float().numpy()
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+
+async def _write_response(writer: asyncio.StreamWriter, status: str, body: bytes, content_type: str):
+    header = (
+        f"HTTP/1.1 {status}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    )
+    writer.write(header.encode("latin-1") + body)
+    await writer.drain()
+    writer.close()
+
+
+def make_http_handler(service: InferenceService):
+    """
+    Build the connection handler of the HTTP front end.
+
+    POST /predict with a JSON or .npy body (see _decode_images) returns the predictions as an .npz file.
+    """
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            if len(request_line) < 2 or request_line[0] != "POST" or request_line[1] != "/predict":
+                await _write_response(writer, "404 Not Found", b"Use POST /predict\n", "text/plain")
+                return
+
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+            images = await service.run_cpu(_decode_images, body, headers.get("content-type", ""))
+            predictions = await service.predict(images)
+            response = await service.run_cpu(_encode_predictions, predictions)
+            await _write_response(writer, "200 OK", response, "application/octet-stream")
+        except Exception as e:
+            logger.exception("Request failed")
+            await _write_response(writer, "500 Internal Server Error", f"{e}\n".encode(), "text/plain")
+
+    return handle
+
+
+async def serve(
+    service: InferenceService, host: str = "127.0.0.1", port: int = 8000, unix_socket: Optional[str] = None
+):
+    """
+    Start the service and serve it over HTTP on host:port, or on a Unix socket if given, until cancelled.
+    """
+    await service.start()
+    handler = make_http_handler(service)
+    if unix_socket is not None:
+        server = await asyncio.start_unix_server(handler, path=unix_socket)
+        logger.info(f"Serving on {unix_socket}")
+    else:
+        server = await asyncio.start_server(handler, host=host, port=port)
+        logger.info(f"Serving on http://{host}:{port}")
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
@@ -0,0 +1,360 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+
+# Partition-and-merge reconstruction for image collections that do not fit in one forward pass.
+#
+# The collection is split into overlapping submaps, VGGT is run on each submap, and the submaps
+# are registered into the coordinate frame of the first one by Sim(3) alignments estimated on the
+# depth-based point maps of the frames they share.
+
+
+import copy
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from vggt.utils.geometry import umeyama_sim3, unproject_depth_map_to_point_map
+from vggt.utils.load_fn import load_and_preprocess_images
+from vggt.utils.pose_enc import pose_encoding_to_extri_intri
+
+
+def submap_size_from_memory_budget(
+    memory_budget: int,
+    image_hw: Sequence[int] = (518, 518),
+    model: Optional[torch.nn.Module] = None,
+    patch_size: int = 14,
+    embed_dim: int = 1024,
+    bytes_per_element: int = 2,
+    activation_factor: int = 24,
+) -> int:
+    """
+    Estimate how many frames one forward pass can hold within a memory budget.
+
+    The estimate is deliberately coarse: the per-frame cost is the token count times the embedding
+    dimension times activation_factor, which accounts for the attention/MLP activations and the
+    retained intermediate outputs (about 24 token-sized tensors per frame at inference).
+
+    Args:
+        memory_budget (int): Available memory in bytes, for the model and the activations.
+        image_hw (Sequence[int]): Height and width of the preprocessed images.
+        model (torch.nn.Module, optional): If given, its parameter memory is taken out of the budget.
+        patch_size (int): Patch size of the aggregator.
+        embed_dim (int): Embedding dimension of the aggregator.
+        bytes_per_element (int): Bytes per activation element, e.g. 2 for bf16/fp16 autocast.
+        activation_factor (int): Number of token-sized activations kept per frame.
+
+    Returns:
+        int: Number of frames per submap, at least 2.
+    """
+    if model is not None:
+        memory_budget -= sum(p.numel() * p.element_size() for p in model.parameters())
+
+    num_tokens = (image_hw[0] // patch_size) * (image_hw[1] // patch_size) + 5
+    bytes_per_frame = num_tokens * embed_dim * bytes_per_element * activation_factor
+    return max(int(memory_budget // bytes_per_frame), 2)
+
+
+def partition_frames(num_frames: int, submap_size: int, overlap: int = 4) -> List[List[int]]:
+    """
+    Split frames into consecutive, overlapping submaps.
+
+    Each submap starts with the last `overlap` frames of the previous one, so that consecutive
+    submaps can be aligned, and the first frame of each submap is a shared frame.
+
+    Args:
+        num_frames (int): Number of frames.
+        submap_size (int): Maximum number of frames per submap.
+        overlap (int): Number of frames shared by consecutive submaps.
+
+    Returns:
+        list[list[int]]: Frame indices of each submap.
+    """
+    if overlap < 1 or overlap >= submap_size:
+        raise ValueError(f"overlap ({overlap}) must be in [1, submap_size) with submap_size={submap_size}")
+
+    submaps = []
+    start = 0
+    while True:
+        end = min(start + submap_size, num_frames)
+        submaps.append(list(range(start, end)))
+        if end == num_frames:
+            break
+        start = end - overlap
+    return submaps
+
+
+@torch.no_grad()
+def compute_frame_features(model, image_paths: List[str], batch_size: int = 32, device="cuda") -> torch.Tensor:
+    """
+    Compute a global descriptor per image with the DINO patch embed of the aggregator (class token).
+
+    Returns:
+        torch.Tensor: L2-normalized descriptors of shape (N, D), on the CPU.
+    """
+    aggregator = model.aggregator
+    features = []
+    for start in range(0, len(image_paths), batch_size):
+        images = load_and_preprocess_images(image_paths[start : start + batch_size]).to(device)
+        images = (images - aggregator._resnet_mean[0]) / aggregator._resnet_std[0]
+        output = aggregator.patch_embed(images)
+        if isinstance(output, dict):
+            feature = output["x_norm_clstoken"]
+        else:
+            feature = output.mean(dim=1)
+        features.append(F.normalize(feature.float(), dim=-1).cpu())
+    return torch.cat(features, dim=0)
+
+
+def order_frames_by_similarity(features: torch.Tensor) -> List[int]:
+    """
+    Order an unordered collection so that similar frames are adjacent, by greedily walking
+    to the most similar unvisited frame, starting from the first one.
+
+    Args:
+        features (torch.Tensor): L2-normalized descriptors of shape (N, D).
+
+    Returns:
+        list[int]: A permutation of range(N).
+    """
+    similarity = features @ features.T
+    visited = torch.zeros(len(features), dtype=torch.bool)
+    order = [0]
+    visited[0] = True
+    for _ in range(len(features) - 1):
+        scores = similarity[order[-1]].masked_fill(visited, float("-inf"))
+        next_idx = int(scores.argmax())
+        order.append(next_idx)
+        visited[next_idx] = True
+    return order
+
+
+@torch.no_grad()
+def run_submap(model, image_paths: List[str], dtype=torch.bfloat16, device="cuda") -> Dict[str, np.ndarray]:
+    """
+    Run VGGT on one submap, through its forward pass (precision policy, camera tolerance, ...).
+    Only the camera and depth predictions are kept: disable the point and track heads to skip them.
+
+    Returns:
+        dict: extrinsic (S, 3, 4), intrinsic (S, 3, 3), depth (S, H, W, 1) and depth_conf (S, H, W).
+    """
+    images = load_and_preprocess_images(image_paths).to(device)
+
+    with torch.autocast(device_type=torch.device(device).type, dtype=dtype, enabled=dtype != torch.float32):
+        predictions = model(images)
+
+    extrinsic, intrinsic = pose_encoding_to_extri_intri(predictions["pose_enc"], images.shape[-2:])
+
+    return {
+        "extrinsic": extrinsic.squeeze(0).cpu().numpy(),
+        "intrinsic": intrinsic.squeeze(0).cpu().numpy(),
+        "depth": predictions["depth"].squeeze(0).float().cpu().numpy(),
+        "depth_conf": predictions["depth_conf"].squeeze(0).float().cpu().numpy(),
+    }
+
+
+def align_submaps(
+    submaps: List[List[int]],
+    predictions: List[Dict[str, np.ndarray]],
+    num_points: int = 20000,
+    conf_percentile: float = 50.0,
+    seed: int = 0,
+):
+    """
+    Estimate the Sim(3) transform mapping each submap into the coordinate frame of the first one.
+
+    The relative transforms between consecutive submaps are solved in one batched weighted Umeyama
+    problem on the depth-based point maps of their shared frames, then chained. Each point is weighted by
+    the geometric mean of its depth confidences in the two submaps.
+
+    Args:
+        submaps (list[list[int]]): Frame indices of each submap.
+        predictions (list[dict]): Output of run_submap for each submap.
+        num_points (int): Number of confident points sampled per pair of submaps.
+        conf_percentile (float): Points below this depth confidence percentile (in either submap) are ignored.
+            If no point passes in both submaps, all the points are used.
+        seed (int): Seed of the point sampling.
+
+    Returns:
+        tuple[torch.Tensor, torch.Tensor, torch.Tensor]: Scales (M,), rotations (M, 3, 3) and
+            translations (M, 3), mapping submap coordinates to the coordinates of the first submap.
+    """
+    rng = np.random.default_rng(seed)
+    src_points, dst_points, weights = [], [], []
+
+    for prev, curr, prev_pred, curr_pred in zip(submaps[:-1], submaps[1:], predictions[:-1], predictions[1:]):
+        shared = sorted(set(prev) & set(curr))
+        prev_idx = [prev.index(f) for f in shared]
+        curr_idx = [curr.index(f) for f in shared]
+
+        prev_world = unproject_depth_map_to_point_map(
+            prev_pred["depth"][prev_idx], prev_pred["extrinsic"][prev_idx], prev_pred["intrinsic"][prev_idx]
+        )
+        curr_world = unproject_depth_map_to_point_map(
+            curr_pred["depth"][curr_idx], curr_pred["extrinsic"][curr_idx], curr_pred["intrinsic"][curr_idx]
+        )
+        prev_conf = prev_pred["depth_conf"][prev_idx]
+        curr_conf = curr_pred["depth_conf"][curr_idx]
+
+        mask = (prev_conf >= np.percentile(prev_conf, conf_percentile)) & (
+            curr_conf >= np.percentile(curr_conf, conf_percentile)
+        )
+        valid = np.flatnonzero(mask)
+        if len(valid) == 0:
+            # The confident regions of the two submaps do not overlap, the confidence weights still apply
+            valid = np.arange(mask.size)
+        # Sample with replacement, so that every pair has the same number of points and can be batched
+        sampled = rng.choice(valid, size=num_points, replace=len(valid) < num_points)
+
+        src_points.append(curr_world.reshape(-1, 3)[sampled])
+        dst_points.append(prev_world.reshape(-1, 3)[sampled])
+        weights.append(np.sqrt(prev_conf.reshape(-1)[sampled] * curr_conf.reshape(-1)[sampled]))
+
+    scales = [torch.ones(())]
+    rotations = [torch.eye(3)]
+    translations = [torch.zeros(3)]
+
+    if src_points:
+        rel_s, rel_R, rel_t = umeyama_sim3(
+            torch.from_numpy(np.stack(src_points)),
+            torch.from_numpy(np.stack(dst_points)),
+            weights=torch.from_numpy(np.stack(weights)),
+        )
+
+        # Chain the relative transforms: x_0 = s_prev * R_prev @ (s_rel * R_rel @ x + t_rel) + t_prev
+        for s, R, t in zip(rel_s, rel_R, rel_t):
+            scales.append(scales[-1] * s)
+            rotations.append(rotations[-1] @ R)
+            translations.append(scales[-2] * rotations[-2] @ t + translations[-1])
+
+    return torch.stack(scales), torch.stack(rotations), torch.stack(translations)
+
+
+def transform_extrinsics_sim3(extrinsic: np.ndarray, scale: float, R: np.ndarray, t: np.ndarray) -> np.ndarray:
+    """
+    Express camera-from-world extrinsics (S, 3, 4) in a new world frame, x_new = scale * R @ x_old + t.
+
+    The camera frame is scaled by the same factor, so depths must also be multiplied by scale.
+    """
+    R_cam = extrinsic[:, :3, :3]
+    t_cam = extrinsic[:, :3, 3]
+    new_R_cam = R_cam @ R.T
+    new_t_cam = scale * t_cam - new_R_cam @ t
+    return np.concatenate([new_R_cam, new_t_cam[..., None]], axis=-1)
+
+
+def reconstruct_large_scene(
+    model,
+    image_paths: List[str],
+    submap_size: Optional[int] = None,
+    memory_budget: Optional[int] = None,
+    overlap: int = 4,
+    order_by_similarity: bool = False,
+    dtype=torch.bfloat16,
+    devices: Optional[List[str]] = None,
+    num_align_points: int = 20000,
+    conf_percentile: float = 50.0,
+    return_world_points: bool = False,
+) -> Dict:
+    """
+    Reconstruct an image collection larger than one forward pass by partitioning and merging submaps.
+
+    Args:
+        model (VGGT): The model, in eval mode, with the camera and depth heads enabled.
+        image_paths (list[str]): Paths of the images. All images should have the same aspect ratio.
+        submap_size (int, optional): Number of frames per submap. Derived from memory_budget if None.
+        memory_budget (int, optional): Memory per device in bytes, used when submap_size is None.
+        overlap (int): Number of frames shared by consecutive submaps.
+        order_by_similarity (bool): Reorder the images by DINO descriptor similarity before partitioning,
+            for unordered collections. Otherwise the given order is assumed to be a sequence.
+        dtype (torch.dtype): Autocast dtype of the aggregator.
+        devices (list[str], optional): Devices to run the submaps on. With several devices, the model is
+            replicated and submaps are processed concurrently, one worker thread per device.
+        num_align_points (int): Number of points sampled per pair of submaps for the alignment.
+        conf_percentile (float): Depth confidence percentile below which points are not used for the alignment.
+        return_world_points (bool): Also return the world points unprojected from the merged depth maps,
+            which requires N x H x W x 3 floats of memory.
+
+    Returns:
+        dict: With one entry per image, in the order of image_paths:
+            - extrinsic (np.ndarray): (N, 3, 4) camera from world, in the frame of the first submap.
+            - intrinsic (np.ndarray): (N, 3, 3).
+            - depth (np.ndarray): (N, H, W, 1), scaled to the merged frame.
+            - depth_conf (np.ndarray): (N, H, W).
+            - world_points (np.ndarray): (N, H, W, 3), only if return_world_points.
+            Plus `submaps` (frame indices of each submap) and `sim3` (scales, rotations, translations).
+    """
+    if devices is None:
+        devices = ["cuda" if torch.cuda.is_available() else "cpu"]
+
+    if submap_size is None:
+        if memory_budget is None:
+            raise ValueError("Either submap_size or memory_budget must be given")
+        submap_size = submap_size_from_memory_budget(memory_budget, model=model)
+    submap_size = max(submap_size, overlap + 1)
+
+    order = list(range(len(image_paths)))
+    if order_by_similarity:
+        order = order_frames_by_similarity(compute_frame_features(model, image_paths, device=devices[0]))
+    ordered_paths = [image_paths[i] for i in order]
+
+    submaps = partition_frames(len(ordered_paths), submap_size, overlap)
+
+    # One model replica per device, submaps are assigned round-robin
+    models = [model] + [copy.deepcopy(model).to(device) for device in devices[1:]]
+
+    def run(submap_idx):
+        worker = submap_idx % len(devices)
+        paths = [ordered_paths[i] for i in submaps[submap_idx]]
+        return run_submap(models[worker], paths, dtype=dtype, device=devices[worker])
+
+    if len(devices) > 1:
+        with ThreadPoolExecutor(max_workers=len(devices)) as executor:
+            predictions = list(executor.map(run, range(len(submaps))))
+    else:
+        predictions = [run(i) for i in range(len(submaps))]
+
+    scales, rotations, translations = align_submaps(
+        submaps, predictions, num_points=num_align_points, conf_percentile=conf_percentile
+    )
+
+    num_frames = len(ordered_paths)
+    H, W = predictions[0]["depth"].shape[1:3]
+    extrinsic = np.zeros((num_frames, 3, 4), dtype=np.float32)
+    intrinsic = np.zeros((num_frames, 3, 3), dtype=np.float32)
+    depth = np.zeros((num_frames, H, W, 1), dtype=np.float32)
+    depth_conf = np.zeros((num_frames, H, W), dtype=np.float32)
+    assigned = np.zeros(num_frames, dtype=bool)
+
+    for submap, pred, scale, R, t in zip(submaps, predictions, scales.numpy(), rotations.numpy(), translations.numpy()):
+        # Shared frames keep the estimate of the first submap they appear in
+        local_idx = [i for i, f in enumerate(submap) if not assigned[f]]
+        frame_idx = [submap[i] for i in local_idx]
+
+        extrinsic[frame_idx] = transform_extrinsics_sim3(pred["extrinsic"][local_idx], scale, R, t)
+        intrinsic[frame_idx] = pred["intrinsic"][local_idx]
+        depth[frame_idx] = pred["depth"][local_idx] * scale
+        depth_conf[frame_idx] = pred["depth_conf"][local_idx]
+        assigned[frame_idx] = True
+
+    # Back to the order of image_paths
+    inverse = np.argsort(order)
+    result = {
+        "extrinsic": extrinsic[inverse],
+        "intrinsic": intrinsic[inverse],
+        "depth": depth[inverse],
+        "depth_conf": depth_conf[inverse],
+        "submaps": [[order[i] for i in submap] for submap in submaps],
+        "sim3": (scales, rotations, translations),
+    }
+
+    if return_world_points:
+        result["world_points"] = unproject_depth_map_to_point_map(result["depth"], result["extrinsic"], result["intrinsic"])
+
+    return result
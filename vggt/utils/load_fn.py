@@ -94,7 +94,7 @@ def load_and_preprocess_images_square(image_path_list, target_size=1024):
     return images, original_coords
 
 
-def load_and_preprocess_images(image_path_list, mode="crop"):
+def load_and_preprocess_images(image_path_list, mode="crop", keep_shapes=False):
     """
     A quick start function to load and preprocess images for model input.
     This assumes the images should have the same shape for easier batching, but our model can also work well with different shapes.
@@ -105,9 +105,12 @@ def load_and_preprocess_images(image_path_list, mode="crop"):
                              - "crop" (default): Sets width to 518px and center crops height if needed.
                              - "pad": Preserves all pixels by making the largest dimension 518px
                                and padding the smaller dimension to reach a square shape.
+        keep_shapes (bool, optional): If True, images with different shapes are not padded to a common shape,
+                             and a list of tensors with shape (3, H_i, W_i) is returned (see VGGT.forward_mixed).
 
     Returns:
-        torch.Tensor: Batched tensor of preprocessed images with shape (N, 3, H, W)
+        torch.Tensor: Batched tensor of preprocessed images with shape (N, 3, H, W),
+            or a list of N tensors with shape (3, H_i, W_i) if keep_shapes is True
 
     Raises:
         ValueError: If the input list is empty or if mode is invalid
@@ -193,6 +196,9 @@ def load_and_preprocess_images(image_path_list, mode="crop"):
         shapes.add((img.shape[1], img.shape[2]))
         images.append(img)
 
+    if keep_shapes:
+        return images
+
     # Check if we have different shapes
     # In theory our model can also work well with different shapes
     if len(shapes) > 1:
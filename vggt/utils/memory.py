@@ -0,0 +1,45 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+
+# Peak memory measurement for the benchmark scripts: max_memory_allocated on CUDA, the peak resident set size
+# on CPU (Linux), which also counts memory kept by the allocator.
+
+import resource
+
+import torch
+
+
+def _cpu_memory(field):
+    # Linux: VmRSS (current) or VmHWM (peak) resident set size in bytes
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # peak since start, in kB on Linux
+
+
+def peak_memory(fn, device):
+    """Peak memory of fn() above the memory in use before the call, in bytes."""
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+        baseline = torch.cuda.memory_allocated(device)
+        torch.cuda.reset_peak_memory_stats(device)
+        fn()
+        torch.cuda.synchronize()
+        return torch.cuda.max_memory_allocated(device) - baseline
+
+    baseline = _cpu_memory("VmRSS")
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")  # reset the peak resident set size to the current one
+    except OSError:
+        pass
+    fn()
+    return max(_cpu_memory("VmHWM") - baseline, 0)
@@ -0,0 +1,141 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+
+# Compact prediction outputs of VGGT.
+#
+# The dense outputs (depth, world points and their confidences) dominate the size of the predictions, and the
+# input images are echoed back for visualization. An OutputSpec selects what is returned, on the device of the
+# model and before any transfer to the host: float16 dense maps, no image echo, and/or a sparse (COO) list
+# of the confident world points.
+
+
+from typing import Dict, Optional, Sequence
+
+import torch
+
+OUTPUT_DTYPES = {"fp32": torch.float32, "fp16": torch.float16}
+DENSE_KEYS = ("depth", "depth_conf", "world_points", "world_points_conf")
+
+
+class OutputSpec:
+    """
+    Selection of the predictions returned by VGGT.forward.
+
+    Args:
+        dtype (str): "fp32" or "fp16", dtype of the dense outputs. The camera poses and tracks stay in float32.
+            Values beyond the float16 range (e.g., very large confidences) are clamped to it.
+        echo_images (bool): Whether to return the input images in predictions["images"].
+        sparse_conf_threshold (float, optional): If set, the world points with a confidence above the
+            threshold are also returned in COO form:
+                - sparse_indices (torch.Tensor): (batch, frame, v, u) of each point with shape [N, 4], in the
+                  frames and pixels of the input images (frame_indices and regions of interest are accounted for)
+                - sparse_points (torch.Tensor): World coordinates with shape [N, 3]
+                - sparse_conf (torch.Tensor): Confidence with shape [N]
+        keep_dense (bool): Whether to return the dense world points and their confidence along with the sparse
+            points. Depth is always returned.
+
+    Example:
+        spec = OutputSpec(dtype="fp16", echo_images=False, sparse_conf_threshold=5.0, keep_dense=False)
+        predictions = model(images, output_spec=spec)
+    """
+
+    def __init__(
+        self,
+        dtype: str = "fp32",
+        echo_images: bool = True,
+        sparse_conf_threshold: Optional[float] = None,
+        keep_dense: bool = True,
+    ):
+        if dtype not in OUTPUT_DTYPES:
+            raise ValueError(f"Unknown output dtype {dtype}, expected one of {list(OUTPUT_DTYPES)}")
+        if not keep_dense and sparse_conf_threshold is None:
+            raise ValueError("keep_dense=False requires sparse_conf_threshold")
+        self.dtype = dtype
+        self.echo_images = echo_images
+        self.sparse_conf_threshold = sparse_conf_threshold
+        self.keep_dense = keep_dense
+
+    def apply(
+        self,
+        predictions: Dict,
+        frame_indices: Optional[Sequence[int]] = None,
+        roi: Optional[Sequence] = None,
+    ) -> Dict:
+        """
+        Converts the predictions of VGGT.forward according to the spec, in place.
+
+        Args:
+            predictions (dict): Predictions with dense outputs of shape [B, S, H, W, ...], or lists of per-frame
+                outputs of shape [B, H, W, ...] (one region of interest per frame).
+            frame_indices (Sequence[int], optional): Frames of the dense outputs, as given to VGGT.forward.
+            roi (optional): Region(s) of interest of the dense outputs, as given to VGGT.forward.
+
+        Returns:
+            dict: The predictions.
+        """
+        if not self.echo_images:
+            predictions.pop("images", None)
+
+        if self.sparse_conf_threshold is not None:
+            if "world_points" not in predictions:
+                raise ValueError("Sparse points require the point head")
+            predictions.update(self._sparse_points(predictions, frame_indices, roi))
+            if not self.keep_dense:
+                del predictions["world_points"], predictions["world_points_conf"]
+
+        dtype = OUTPUT_DTYPES[self.dtype]
+        for key in DENSE_KEYS + ("sparse_points", "sparse_conf"):
+            if key in predictions:
+                value = predictions[key]
+                if isinstance(value, list):
+                    predictions[key] = [_cast(v, dtype) for v in value]
+                else:
+                    predictions[key] = _cast(value, dtype)
+        return predictions
+
+    def _sparse_points(self, predictions, frame_indices, roi):
+        points, conf = predictions["world_points"], predictions["world_points_conf"]
+        if not isinstance(points, list):
+            # A shared region of interest (or none) for all the frames
+            points, conf = list(points.unbind(1)), list(conf.unbind(1))
+            roi = [roi] * len(points)
+        elif roi is None:
+            roi = [None] * len(points)
+        if frame_indices is None:
+            frame_indices = range(len(points))
+
+        indices, sparse_points, sparse_conf = [], [], []
+        for frame_points, frame_conf, frame_idx, frame_roi in zip(points, conf, frame_indices, roi):
+            mask = frame_conf > self.sparse_conf_threshold
+            index = mask.nonzero()  # [N, 3]: batch, v, u
+            if frame_roi is not None:
+                index = index + index.new_tensor([0, int(frame_roi[0]), int(frame_roi[1])])
+            frame_column = torch.full_like(index[:, :1], int(frame_idx))
+            indices.append(torch.cat([index[:, :1], frame_column, index[:, 1:]], dim=1))
+            sparse_points.append(frame_points[mask])
+            sparse_conf.append(frame_conf[mask])
+
+        return {
+            "sparse_indices": torch.cat(indices).int(),
+            "sparse_points": torch.cat(sparse_points),
+            "sparse_conf": torch.cat(sparse_conf),
+        }
+
+    def __repr__(self):
+        return (
+            f"OutputSpec(dtype={self.dtype}, echo_images={self.echo_images}, "
+            f"sparse_conf_threshold={self.sparse_conf_threshold}, keep_dense={self.keep_dense})"
+        )
+
+
+def _cast(tensor: torch.Tensor, dtype: torch.dtype) -> torch.Tensor:
+    if tensor.dtype == dtype:
+        return tensor
+    if dtype == torch.float16:
+        limit = torch.finfo(dtype).max
+        tensor = tensor.clamp(-limit, limit)
+    return tensor.to(dtype)
@@ -0,0 +1,203 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+
+# Compact checkpoint format for fast worker startup.
+#
+# A packed checkpoint is a safetensors file whose weights are stored either in float16/bfloat16, or in int8
+# (weight-only, per output channel) for the linear layers run by the int8 CPU inference mode (see
+# vggt/utils/quantization.py). The file is memory-mapped and the tensors are views of the mapping, bound
+# to the module parameters with load_state_dict(assign=True): nothing is read or copied until it is used.
+# The int8 linear weights are the exception: the quantized CPU kernels need their own packed copy of each
+# weight, built when the checkpoint is loaded.
+
+
+import json
+import os
+import struct
+from typing import Dict, Optional, Sequence, Tuple
+
+import torch
+import torch.nn as nn
+from safetensors.torch import save_file
+
+from vggt.utils.quantization import QUANTIZED_MODULES
+
+PACKED_FORMAT = "vggt-packed"
+PACKED_DTYPES = ("float16", "bfloat16", "int8")
+SCALE_SUFFIX = "_scale"
+
+_SAFETENSORS_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+
+
+def _is_quantized_weight(name: str, tensor: torch.Tensor, quantized_modules: Sequence[str]) -> bool:
+    # Inside the transformer blocks, the only 2D weights are those of nn.Linear layers
+    return (
+        tensor.dim() == 2
+        and name.endswith(".weight")
+        and any(name.startswith(prefix + ".") for prefix in quantized_modules)
+    )
+
+
+def save_packed_checkpoint(
+    state_dict: Dict[str, torch.Tensor],
+    path: str,
+    dtype: str = "bfloat16",
+    quantized_modules: Sequence[str] = QUANTIZED_MODULES,
+):
+    """
+    Convert a VGGT state dict (e.g., the released model.pt) to a packed checkpoint.
+
+    Args:
+        state_dict (dict): Float state dict of VGGT.
+        path (str): Output .safetensors file.
+        dtype (str): "float16" or "bfloat16" to store all the floating point tensors in that dtype.
+            "int8" to store the linear weights of quantized_modules in int8 with one float32 scale
+            per output channel (symmetric), and the other tensors in float32.
+        quantized_modules (Sequence[str]): With dtype="int8", prefixes of the submodules whose linear
+            weights are quantized. Must match the modules quantized at inference time.
+    """
+    if dtype not in PACKED_DTYPES:
+        raise ValueError(f"Unsupported packed dtype {dtype}, expected one of {PACKED_DTYPES}")
+
+    tensors = {}
+    for name, tensor in state_dict.items():
+        tensor = tensor.detach().cpu()
+        if dtype == "int8" and _is_quantized_weight(name, tensor, quantized_modules):
+            tensor = tensor.float()
+            scale = (tensor.abs().amax(dim=1) / 127.0).clamp(min=1e-12)
+            tensors[name] = (tensor / scale[:, None]).round().clamp(-127, 127).to(torch.int8)
+            tensors[name + SCALE_SUFFIX] = scale
+        elif tensor.is_floating_point():
+            tensors[name] = tensor.to(torch.float32 if dtype == "int8" else getattr(torch, dtype))
+        else:
+            tensors[name] = tensor
+        tensors[name] = tensors[name].contiguous()
+
+    metadata = {"format": PACKED_FORMAT, "dtype": dtype, "quantized_modules": ",".join(quantized_modules)}
+    save_file(tensors, path, metadata=metadata)
+
+
+def load_packed_state_dict(path: str) -> Tuple[Dict[str, torch.Tensor], Dict[str, str]]:
+    """
+    Memory-map a packed checkpoint. The returned tensors are views of the file mapping (copy-on-write),
+    so loading is immediate and the pages are only read from disk when the tensors are used.
+
+    Returns:
+        (dict, dict): The state dict as stored (including the int8 scales), and the file metadata.
+    """
+    with open(path, "rb") as f:
+        header_size = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_size))
+
+    metadata = header.pop("__metadata__", {})
+    if metadata.get("format") != PACKED_FORMAT:
+        raise ValueError(f"{path} is not a packed VGGT checkpoint, convert it with convert_checkpoint.py")
+
+    storage = torch.UntypedStorage.from_file(path, False, os.path.getsize(path))
+    data_start = 8 + header_size
+
+    state_dict = {}
+    for name, info in header.items():
+        dtype = _SAFETENSORS_DTYPES[info["dtype"]]
+        start, end = info["data_offsets"]
+        itemsize = torch.empty(0, dtype=dtype).element_size()
+        if (data_start + start) % itemsize != 0:
+            raise ValueError(f"Tensor {name} is not aligned in {path}")
+        tensor = torch.empty(0, dtype=dtype).set_(storage, (data_start + start) // itemsize, info["shape"])
+        state_dict[name] = tensor
+    return state_dict, metadata
+
+
+def load_packed_checkpoint(model: nn.Module, path: str) -> nn.Module:
+    """
+    Bind the weights of a packed checkpoint to a VGGT model, without intermediate copies.
+
+    With a float16/bfloat16 checkpoint, the parameters become views of the file mapping in that dtype,
+    and the rest of the model (buffers) is cast to it: run the model with inputs of the same dtype,
+    or move it to the GPU. With an int8 checkpoint, the quantized linear layers are replaced by dynamically
+    quantized int8 layers (as with quantize_model_int8), and the model runs on CPU. Their weights are not
+    views of the file: each one is read and repacked into the layout of the int8 kernels (set_weight_bias)
+    when loading, so an int8 checkpoint loads slower and the int8 weights are held in private memory
+    rather than in the shared file mapping. The other tensors stay memory-mapped.
+
+    Weights of heads that are disabled in the model are ignored.
+
+    Args:
+        model (VGGT): The model to load the weights into.
+        path (str): Packed checkpoint created by save_packed_checkpoint.
+
+    Returns:
+        VGGT: The model, in eval mode.
+    """
+    state_dict, metadata = load_packed_state_dict(path)
+    dtype = metadata["dtype"]
+
+    # int8 linear layers, bound after the float tensors: {module name: (weight, scale, bias)}
+    quantized_linears = {}
+    for name in [k for k in state_dict if k.endswith(".weight" + SCALE_SUFFIX)]:
+        module_name = name[: -len(".weight" + SCALE_SUFFIX)]
+        quantized_linears[module_name] = (
+            state_dict.pop(module_name + ".weight"),
+            state_dict.pop(name),
+            state_dict.pop(module_name + ".bias", None),
+        )
+
+    missing_keys, _ = model.load_state_dict(state_dict, strict=False, assign=True)
+
+    named_modules = dict(model.named_modules())
+    for module_name, (weight, scale, bias) in quantized_linears.items():
+        if module_name in named_modules:  # skip the layers of disabled heads
+            _replace_with_quantized_linear(model, module_name, weight, scale, bias)
+
+    missing_keys = [k for k in missing_keys if k.rpartition(".")[0] not in quantized_linears]
+    if missing_keys:
+        raise ValueError(f"Missing weights in {path}: {missing_keys}")
+
+    if dtype == "int8":
+        _check_quantized_modules(model, metadata["quantized_modules"].split(","))
+
+    if dtype != "int8":
+        # Buffers (e.g., image normalization constants) are not part of the checkpoint
+        model.to(getattr(torch, dtype))
+    return model.eval()
+
+
+def _replace_with_quantized_linear(
+    model: nn.Module, module_name: str, weight: torch.Tensor, scale: torch.Tensor, bias: Optional[torch.Tensor]
+):
+    parent_name, _, child_name = module_name.rpartition(".")
+    parent = model.get_submodule(parent_name)
+    linear = getattr(parent, child_name)
+
+    quantized_linear = torch.ao.nn.quantized.dynamic.Linear(
+        linear.in_features, linear.out_features, bias_=linear.bias is not None, dtype=torch.qint8
+    )
+    # set_weight_bias reads the whole weight and packs a copy of it for the int8 kernels
+    qweight = torch._make_per_channel_quantized_tensor(
+        weight, scale.double(), torch.zeros_like(scale, dtype=torch.long), 0
+    )
+    quantized_linear.set_weight_bias(qweight, None if bias is None else bias.float())
+    setattr(parent, child_name, quantized_linear)
+
+
+def _check_quantized_modules(model: nn.Module, quantized_modules: Sequence[str]):
+    # All the linear layers of the quantized modules must have been replaced
+    for prefix in quantized_modules:
+        for name, module in model.named_modules():
+            if name.startswith(prefix + ".") and type(module) is nn.Linear:
+                raise ValueError(f"No int8 weights found for {name}")
@@ -0,0 +1,188 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+
+# Persistent cache of the patch embedding (DINO) tokens of individual frames.
+#
+# The patch embedding processes each frame independently, so when the same images are reconstructed again
+# (with other frames, or with frames added), their tokens can be reused. Entries are addressed by the hash
+# of the preprocessed image and of the patch embedding weights, stored in float16 as .npy files and
+# memory-mapped when read. The cache is capped in size, the least recently used entries are evicted.
+#
+# Addressing by content has a cost: every input frame is copied to the host and hashed, a few milliseconds
+# per 518x518 frame, once per input tensor (the keys of the last inputs are kept, see frame_keys).
+
+
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from vggt.utils.pos_embed_cache import tensor_key
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "vggt", "patch_tokens")
+
+# Number of weight hashes kept by PatchTokenCache.model_key, e.g., for several models sharing a cache
+MAX_MODEL_KEYS = 8
+# Number of input tensors whose frame keys are kept by PatchTokenCache.frame_keys
+MAX_INPUT_KEYS = 8
+
+
+class PatchTokenCache:
+    """
+    On-disk, content-addressed cache of patch embedding tokens.
+
+    Once attached to the aggregator, the patch embedding only runs on the frames that are not cached
+    (in eval mode). Since the cached tokens are rounded to float16, the tokens of newly embedded frames
+    are rounded as well, so the predictions do not depend on the state of the cache.
+
+    Args:
+        cache_dir (str): Directory of the cached tokens. Can be shared by several processes.
+        max_bytes (int): Size cap of the cache, the least recently used entries are evicted beyond it.
+
+    Example:
+        model.aggregator.patch_token_cache = PatchTokenCache("/tmp/vggt_tokens", max_bytes=20 * 2**30)
+        predictions = model(images)
+        print(model.aggregator.patch_token_cache.stats())
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = 8 * 2**30):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+        # Entries from the least to the most recently used: {key: size in bytes}
+        entries = []
+        for name in os.listdir(cache_dir):
+            if name.endswith(".npy"):
+                stat = os.stat(os.path.join(cache_dir, name))
+                entries.append((stat.st_mtime, name[: -len(".npy")], stat.st_size))
+        self.entries = OrderedDict((key, size) for _, key, size in sorted(entries))
+        self.total_bytes = sum(self.entries.values())
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._model_keys = OrderedDict()  # {weights identity: hash}, least recently used first
+        self._input_keys = OrderedDict()  # {(input identity, weights hash): frame keys}, same order
+        self._evict()  # the cap may be lower than in the previous runs
+
+    def model_key(self, module: nn.Module) -> str:
+        """
+        Hash of the weights of the patch embedding, computed once per set of weights. The hashes of the
+        MAX_MODEL_KEYS most recently used sets of weights are kept, so alternating between models (or
+        weights) does not rehash them.
+        """
+        state_dict = module.state_dict(keep_vars=True)
+        identity = tuple(tensor_key(t) for t in state_dict.values())
+        if identity not in self._model_keys:
+            digest = hashlib.blake2b(digest_size=16)
+            for name, tensor in state_dict.items():
+                digest.update(name.encode())
+                digest.update(tensor.detach().cpu().contiguous().view(torch.uint8).numpy().tobytes())
+            self._model_keys[identity] = digest.hexdigest()
+            while len(self._model_keys) > MAX_MODEL_KEYS:
+                self._model_keys.popitem(last=False)
+        self._model_keys.move_to_end(identity)
+        return self._model_keys[identity]
+
+    def frame_keys(self, images: torch.Tensor, module: nn.Module) -> List[str]:
+        """
+        Cache keys of the frames of preprocessed images [..., 3, H, W] embedded by module, in order.
+
+        Hashing copies the images to the host and reads all of them. The keys of the MAX_INPUT_KEYS most
+        recently used input tensors are kept, so running the model again on the same tensor (not updated
+        in place) does not rehash it.
+        """
+        model_key = self.model_key(module)
+        identity = (tensor_key(images), model_key)
+        if identity not in self._input_keys:
+            frames = images.detach().reshape(-1, *images.shape[-3:]).cpu().contiguous()
+            keys = []
+            for image in frames:
+                digest = hashlib.blake2b(digest_size=20)
+                digest.update(model_key.encode())
+                digest.update(f"{tuple(image.shape)}{image.dtype}".encode())
+                digest.update(image.view(torch.uint8).numpy().tobytes())
+                keys.append(digest.hexdigest())
+            self._input_keys[identity] = keys
+            while len(self._input_keys) > MAX_INPUT_KEYS:
+                self._input_keys.popitem(last=False)
+        self._input_keys.move_to_end(identity)
+        return list(self._input_keys[identity])
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".npy")
+
+    def get(self, key: str) -> Optional[torch.Tensor]:
+        """Memory-mapped float16 tokens of a frame, or None if not cached."""
+        path = self._path(key)
+        try:
+            # Copy-on-write mapping, so that the tensor is writable as torch expects
+            tokens = torch.from_numpy(np.load(path, mmap_mode="c"))
+        except (FileNotFoundError, ValueError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        if key not in self.entries:  # written by another process
+            self.entries[key] = os.path.getsize(path)
+            self.total_bytes += self.entries[key]
+        self.entries.move_to_end(key)
+        os.utime(path)  # the modification time orders the entries for the next processes
+        return tokens
+
+    def put(self, key: str, tokens: torch.Tensor) -> torch.Tensor:
+        """Stores the tokens of a frame in float16 and returns them as stored."""
+        tokens = tokens.detach().to(device="cpu", dtype=torch.float16).contiguous()
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, tokens.numpy())
+        os.replace(tmp_path, path)
+
+        if key in self.entries:
+            self.total_bytes -= self.entries.pop(key)
+        self.entries[key] = os.path.getsize(path)
+        self.total_bytes += self.entries[key]
+        self._evict()
+        return tokens
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            key, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+    def clear(self):
+        """Removes all the cached tokens from disk."""
+        for key in list(self.entries):
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+        self.entries.clear()
+        self.total_bytes = 0
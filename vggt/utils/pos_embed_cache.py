@@ -0,0 +1,115 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+
+# Shared cache of positional tensors (RoPE grids, DPT uv embeddings, interpolated DINO pos embeds,
+# tracker sin-cos embeddings). They only depend on the token grid shape, the embedding dimension, the
+# dtype and the device, so they are built once and reused by every forward pass, layer and frame chunk.
+#
+# The cached tensors are shared between callers: they must be treated as read-only. Tensors derived from
+# weights (e.g., the interpolated DINO pos embed) are also keyed on the weights with tensor_key.
+
+
+import itertools
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable
+
+import torch
+from torch.utils.weak import WeakIdKeyDictionary
+
+
+class PositionalEmbeddingCache:
+    """
+    Bounded LRU cache of positional tensors, with hit/miss counters for profiling.
+
+    Args:
+        max_entries (int): Maximum number of cached tensors, the least recently used ones are evicted.
+
+    Example:
+        pos_embed_cache.reset_stats()
+        predictions = model(images)
+        print(pos_embed_cache.stats())
+    """
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Hashable, torch.Tensor]" = OrderedDict()
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def get(self, kind: str, shape, dim: int, dtype: torch.dtype, device, build: Callable[[], torch.Tensor], extra=()):
+        """
+        Returns the cached tensor for (kind, shape, dim, dtype, device, *extra), built by build() on a miss.
+        extra holds the other parameters the tensor depends on (e.g., a scaling ratio).
+        """
+        key = (kind, tuple(shape), dim, dtype, torch.device(device), *extra)
+        with self.lock:
+            if key in self.entries:
+                self.hits[kind] = self.hits.get(kind, 0) + 1
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            self.misses[kind] = self.misses.get(kind, 0) + 1
+
+        value = build()
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return value
+
+    def stats(self) -> Dict:
+        """Hit/miss counters in total and per kind of tensor, and number of cached tensors."""
+        with self.lock:
+            return {
+                "hits": sum(self.hits.values()),
+                "misses": sum(self.misses.values()),
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "per_kind": {
+                    kind: {"hits": self.hits.get(kind, 0), "misses": self.misses.get(kind, 0)}
+                    for kind in sorted(set(self.hits) | set(self.misses))
+                },
+            }
+
+    def reset_stats(self):
+        with self.lock:
+            self.hits.clear()
+            self.misses.clear()
+
+    def clear(self):
+        """Drops all the cached tensors (e.g., to free device memory) and resets the counters."""
+        with self.lock:
+            self.entries.clear()
+            self.hits.clear()
+            self.misses.clear()
+
+
+# Identifiers of the tensors passed to tensor_key, held weakly and never reused
+_tensor_ids = WeakIdKeyDictionary()
+_tensor_id_counter = itertools.count()
+_tensor_id_lock = threading.Lock()
+
+
+def tensor_key(tensor: torch.Tensor) -> tuple:
+    """
+    Key of the current values of a tensor (e.g., a Parameter), for entries derived from it.
+
+    The key changes when the tensor is updated in place (e.g., load_state_dict) or its storage is replaced
+    (e.g., module.to). Unlike the data pointer alone, it never matches another tensor, even one allocated
+    at the address of a freed tensor.
+    """
+    with _tensor_id_lock:
+        if tensor not in _tensor_ids:
+            _tensor_ids[tensor] = next(_tensor_id_counter)
+        tensor_id = _tensor_ids[tensor]
+    return (tensor_id, tensor.data_ptr(), tensor._version)
+
+
+# Process-wide cache used by the aggregator, the DINO backbone, the DPT heads and the tracker
+pos_embed_cache = PositionalEmbeddingCache()
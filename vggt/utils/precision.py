@@ -0,0 +1,150 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+
+# Precision of the prediction heads of VGGT.
+#
+# By default the camera, depth and point heads run in float32 whatever the autocast state of the caller
+# (the aggregator typically runs in bfloat16), and the track head follows the caller. A PrecisionPolicy
+# can run some heads in bfloat16/float16 instead, while the numerically sensitive output activations
+# (activate_head, activate_pose) stay in float32. validate_precision_policy measures the drift of a policy
+# against float32 heads, so that the fastest policy within tolerance can be picked (see demo_precision.py).
+
+
+import contextlib
+import time
+from typing import Dict, List, Optional, Sequence
+
+import torch
+
+from vggt.utils.quantization import compare_predictions
+
+PRECISIONS = {"fp32": torch.float32, "bf16": torch.bfloat16, "fp16": torch.float16}
+HEADS = ("camera", "depth", "point", "track")
+FP32_OPS = ("activate_head", "activate_pose")
+
+
+class PrecisionPolicy:
+    """
+    Precision of each prediction head.
+
+    Args:
+        camera, depth, point, track (str or None): "fp32", "bf16" or "fp16" to run the head under autocast
+            with that dtype (fp32 disables autocast), or None to keep the autocast state of the caller.
+        fp32_ops (Sequence[str]): Sub-operations kept in float32 when their head runs in lower precision:
+            "activate_head" (DPT output activations, e.g. exp of the depth and confidence) and
+            "activate_pose" (accumulation and activation of the camera pose encodings).
+
+    Example:
+        model.precision_policy = PrecisionPolicy(depth="bf16", point="bf16")
+        with torch.cuda.amp.autocast(dtype=torch.bfloat16):
+            predictions = model(images)
+    """
+
+    def __init__(
+        self,
+        camera: Optional[str] = "fp32",
+        depth: Optional[str] = "fp32",
+        point: Optional[str] = "fp32",
+        track: Optional[str] = None,
+        fp32_ops: Sequence[str] = FP32_OPS,
+    ):
+        self.precisions = {"camera": camera, "depth": depth, "point": point, "track": track}
+        for head, precision in self.precisions.items():
+            if precision is not None and precision not in PRECISIONS:
+                raise ValueError(f"Unknown precision {precision} for the {head} head, expected one of {list(PRECISIONS)}")
+        for op in fp32_ops:
+            if op not in FP32_OPS:
+                raise ValueError(f"Unknown op {op}, expected one of {FP32_OPS}")
+        self.fp32_ops = tuple(fp32_ops)
+
+    @classmethod
+    def uniform(cls, precision: str, **kwargs) -> "PrecisionPolicy":
+        """Same precision for the camera, depth and point heads."""
+        return cls(camera=precision, depth=precision, point=precision, **kwargs)
+
+    def autocast(self, head: str, device_type: str):
+        """Autocast context of a head."""
+        precision = self.precisions[head]
+        if precision is None:
+            return contextlib.nullcontext()
+        if precision == "fp32":
+            return torch.autocast(device_type=device_type, enabled=False)
+        return torch.autocast(device_type=device_type, dtype=PRECISIONS[precision])
+
+    def apply(self, model):
+        """Configures the float32 sub-operations of the heads of a VGGT model."""
+        for head in (model.depth_head, model.point_head):
+            if head is not None:
+                head.fp32_activation = "activate_head" in self.fp32_ops
+        if model.camera_head is not None:
+            model.camera_head.fp32_activation = "activate_pose" in self.fp32_ops
+
+    def __repr__(self):
+        heads = ", ".join(f"{head}={precision}" for head, precision in self.precisions.items())
+        return f"PrecisionPolicy({heads}, fp32_ops={self.fp32_ops})"
+
+
+def validate_precision_policy(
+    model,
+    policy: PrecisionPolicy,
+    scenes: List[torch.Tensor],
+    autocast_dtype: torch.dtype = torch.bfloat16,
+    tolerances: Optional[Dict[str, float]] = None,
+    repeats: int = 1,
+) -> Dict:
+    """
+    Measure the drift of a precision policy against float32 heads, and its latency.
+
+    The aggregator runs under autocast with autocast_dtype in both cases, so only the precision of the
+    heads differs. The original policy of the model is restored afterwards.
+
+    Args:
+        model (VGGT): The model, in eval mode.
+        policy (PrecisionPolicy): The policy to evaluate.
+        scenes (list[torch.Tensor]): Images of each scene with shape [S, 3, H, W], on the model device.
+        autocast_dtype (torch.dtype): Autocast dtype of the forward passes.
+        tolerances (dict, optional): Maximum values of the metrics of compare_predictions
+            (e.g., {"depth_abs_rel": 0.01}). The policy passes if every scene is within all of them.
+        repeats (int): Timed forward passes per scene.
+
+    Returns:
+        dict: The worst value of each metric over the scenes, the mean forward time of the policy and of the
+        float32 heads in seconds, and "passed" if tolerances were given.
+    """
+    device_type = next(model.parameters()).device.type
+    original_policy = model.precision_policy
+
+    def run(images, run_policy):
+        model.precision_policy = run_policy
+        with torch.no_grad(), torch.autocast(device_type=device_type, dtype=autocast_dtype):
+            model(images)  # warm-up
+            if device_type == "cuda":
+                torch.cuda.synchronize()
+            start = time.perf_counter()
+            for _ in range(repeats):
+                predictions = model(images)
+            if device_type == "cuda":
+                torch.cuda.synchronize()
+        return predictions, (time.perf_counter() - start) / repeats
+
+    worst = {}
+    times, reference_times = [], []
+    try:
+        for images in scenes:
+            reference, reference_time = run(images, PrecisionPolicy.uniform("fp32"))
+            predictions, policy_time = run(images, policy)
+            reference_times.append(reference_time)
+            times.append(policy_time)
+            for metric, value in compare_predictions(reference, predictions).items():
+                worst[metric] = max(worst.get(metric, 0.0), value)
+    finally:
+        model.precision_policy = original_policy
+
+    report = dict(worst, time=sum(times) / len(times), fp32_time=sum(reference_times) / len(reference_times))
+    if tolerances is not None:
+        report["passed"] = all(worst.get(metric, 0.0) <= tolerance for metric, tolerance in tolerances.items())
+    return report
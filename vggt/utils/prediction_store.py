@@ -0,0 +1,309 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+
+# Chunked on-disk storage of VGGT predictions.
+#
+# A store is a directory with one .npy file per key and chunk of frames (e.g., depth.00003.npy) and a small
+# manifest.json describing the keys. Writers fill it incrementally, one or several frames at a time (e.g., the
+# chunks of VGGT.forward_stream), and readers memory-map the chunks and only read the frames they index,
+# instead of loading a monolithic .npz. Dense maps can be stored in float16, and chunks can be compressed
+# (.npz, decompressed chunk by chunk when read).
+
+
+import json
+import os
+from collections.abc import Mapping
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+import torch
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+# Keys stored in float16 with half=True. Camera matrices and pose encodings keep their precision
+HALF_KEYS = ("depth", "depth_conf", "world_points", "world_points_conf", "world_points_from_depth", "images")
+
+
+def _to_numpy(array) -> np.ndarray:
+    if isinstance(array, torch.Tensor):
+        array = array.detach().cpu()
+        if array.dtype == torch.bfloat16:
+            array = array.float()
+        return array.numpy()
+    return np.asarray(array)
+
+
+class PredictionWriter:
+    """
+    Incremental writer of a prediction store.
+
+    Frame arrays [S, ...] are appended along the first dimension and written in chunks of frames_per_chunk
+    frames. Other arrays are written whole with put. The manifest is updated after each written chunk, so a
+    partially written store can already be read.
+
+    Args:
+        path (str): Directory of the store, created if needed.
+        frames_per_chunk (int): Number of frames per chunk file.
+        half (bool): Store the floating point arrays of HALF_KEYS in float16 (clamped to its range).
+        compress (bool): Store compressed .npz chunks, which are smaller but not memory-mappable.
+
+    Example:
+        with PredictionWriter("out/scene", half=True) as writer:
+            for chunk in model.forward_stream(images):
+                for key in ("depth", "depth_conf", "world_points", "world_points_conf"):
+                    writer.append(key, chunk[key][0])
+    """
+
+    def __init__(self, path: str, frames_per_chunk: int = 16, half: bool = False, compress: bool = False):
+        if frames_per_chunk <= 0:
+            raise ValueError(f"frames_per_chunk must be positive, got {frames_per_chunk}")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.frames_per_chunk = frames_per_chunk
+        self.half = half
+        self.compress = compress
+        self.keys = {}
+        self._pending = {}  # frames appended but not written yet: {key: [arrays]}
+        self._write_manifest()
+
+    def _convert(self, key: str, array) -> np.ndarray:
+        array = _to_numpy(array)
+        if self.half and key in HALF_KEYS and np.issubdtype(array.dtype, np.floating):
+            limit = np.finfo(np.float16).max
+            array = np.clip(array, -limit, limit).astype(np.float16)
+        return array
+
+    def _save(self, name: str, array: np.ndarray) -> str:
+        filename = name + (".npz" if self.compress else ".npy")
+        tmp_path = os.path.join(self.path, f"{filename}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            if self.compress:
+                np.savez_compressed(f, array=array)
+            else:
+                np.save(f, array)
+        os.replace(tmp_path, os.path.join(self.path, filename))
+        return filename
+
+    def put(self, key: str, array) -> None:
+        """Writes a whole array (not split into frames), e.g., pose encodings."""
+        array = self._convert(key, array)
+        filename = self._save(key, array)
+        self.keys[key] = {"framed": False, "shape": list(array.shape), "dtype": array.dtype.str, "file": filename}
+        self._write_manifest()
+
+    def append(self, key: str, frames) -> None:
+        """Appends frames [n, ...] to a frame array, writing the chunks that are complete."""
+        frames = self._convert(key, frames)
+        if key not in self.keys:
+            self.keys[key] = {
+                "framed": True,
+                "shape": [0] + list(frames.shape[1:]),
+                "dtype": frames.dtype.str,
+                "chunks": [],
+            }
+            self._pending[key] = []
+            self._write_manifest()
+        entry = self.keys[key]
+        if not entry["framed"]:
+            raise ValueError(f"{key} was written with put, it cannot be appended to")
+        if list(frames.shape[1:]) != entry["shape"][1:] or frames.dtype.str != entry["dtype"]:
+            raise ValueError(
+                f"Frames of {key} with shape {frames.shape[1:]} and dtype {frames.dtype}, "
+                f"expected {tuple(entry['shape'][1:])} and {np.dtype(entry['dtype'])}"
+            )
+        self._pending[key].append(frames)
+        self._flush(key, final=False)
+
+    def _flush(self, key: str, final: bool) -> None:
+        pending = self._pending[key]
+        num_pending = sum(len(frames) for frames in pending)
+        if num_pending == 0 or (num_pending < self.frames_per_chunk and not final):
+            return
+
+        frames = np.concatenate(pending) if len(pending) > 1 else pending[0]
+        entry = self.keys[key]
+        while len(frames) >= self.frames_per_chunk or (final and len(frames) > 0):
+            chunk, frames = frames[: self.frames_per_chunk], frames[self.frames_per_chunk :]
+            start = entry["shape"][0]
+            filename = self._save(f"{key}.{len(entry['chunks']):05d}", np.ascontiguousarray(chunk))
+            entry["chunks"].append([start, start + len(chunk), filename])
+            entry["shape"][0] += len(chunk)
+        self._pending[key] = [frames] if len(frames) else []
+        self._write_manifest()
+
+    def write(self, predictions: Dict) -> None:
+        """
+        Writes a predictions dict without batch dimension (as prepared by the demos): arrays with at least 3
+        dimensions are stored as frame arrays, other arrays whole. Values which are not arrays are skipped.
+        """
+        for key, value in predictions.items():
+            if not isinstance(value, (np.ndarray, torch.Tensor)):
+                continue
+            if value.ndim >= 3:
+                self.append(key, value)
+            else:
+                self.put(key, value)
+
+    def _write_manifest(self) -> None:
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "frames_per_chunk": self.frames_per_chunk,
+            "compressed": self.compress,
+            "keys": self.keys,
+        }
+        path = os.path.join(self.path, MANIFEST_NAME)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp_path, path)
+
+    def close(self) -> None:
+        """Writes the remaining frames of each frame array."""
+        for key in self._pending:
+            self._flush(key, final=True)
+        self._write_manifest()
+
+    def __enter__(self) -> "PredictionWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class FramedArray:
+    """
+    Read-only frame array of a prediction store, loaded lazily chunk by chunk.
+
+    Indexing reads only the chunks of the indexed frames (memory-mapped, unless compressed), and
+    np.asarray(array) loads all the frames.
+    """
+
+    def __init__(self, path: str, entry: Dict, mmap: bool = True):
+        self.path = path
+        self.shape = tuple(entry["shape"])
+        self.dtype = np.dtype(entry["dtype"])
+        self.chunks = entry["chunks"]
+        self.mmap = mmap
+        self._chunk_starts = np.array([start for start, _, _ in self.chunks], dtype=np.int64)
+        self._last_chunk = (None, None)  # the last decompressed chunk, reused by sequential frame reads
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def _load_chunk(self, chunk_idx: int) -> np.ndarray:
+        if self._last_chunk[0] == chunk_idx:
+            return self._last_chunk[1]
+        filename = os.path.join(self.path, self.chunks[chunk_idx][2])
+        if filename.endswith(".npz"):
+            with np.load(filename) as data:
+                array = data["array"]
+            self._last_chunk = (chunk_idx, array)
+            return array
+        return np.load(filename, mmap_mode="r" if self.mmap else None)
+
+    def __getitem__(self, index):
+        if not isinstance(index, tuple):
+            index = (index,)
+        if not index or index[0] is Ellipsis:
+            return np.asarray(self)[index]
+        frame_index, rest = index[0], index[1:]
+
+        if isinstance(frame_index, (int, np.integer)):
+            frame = int(frame_index)
+            if frame < 0:
+                frame += len(self)
+            if not 0 <= frame < len(self):
+                raise IndexError(f"Frame {frame_index} out of range for {len(self)} frames")
+            chunk_idx = int(np.searchsorted(self._chunk_starts, frame, side="right")) - 1
+            return self._load_chunk(chunk_idx)[(frame - self.chunks[chunk_idx][0],) + rest]
+
+        frames = np.arange(len(self))[frame_index]
+        out = np.empty((len(frames),) + self.shape[1:], dtype=self.dtype)
+        chunk_ids = np.searchsorted(self._chunk_starts, frames, side="right") - 1
+        for chunk_idx in np.unique(chunk_ids):
+            selected = chunk_ids == chunk_idx
+            out[selected] = self._load_chunk(int(chunk_idx))[frames[selected] - self.chunks[chunk_idx][0]]
+        return out[(slice(None),) + rest]
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        for frame in range(len(self)):
+            yield self[frame]
+
+    def __array__(self, dtype=None, copy=None):
+        array = self[:]
+        return array if dtype is None else array.astype(dtype)
+
+    def __repr__(self):
+        return f"FramedArray(shape={self.shape}, dtype={self.dtype}, chunks={len(self.chunks)})"
+
+
+class PredictionStore(Mapping):
+    """
+    Reader of a prediction store, a read-only mapping from keys to FramedArray (frame arrays) or
+    memory-mapped np.ndarray (whole arrays).
+
+    Args:
+        path (str): Directory of the store.
+        mmap (bool): Memory-map the uncompressed files instead of reading them.
+
+    Example:
+        store = PredictionStore("out/scene")
+        depth = store["depth"][10]  # reads the chunk of frame 10 only
+    """
+
+    def __init__(self, path: str, mmap: bool = True):
+        manifest_path = os.path.join(path, MANIFEST_NAME)
+        if not os.path.exists(manifest_path):
+            raise ValueError(f"No prediction store at {path}")
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("version") != MANIFEST_VERSION:
+            raise ValueError(f"Unsupported prediction store version {manifest.get('version')}")
+        self.path = path
+        self.mmap = mmap
+        self.manifest = manifest
+        self._arrays = {}
+
+    def __getitem__(self, key: str):
+        if key not in self._arrays:
+            entry = self.manifest["keys"][key]
+            if entry["framed"]:
+                self._arrays[key] = FramedArray(self.path, entry, mmap=self.mmap)
+            else:
+                filename = os.path.join(self.path, entry["file"])
+                if filename.endswith(".npz"):
+                    with np.load(filename) as data:
+                        self._arrays[key] = data["array"]
+                else:
+                    self._arrays[key] = np.load(filename, mmap_mode="r" if self.mmap else None)
+        return self._arrays[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.manifest["keys"])
+
+    def __len__(self) -> int:
+        return len(self.manifest["keys"])
+
+    def __repr__(self):
+        return f"PredictionStore({self.path}, keys={list(self)})"
+
+
+def save_predictions(path: str, predictions: Dict, **kwargs) -> None:
+    """Writes a predictions dict to a prediction store (see PredictionWriter.write for the layout)."""
+    with PredictionWriter(path, **kwargs) as writer:
+        writer.write(predictions)
+
+
+def load_predictions(path: str, keys: Optional[list] = None) -> Dict[str, np.ndarray]:
+    """Reads the arrays of a prediction store (all of them if keys is None) fully into memory."""
+    store = PredictionStore(path, mmap=False)
+    return {key: np.asarray(store[key]) for key in (keys if keys is not None else store)}
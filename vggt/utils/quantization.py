@@ -0,0 +1,126 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+
+# Dynamic int8 quantization of VGGT for CPU inference.
+#
+# The nn.Linear layers of the transformer blocks (attention qkv/proj and MLP) are converted to int8 weights
+# with per-output-channel scales, and their activations are quantized on the fly. Everything else stays in
+# float: LayerNorms, RoPE, the patch embedding convolutions, the DPT/track heads and the output activations.
+
+
+from typing import Dict, Sequence
+
+import torch
+import torch.nn as nn
+from torch.ao.quantization import per_channel_dynamic_qconfig, quantize_dynamic
+
+# Submodules whose nn.Linear layers are quantized
+QUANTIZED_MODULES = (
+    "aggregator.patch_embed.blocks",  # DINO backbone
+    "aggregator.frame_blocks",
+    "aggregator.global_blocks",
+    "camera_head.trunk",
+)
+
+
+def quantize_model_int8(model: nn.Module, modules: Sequence[str] = QUANTIZED_MODULES, inplace: bool = False):
+    """
+    Convert the nn.Linear layers of the given submodules to dynamically quantized int8 layers,
+    with per-channel weight scales. The quantized model only runs on CPU.
+
+    Args:
+        model (VGGT): The model in eval mode, on CPU.
+        modules (Sequence[str]): Names of the submodules to quantize. Missing ones (e.g., disabled heads,
+            or a conv patch embed) are skipped.
+        inplace (bool): Convert the model in place instead of returning a quantized copy,
+            which avoids holding the float and quantized weights at the same time.
+
+    Returns:
+        VGGT: The quantized model.
+
+    Example:
+        model = quantize_model_int8(model.eval())
+        with torch.no_grad():
+            predictions = model(images)
+    """
+    if model.training:
+        raise ValueError("Dynamic quantization is only supported for inference, call model.eval() first")
+    if any(p.device.type != "cpu" for p in model.parameters()):
+        raise ValueError("Dynamic quantization is only supported on CPU")
+
+    named_modules = dict(model.named_modules())
+    qconfig_spec = {name: per_channel_dynamic_qconfig for name in modules if name in named_modules}
+    return quantize_dynamic(model, qconfig_spec=qconfig_spec, dtype=torch.qint8, inplace=inplace)
+
+
+def model_size_bytes(model: nn.Module) -> int:
+    """
+    Size of the weights of a model in bytes, including the packed weights of quantized layers.
+    """
+    size = 0
+    for value in model.state_dict().values():
+        if isinstance(value, torch.Tensor):
+            size += value.numel() * value.element_size()
+        elif isinstance(value, tuple):
+            # Packed params of quantized linear layers, (weight, bias)
+            size += sum(v.numel() * v.element_size() for v in value if isinstance(v, torch.Tensor))
+    return size
+
+
+def compare_predictions(reference: Dict, predictions: Dict, conf_percentile: float = 50.0) -> Dict[str, float]:
+    """
+    Compare the predictions of a model (e.g., quantized) to reference predictions (e.g., float32).
+
+    Args:
+        reference (dict): Reference predictions of VGGT.forward.
+        predictions (dict): Predictions to evaluate, for the same images.
+        conf_percentile (float): Depth is compared on the pixels whose reference confidence
+            is above this percentile.
+
+    Returns:
+        dict: Mean rotation error (degrees), mean translation error relative to the reference camera
+        distances, mean relative field-of-view error, depth AbsRel and mean relative world point error
+        on the confident pixels.
+    """
+    metrics = {}
+
+    if "pose_enc" in reference:
+        ref_pose = reference["pose_enc"].float()
+        pose = predictions["pose_enc"].float()
+
+        ref_quat = nn.functional.normalize(ref_pose[..., 3:7], dim=-1)
+        quat = nn.functional.normalize(pose[..., 3:7], dim=-1)
+        cos_half_angle = (ref_quat * quat).sum(dim=-1).abs().clamp(max=1.0)
+        metrics["rotation_error_deg"] = torch.rad2deg(2 * torch.acos(cos_half_angle)).mean().item()
+
+        ref_t = ref_pose[..., :3]
+        scale = ref_t.norm(dim=-1).mean().clamp(min=1e-8)
+        metrics["translation_error_rel"] = ((pose[..., :3] - ref_t).norm(dim=-1).mean() / scale).item()
+
+        ref_fov = ref_pose[..., 7:]
+        metrics["fov_error_rel"] = ((pose[..., 7:] - ref_fov).abs() / ref_fov.clamp(min=1e-8)).mean().item()
+
+    if "depth" in reference:
+        ref_depth = reference["depth"].float().squeeze(-1)
+        depth = predictions["depth"].float().squeeze(-1)
+        conf = reference["depth_conf"].float()
+        # kthvalue instead of torch.quantile, which does not support large inputs
+        k = max(1, int(conf.numel() * conf_percentile / 100.0))
+        mask = conf >= conf.flatten().kthvalue(k).values
+        abs_rel = (depth[mask] - ref_depth[mask]).abs() / ref_depth[mask].clamp(min=1e-8)
+        metrics["depth_abs_rel"] = abs_rel.mean().item()
+
+    if "world_points" in reference:
+        ref_points = reference["world_points"].float()
+        points = predictions["world_points"].float()
+        conf = reference["world_points_conf"].float()
+        k = max(1, int(conf.numel() * conf_percentile / 100.0))
+        mask = conf >= conf.flatten().kthvalue(k).values
+        error = (points[mask] - ref_points[mask]).norm(dim=-1) / ref_points[mask].norm(dim=-1).clamp(min=1e-8)
+        metrics["points_error_rel"] = error.mean().item()
+
+    return metrics
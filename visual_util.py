@@ -13,6 +13,7 @@ import copy
 import cv2
 import os
 import requests
+from collections.abc import Mapping
 
 
 def predictions_to_glb(
@@ -30,7 +31,8 @@ def predictions_to_glb(
     Converts VGGT predictions to a 3D scene represented as a GLB file.
 
     Args:
-        predictions (dict): Dictionary containing model predictions with keys:
+        predictions (dict): Dictionary containing model predictions (or a PredictionStore, from which only
+            the selected frames are read) with keys:
             - world_points: 3D point coordinates (S, H, W, 3)
             - world_points_conf: Confidence scores (S, H, W)
             - images: Input images (S, H, W, 3)
@@ -50,7 +52,7 @@ def predictions_to_glb(
     Raises:
         ValueError: If input predictions structure is invalid
     """
-    if not isinstance(predictions, dict):
+    if not isinstance(predictions, Mapping):
         raise ValueError("predictions must be a dictionary")
 
     if conf_thres is None:
@@ -68,21 +70,26 @@ def predictions_to_glb(
     if "Pointmap" in prediction_mode:
         print("Using Pointmap Branch")
         if "world_points" in predictions:
-            pred_world_points = predictions["world_points"]  # No batch dimension to remove
-            pred_world_points_conf = predictions.get("world_points_conf", np.ones_like(pred_world_points[..., 0]))
+            points_key, conf_key = "world_points", "world_points_conf"  # No batch dimension to remove
         else:
             print("Warning: world_points not found in predictions, falling back to depth-based points")
-            pred_world_points = predictions["world_points_from_depth"]
-            pred_world_points_conf = predictions.get("depth_conf", np.ones_like(pred_world_points[..., 0]))
+            points_key, conf_key = "world_points_from_depth", "depth_conf"
     else:
         print("Using Depthmap and Camera Branch")
-        pred_world_points = predictions["world_points_from_depth"]
-        pred_world_points_conf = predictions.get("depth_conf", np.ones_like(pred_world_points[..., 0]))
+        points_key, conf_key = "world_points_from_depth", "depth_conf"
+
+    # Only read the selected frames (the arrays of a PredictionStore are loaded lazily)
+    frames = slice(None) if selected_frame_idx is None else [selected_frame_idx]
+    pred_world_points = np.asarray(predictions[points_key][frames], dtype=np.float32)
+    if conf_key in predictions:
+        pred_world_points_conf = np.asarray(predictions[conf_key][frames], dtype=np.float32)
+    else:
+        pred_world_points_conf = np.ones_like(pred_world_points[..., 0])
 
     # Get images from predictions
-    images = predictions["images"]
+    images = np.asarray(predictions["images"][frames], dtype=np.float32)
     # Use extrinsic matrices instead of pred_extrinsic_list
-    camera_matrices = predictions["extrinsic"]
+    camera_matrices = np.asarray(predictions["extrinsic"][frames])
 
     if mask_sky:
         if target_dir is not None:
@@ -91,6 +98,8 @@ def predictions_to_glb(
             skyseg_session = None
             target_dir_images = target_dir + "/images"
             image_list = sorted(os.listdir(target_dir_images))
+            if selected_frame_idx is not None:
+                image_list = [image_list[selected_frame_idx]]
             sky_mask_list = []
 
             # Get the shape of pred_world_points_conf to match
@@ -134,12 +143,6 @@ def predictions_to_glb(
             sky_mask_binary = (sky_mask_array > 0.1).astype(np.float32)
             pred_world_points_conf = pred_world_points_conf * sky_mask_binary
 
-    if selected_frame_idx is not None:
-        pred_world_points = pred_world_points[selected_frame_idx][None]
-        pred_world_points_conf = pred_world_points_conf[selected_frame_idx][None]
-        images = images[selected_frame_idx][None]
-        camera_matrices = camera_matrices[selected_frame_idx][None]
-
     vertices_3d = pred_world_points.reshape(-1, 3)
     # Handle different image formats - check if images need transposing
     if images.ndim == 4 and images.shape[1] == 3:  # NCHW format